@@ -0,0 +1,99 @@
+"""
+Compare message deserialization paths on a mix of group chat messages.
+
+    python benchmarks/deserialization.py [--messages 20000]
+
+"legacy" is the per-message lookup and `cls(**dict)` that deserialize used before the Deserializer; the others use a
+Deserializer with and without validation, one message at a time and as a batch.
+"""
+
+import argparse
+import gc
+import json
+import time
+
+from autogen_agentchat.base import Response
+from autogen_agentchat.messages import StopMessage, TextMessage
+from autogen_agentchat.teams._group_chat._events import (
+    GroupChatAgentResponse,
+    GroupChatMessage,
+    GroupChatRequestPublish,
+    GroupChatStart,
+    GroupChatTermination,
+)
+from autogen_core.models import UserMessage
+
+from agdebugger.serialization import _MESSAGE_TYPES, Deserializer, serialize
+
+
+def build_messages(n: int):
+    messages = []
+    for t in range(n):
+        text = TextMessage(source=f"agent{t % 3}", content=f"message {t}: " + "lorem ipsum " * 20)
+        kind = t % 6
+        if kind == 0:
+            messages.append(GroupChatStart(messages=[text]))
+        elif kind == 1:
+            messages.append(GroupChatAgentResponse(agent_response=Response(chat_message=text)))
+        elif kind == 2:
+            messages.append(GroupChatMessage(message=text))
+        elif kind == 3:
+            messages.append(GroupChatRequestPublish())
+        elif kind == 4:
+            messages.append(UserMessage(content=text.content, source=text.source))
+        else:
+            messages.append(GroupChatTermination(message=StopMessage(source="manager", content="done")))
+    return [serialize(m) for m in messages]
+
+
+def legacy(message_dicts):
+    return [_MESSAGE_TYPES[d["type"]](**d) for d in message_dicts]
+
+
+def timed(fn, *args, repeat: int = 5):
+    # best of several runs with GC off (like timeit), to keep collection pauses and warmup out of the comparison
+    best = float("inf")
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = fn(*args)
+            best = min(best, time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return result, best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=20000)
+    args = parser.parse_args()
+
+    message_dicts = build_messages(args.messages)
+    payload = json.dumps(message_dicts)
+    validating = Deserializer()
+    trusted = Deserializer(validate=False)
+
+    expected = legacy(message_dicts)
+    results = []
+    for name, fn, arg in [
+        ("legacy", legacy, message_dicts),
+        ("validate", lambda ds: [validating.deserialize(d) for d in ds], message_dicts),
+        ("validate batch", validating.deserialize_many, message_dicts),
+        ("validate json", validating.deserialize_many, payload),
+        ("construct", lambda ds: [trusted.deserialize(d) for d in ds], message_dicts),
+        ("construct batch", trusted.deserialize_many, message_dicts),
+    ]:
+        result, seconds = timed(fn, arg)
+        assert result == expected, name
+        results.append((name, seconds))
+
+    print(f"{args.messages} messages")
+    print(f"{'path':<16} {'total (s)':>10} {'per msg (us)':>13}")
+    for name, seconds in results:
+        print(f"{name:<16} {seconds:>10.3f} {seconds / args.messages * 1e6:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
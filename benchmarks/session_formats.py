@@ -0,0 +1,119 @@
+"""
+Compare the session export format against the pickle files save_to_file used to write.
+
+    python benchmarks/session_formats.py [--messages 10000]
+
+Builds a synthetic round-robin session (one checkpoint per message, agents keeping a bounded model context) and
+reports file size, write time and load time for each format.
+"""
+
+import argparse
+import os
+import pickle
+import tempfile
+import time
+
+from autogen_agentchat.base import Response
+from autogen_agentchat.messages import TextMessage
+from autogen_agentchat.teams._group_chat._events import (
+    GroupChatAgentResponse,
+    GroupChatMessage,
+    GroupChatRequestPublish,
+)
+from autogen_core import AgentId, TopicId
+
+from agdebugger.checkpoint import CheckpointStore
+from agdebugger.recording import read_recording, write_recording
+from agdebugger.serialization import read_session_export, write_session_export
+from agdebugger.types import AGEPublishMessage, AGESendMessage, TimeStampedMessage
+
+AGENTS = ["planner", "coder", "critic"]
+CONTEXT_SIZE = 50
+
+
+def build_session(n: int):
+    history = []
+    checkpoints = CheckpointStore()
+    contexts = {name: [] for name in AGENTS}
+    manager = AgentId("group_chat_manager", "session")
+    for t in range(n):
+        name = AGENTS[(t // 3) % len(AGENTS)]
+        agent = AgentId(name, "session")
+        if t % 3 == 0:
+            message = AGESendMessage(GroupChatRequestPublish(), manager, agent, f"m{t}")
+        else:
+            text = TextMessage(source=name, content=f"message {t} from {name}: " + "lorem ipsum " * 20)
+            if t % 3 == 1:
+                inner = GroupChatAgentResponse(agent_response=Response(chat_message=text))
+            else:
+                inner = GroupChatMessage(message=text)
+            message = AGEPublishMessage(inner, agent, TopicId("group_topic", "session"), f"m{t}")
+            for context in contexts.values():
+                context.append({"source": name, "content": text.content, "type": "UserMessage"})
+                del context[:-CONTEXT_SIZE]
+        history.append(TimeStampedMessage(message=message, timestamp=t))
+        checkpoints[t] = {
+            f"{name}/session": {
+                "type": "ChatAgentContainerState",
+                "message_buffer": [],
+                "agent_state": {"llm_context": {"messages": list(context)}},
+            }
+            for name, context in contexts.items()
+        }
+    return history, checkpoints
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def write_pickles(directory, history, checkpoints):
+    with open(os.path.join(directory, "history.pickle"), "wb") as f:
+        pickle.dump(list(history), f)
+    with open(os.path.join(directory, "cache.pickle"), "wb") as f:
+        pickle.dump(checkpoints, f)
+
+
+def read_pickles(directory):
+    with open(os.path.join(directory, "history.pickle"), "rb") as f:
+        history = pickle.load(f)
+    with open(os.path.join(directory, "cache.pickle"), "rb") as f:
+        checkpoints = pickle.load(f)
+    return history, checkpoints
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=10000)
+    args = parser.parse_args()
+
+    history, checkpoints = build_session(args.messages)
+    with tempfile.TemporaryDirectory() as directory:
+        results = []
+
+        _, write_seconds = timed(write_pickles, directory, history, checkpoints)
+        _, load_seconds = timed(read_pickles, directory)
+        size = sum(os.path.getsize(os.path.join(directory, f)) for f in ("history.pickle", "cache.pickle"))
+        results.append(("pickle", size, write_seconds, load_seconds))
+
+        path = os.path.join(directory, "session.agrec")
+        _, write_seconds = timed(write_recording, path, history, checkpoints)
+        _, load_seconds = timed(read_recording, path)
+        results.append(("recording", os.path.getsize(path), write_seconds, load_seconds))
+
+        path = os.path.join(directory, "session.jsonl.gz")
+        _, write_seconds = timed(write_session_export, path, history, checkpoints)
+        (loaded_history, loaded_checkpoints), load_seconds = timed(read_session_export, path)
+        results.append(("export", os.path.getsize(path), write_seconds, load_seconds))
+        assert len(loaded_history) == len(history) and len(loaded_checkpoints) == len(checkpoints)
+
+    print(f"{args.messages} messages, {len(checkpoints)} checkpoints, {checkpoints.stats()['nodes']} state nodes")
+    print(f"{'format':<10} {'size (MB)':>10} {'write (s)':>10} {'load (s)':>10}")
+    for name, size, write_seconds, load_seconds in results:
+        print(f"{name:<10} {size / 1e6:>10.2f} {write_seconds:>10.2f} {load_seconds:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
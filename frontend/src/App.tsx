@@ -1,7 +1,13 @@
 // src/App.tsx
 import { Container, Section, Bar } from "@column-resizer/react";
 import _ from "lodash";
-import React, { useEffect, useState, useMemo, useCallback } from "react";
+import React, {
+  useEffect,
+  useState,
+  useMemo,
+  useCallback,
+  useRef,
+} from "react";
 
 import { api, step } from "./api.ts";
 import AgentList from "./components/AgentList.tsx";
@@ -19,6 +25,9 @@ import type {
   MessageHistoryState,
 } from "./shared-types";
 
+// log records kept in the UI; the server keeps its own bounded buffer
+const MAX_LOGS = 1000;
+
 const App: React.FC = () => {
   const [agents, setAgents] = useState<AgentName[]>([]);
   const [timeStep, setTimeStep] = useState<number>(0);
@@ -33,15 +42,81 @@ const App: React.FC = () => {
     undefined,
   );
   const [allTopics, setAllTopics] = useState<string[]>([]);
+  const historyCursorRef = useRef<{ session?: number; timestamp?: number }>(
+    {},
+  );
 
-  // timer to poll backend
+  const fetchMessageQueue = useCallback(() => {
+    api
+      .get<Message[]>("/getMessageQueue")
+      .then((response) => {
+        setMessageQueue((prev) =>
+          _.isEqual(prev, response.data) ? prev : response.data,
+        );
+      })
+      .catch((error) => console.error("Error fetching messages:", error));
+  }, []);
+
+  // backend pushes changes as server-sent events; fall back to polling if the stream is unavailable
   useEffect(() => {
-    const interval = setInterval(() => {
-      setTimeStep(timeStep + 1);
-    }, 1000);
-    return () => clearInterval(interval);
-  }, [timeStep]);
+    const refresh = () => setTimeStep((prev) => prev + 1);
+    const events = new EventSource(`${api.defaults.baseURL}/events`);
+    let pollInterval: ReturnType<typeof setInterval> | undefined;
+
+    events.addEventListener("resync", refresh);
+    events.addEventListener("history_reset", refresh);
+    events.addEventListener("queue", (event) => {
+      const { size } = JSON.parse(event.data) as { size: number };
+      setNumTasks(size);
+      fetchMessageQueue();
+    });
+    events.addEventListener("loop_status", (event) => {
+      setLoopRunning(JSON.parse(event.data) as boolean);
+    });
+    events.addEventListener("log", (event) => {
+      const log = JSON.parse(event.data) as LogMessage;
+      setLogs((prev) => [...prev, log].slice(-MAX_LOGS));
+    });
+    events.addEventListener("history", (event) => {
+      const { session, message } = JSON.parse(event.data) as {
+        session: number;
+        message: Message;
+      };
+      const cursor = historyCursorRef.current;
+      if (session !== cursor.session || cursor.timestamp === undefined) {
+        refresh();
+        return;
+      }
+      if (message.timestamp <= cursor.timestamp) {
+        return;
+      }
+      historyCursorRef.current = { session, timestamp: message.timestamp };
+      setSessionHistory((prev) => {
+        if (prev === undefined || prev[session] === undefined) {
+          return prev;
+        }
+        return {
+          ...prev,
+          [session]: {
+            ...prev[session],
+            messages: [...prev[session].messages, message],
+          },
+        };
+      });
+    });
+    events.onerror = () => {
+      if (events.readyState === EventSource.CLOSED && !pollInterval) {
+        pollInterval = setInterval(refresh, 1000);
+      }
+    };
 
+    return () => {
+      events.close();
+      clearInterval(pollInterval);
+    };
+  }, [fetchMessageQueue]);
+
+  // full refresh, on first load, after user actions and when the event stream asks for it
   useEffect(() => {
     api
       .get<AgentName[]>("/agents")
@@ -52,17 +127,10 @@ const App: React.FC = () => {
       })
       .catch((error) => console.error("Error fetching agents:", error));
 
-    api
-      .get<Message[]>("/getMessageQueue")
-      .then((response) => {
-        setMessageQueue((prev) =>
-          _.isEqual(prev, response.data) ? prev : response.data,
-        );
-      })
-      .catch((error) => console.error("Error fetching messages:", error));
+    fetchMessageQueue();
 
     api
-      .get<LogMessage[]>("/logs")
+      .get<LogMessage[]>("/logs", { params: { limit: MAX_LOGS } })
       .then((response) =>
         setLogs((prev) =>
           _.isEqual(prev, response.data) ? prev : response.data,
@@ -79,16 +147,53 @@ const App: React.FC = () => {
       )
       .catch((error) => console.error("Error fetching tasks:", error));
 
+    // only ask for history we have not seen yet in the current session
+    const historyCursor = historyCursorRef.current;
     api
-      .get<MessageHistoryState>("/getSessionHistory")
+      .get<MessageHistoryState>("/getSessionHistory", {
+        params:
+          historyCursor.session !== undefined &&
+          historyCursor.timestamp !== undefined
+            ? {
+                session: historyCursor.session,
+                since_timestamp: historyCursor.timestamp,
+              }
+            : {},
+      })
       .then((response) => {
         const historyState = response.data;
+        historyCursorRef.current = {
+          session: historyState.current_session,
+          timestamp:
+            historyState.latest_timestamp ?? historyCursor.timestamp ?? -1,
+        };
 
-        setSessionHistory((prev) =>
-          _.isEqual(prev, historyState.message_history)
-            ? prev
-            : historyState.message_history,
-        );
+        setSessionHistory((prev) => {
+          if (!historyState.incremental || prev === undefined) {
+            return _.isEqual(prev, historyState.message_history)
+              ? prev
+              : historyState.message_history;
+          }
+          const update =
+            historyState.message_history[historyState.current_session];
+          const current = prev[historyState.current_session];
+          if (
+            update.messages.length === 0 &&
+            _.isEqual(
+              _.omit(current, "messages"),
+              _.omit(update, "messages"),
+            )
+          ) {
+            return prev;
+          }
+          return {
+            ...prev,
+            [historyState.current_session]: {
+              ...update,
+              messages: [...(current?.messages ?? []), ...update.messages],
+            },
+          };
+        });
         setCurrentSession((prev) =>
           _.isEqual(prev, historyState.current_session)
             ? prev
@@ -114,7 +219,7 @@ const App: React.FC = () => {
         );
       })
       .catch((error) => console.error("Error fetching topics:", error));
-  }, [timeStep]);
+  }, [timeStep, fetchMessageQueue]);
 
   const onProcessNext = useCallback(() => {
     step(() => setTimeStep((prev) => prev + 1));
@@ -21,6 +21,8 @@ export interface Message {
 
 export interface MessageHistoryState {
   current_session: number;
+  incremental: boolean;
+  latest_timestamp: number | null;
   message_history: MessageHistoryMap;
 }
 
@@ -47,6 +49,7 @@ export interface LogMessage {
   level: string;
   name: string;
   time: number;
+  id?: number;
 }
 
 export type AgentName = string;
@@ -1,29 +1,57 @@
+import asyncio
+import dataclasses
 import logging
 import os
-from typing import List
+import time
+from typing import Any, List, Literal
 
-from autogen_core import EVENT_LOGGER_NAME
-from fastapi import FastAPI
+from autogen_core import EVENT_LOGGER_NAME, DefaultTopicId
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 
 from .backend import BackendRuntimeManager
-from .intervention_utils import write_file_async
-from .serialization import deserialize
+from .checkpoint import CheckpointPolicy
+from .events import stream_events
+from .fork import build_fork_jobs, fork_session
+from .injection import InjectKind, parse_inject_batch
+from .log import ListHandler
+from .model_cache import ModelResponseCache
+from .recording import RecordingWriter, write_recording
+from .scoring import IncrementalScorer
+from .serialization import Deserializer, deserialize, write_session_export
+from .storage import SqliteSessionStore
 from .types import (
+    Breakpoint,
     EditHistoryMessage,
     EditQueueMessage,
+    ForkRequest,
     PublishMessage,
+    QueueEdit,
+    QueueOperation,
+    RunUntilCondition,
     SendMessage,
 )
-from .utils import load_app, message_to_json
+from .utils import load_app
 
 # alt would be TRACE_LOGGER_NAME
 logger = logging.getLogger(EVENT_LOGGER_NAME)
 logger.setLevel(logging.DEBUG)
 
 
-async def get_server(module_str: str, message_history=None, state_cache=None) -> FastAPI:
+async def get_server(
+    module_str: str,
+    message_history=None,
+    state_cache=None,
+    checkpoint_policy: CheckpointPolicy | None = None,
+    session_store: SqliteSessionStore | None = None,
+    recording: RecordingWriter | None = None,
+    record_existing: bool = True,
+    log_handler: ListHandler | None = None,
+    model_cache: ModelResponseCache | None = None,
+    scorer: IncrementalScorer[Any] | None = None,
+) -> FastAPI:
     origins = [
         "http://localhost",
         "http://localhost:5173",
@@ -45,8 +73,40 @@ async def get_server(module_str: str, message_history=None, state_cache=None) ->
 
     # load app and make backend
     loaded_gc = await load_app(module_str)
-    backend = BackendRuntimeManager(loaded_gc, logger, message_history, state_cache)
+    prior_sessions = None
+    json_cache_size = None
+    if session_store is not None:
+        if len(session_store.history) > 0 and (message_history is not None or state_cache is not None):
+            raise ValueError("Cannot load a history or cache into a session store that already holds a session")
+        if message_history is not None:
+            for message in message_history:
+                session_store.history.append(message)
+        if state_cache is not None:
+            for timestamp, checkpoint in state_cache.items():
+                session_store.checkpoints[timestamp] = checkpoint
+        message_history = session_store.history
+        state_cache = session_store.checkpoints
+        prior_sessions = session_store.prior_sessions
+        # serialized messages are bounded like the store's own caches
+        json_cache_size = session_store.cache_size
+    backend = BackendRuntimeManager(
+        loaded_gc,
+        logger,
+        message_history,
+        state_cache,
+        checkpoint_policy,
+        log_handler=log_handler,
+        model_cache=model_cache,
+        scorer=scorer,
+        prior_sessions=prior_sessions,
+        json_cache_size=json_cache_size,
+    )
     await backend.async_initialize()
+    if recording is not None:
+        backend.attach_recording(recording, write_existing=record_existing)
+    app.router.add_event_handler("shutdown", backend.close)
+
+    deserializers = {True: Deserializer(), False: Deserializer(validate=False)}
 
     @api.get("/agents")
     async def get_agent_list() -> List[str]:
@@ -55,24 +115,27 @@ async def get_server(module_str: str, message_history=None, state_cache=None) ->
             return []
         return backend.agent_names
 
+    # both are polled by the UI; serialized messages are cached and returned as pre-encoded JSON
     @api.get("/getMessageQueue")
     async def get_messages():
-        message_queue = [message_to_json(msg) for msg in backend.message_queue_list]
-        return message_queue
+        return Response(content=backend.message_queue_json_bytes(), media_type="application/json")
 
     @api.get("/getSessionHistory")
-    async def getSessionHistory():
-        saved_sessions = backend.read_current_session_history()
-
-        return {
-            "current_session": backend.session_counter,
-            "message_history": saved_sessions,
-        }
+    async def getSessionHistory(since_timestamp: int | None = None, session: int | None = None):
+        # with a cursor, only the messages the client has not seen yet are returned
+        return Response(
+            content=backend.read_session_history_json(since_timestamp, session), media_type="application/json"
+        )
 
     @api.get("/num_tasks")
     async def get_outstanding_tasks() -> int:
         return backend.unprocessed_messages_count
 
+    @api.get("/task_stats")
+    async def get_task_stats():
+        # background publish/send tasks, not queued messages
+        return dataclasses.asdict(backend.tasks.metrics())
+
     @api.post("/drop")
     async def drop():
         if backend.unprocessed_messages_count == 0:
@@ -83,11 +146,19 @@ async def get_server(module_str: str, message_history=None, state_cache=None) ->
         return {"status": "ok"}
 
     @api.post("/step")
-    async def step():
-        if backend.unprocessed_messages_count == 0:
-            return {"status": "ok"}
-        await backend.process_next()
-        return {"status": "ok"}
+    async def step(n: int = 1):
+        if backend.is_processing:
+            return {"status": "error", "message": "Stop the loop before stepping"}
+        summary = await backend.step(n)
+        return {"status": "ok", **dataclasses.asdict(summary)}
+
+    @api.post("/run_until")
+    async def run_until(condition: RunUntilCondition):
+        # advance server-side until a processed message matches the condition, instead of stepping per request
+        if backend.is_processing:
+            return {"status": "error", "message": "Stop the loop before stepping"}
+        summary = await backend.run_until(condition)
+        return {"status": "ok", **dataclasses.asdict(summary)}
 
     @api.post("/start_loop")
     async def start_loop():
@@ -141,6 +212,28 @@ async def get_server(module_str: str, message_history=None, state_cache=None) ->
 
         return {"status": "ok"}
 
+    async def inject_batch(request: Request, kind: InjectKind, validate: bool):
+        received = time.perf_counter()
+        deserializer = deserializers[validate]
+        items = parse_inject_batch(await request.body(), kind, deserializer)
+        acks = await backend.inject_messages(items, kind, received)
+        failed = sum(1 for ack in acks if ack.status != "ok")
+        return {
+            "status": "ok" if failed == 0 else "error",
+            "enqueued": len(acks) - failed,
+            "failed": failed,
+            "acks": [dataclasses.asdict(ack) for ack in acks],
+        }
+
+    # bulk injection: NDJSON bodies with one {"topic": ..., "body": ...} / {"recipient": ..., "body": ...} per line
+    @api.post("/publish_batch")
+    async def publish_batch(request: Request, validate: bool = True):
+        return await inject_batch(request, "publish", validate)
+
+    @api.post("/send_batch")
+    async def send_batch(request: Request, validate: bool = True):
+        return await inject_batch(request, "send", validate)
+
     @api.post("/editQueue")
     async def edit_message_queue(edit_message: EditQueueMessage):
         print("Editing message at index ", edit_message.idx, "with new content: ", edit_message.body)
@@ -156,6 +249,30 @@ async def get_server(module_str: str, message_history=None, state_cache=None) ->
 
         return {"status": "ok"}
 
+    @api.post("/editQueueBatch")
+    async def edit_message_queue_batch(edits: List[QueueEdit]):
+        # edit, delete, move and insert queued messages -- all edits are applied, or none
+        try:
+            operations = []
+            for edit in edits:
+                operation = QueueOperation(op=edit.op, idx=edit.idx, to_idx=edit.to_idx)
+                if edit.op in ("edit", "insert"):
+                    if edit.body is None:
+                        return {"status": "error", "message": "Message body cannot be None"}
+                    operation.message = deserialize(edit.body)
+                if edit.op == "insert":
+                    if edit.recipient is not None:
+                        operation.recipient = await backend.runtime.get(edit.recipient, key=backend.agent_key)
+                    elif edit.topic is not None:
+                        operation.topic_id = DefaultTopicId(edit.topic)
+                operations.append(operation)
+
+            backend.apply_queue_operations(operations)
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
+        return {"status": "ok"}
+
     @api.post("/editAndRevertHistoryMessage")
     async def edit_and_revert_message(edit_message: EditHistoryMessage):
         try:
@@ -169,15 +286,121 @@ async def get_server(module_str: str, message_history=None, state_cache=None) ->
 
         return {"status": "ok"}
 
-    @api.get("/logs")
-    async def get_logs():
-        return backend.log_handler.get_log_messages()
+    @api.get("/breakpoints")
+    async def get_breakpoints() -> List[Breakpoint]:
+        return list(backend.intervention_handler.breakpoints.values())
 
-    @api.post("/save_to_file")
-    async def save_to_file():
-        await write_file_async("history.pickle", backend.intervention_handler.history)
-        await write_file_async("cache.pickle", backend.agent_checkpoints)
+    @api.post("/breakpoints")
+    async def add_breakpoint(breakpoint: Breakpoint):
+        try:
+            return {"status": "ok", "breakpoint": backend.intervention_handler.add_breakpoint(breakpoint)}
+        except Exception as e:
+            return JSONResponse(status_code=400, content={"status": "error", "message": str(e)})
+
+    @api.delete("/breakpoints/{breakpoint_id}")
+    async def remove_breakpoint(breakpoint_id: int):
+        if breakpoint_id not in backend.intervention_handler.breakpoints:
+            return {"status": "error", "message": f"No breakpoint with id {breakpoint_id}"}
+        backend.intervention_handler.remove_breakpoint(breakpoint_id)
+        return {"status": "ok"}
+
+    @api.get("/breakpoint_status")
+    async def breakpoint_status():
+        return {"paused": backend.intervention_handler.paused, "hit": backend.intervention_handler.paused_at}
+
+    @api.post("/resume")
+    async def resume(step_over: bool = False):
+        # continue from a breakpoint; with step_over, pause again at the next message
+        if not backend.intervention_handler.paused:
+            return {"status": "error", "message": "Not paused at a breakpoint"}
+        backend.intervention_handler.resume(step_over)
+        return {"status": "ok"}
+
+    @api.post("/fork")
+    async def fork(request: ForkRequest):
+        # run alternative versions of a message side by side, each in its own runtime; the live session is untouched
+        try:
+            messages = [None if body is None else deserializers[True].deserialize(body) for body in request.bodies]
+            await backend.checkpoint_writer.flush()
+            jobs = build_fork_jobs(
+                module_str,
+                backend.intervention_handler.history,
+                backend.agent_checkpoints,
+                request.timestamp,
+                messages,
+                backend.agent_key,
+                request.max_steps,
+                model_cache=backend.model_cache.path if backend.model_cache is not None else None,
+                model_cache_mode=backend.model_cache.mode if backend.model_cache is not None else "record",
+            )
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
+        results = await fork_session(jobs, request.mode, request.max_workers)
+        return {"status": "ok", "forks": [dataclasses.asdict(result) for result in results]}
+
+    @api.get("/profile")
+    async def get_profile():
+        # per-agent handler latency and LLM usage, slowest agent first
+        summary = backend.profiler.summary()
+        return {
+            "samples": len(backend.profiler.samples),
+            "agents": {agent: dataclasses.asdict(profile) for agent, profile in summary.items()},
+        }
+
+    @api.get("/profile/samples")
+    async def get_profile_samples(since: int | None = None, limit: int | None = None):
+        return [dataclasses.asdict(sample) for sample in backend.profiler.get_samples(since, limit)]
 
+    @api.post("/profile/reset")
+    async def reset_profile():
+        backend.profiler.reset()
         return {"status": "ok"}
 
+    @api.get("/logs")
+    async def get_logs(since: int | None = None, level: str | None = None, limit: int | None = None):
+        # since is the id of the last record the client has; older records may have been dropped from memory
+        try:
+            return backend.log_handler.get_log_messages(since, level, limit)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
+
+    @api.get("/events")
+    async def events():
+        # server-sent events replacing UI polling: history, log, queue, loop_status, history_reset, resync
+        return StreamingResponse(
+            stream_events(backend.events),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    @api.get("/checkpoint_stats")
+    async def checkpoint_stats():
+        return backend.checkpoint_writer.stats()
+
+    @api.post("/save_to_file")
+    async def save_to_file(format: Literal["recording", "export"] = "recording"):
+        await backend.checkpoint_writer.flush()
+        if format == "export":
+            # portable, pickle-free copy of the session (see serialization.py)
+            path = "session.jsonl.gz"
+            history = list(backend.intervention_handler.history)
+            await asyncio.to_thread(write_session_export, path, history, backend.agent_checkpoints)
+            return {"status": "ok", "path": path}
+
+        if session_store is not None:
+            # disk-backed sessions are already saved as they run
+            session_store.flush()
+            return {"status": "ok", "path": session_store.path}
+
+        if backend.recording is not None:
+            # recorded sessions are already on disk up to the last message
+            backend.recording.flush()
+            return {"status": "ok", "path": backend.recording.path}
+
+        path = "session.agrec"
+        await asyncio.to_thread(
+            write_recording, path, list(backend.intervention_handler.history), backend.agent_checkpoints
+        )
+        return {"status": "ok", "path": path}
+
     return app
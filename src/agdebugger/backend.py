@@ -1,10 +1,25 @@
 import asyncio
+import dataclasses
+import functools
 import logging
-from typing import Any, Dict, List
+import sys
+import time
+import uuid
+from collections import deque
+from typing import Any, Deque, Dict, List, MutableMapping, Sequence, Set, Tuple
 
 from autogen_agentchat.teams import BaseGroupChat
-from autogen_core import AgentId, DefaultTopicId, SingleThreadedAgentRuntime, TopicId
-from autogen_core._queue import Queue
+from autogen_agentchat.teams._group_chat._events import GroupChatRequestPublish
+from autogen_core import (
+    Agent,
+    AgentId,
+    CancellationToken,
+    DefaultTopicId,
+    MessageContext,
+    SingleThreadedAgentRuntime,
+    TopicId,
+)
+from autogen_core._message_handler_context import MessageHandlerContext
 from autogen_core._single_threaded_agent_runtime import (
     PublishMessageEnvelope,
     ResponseMessageEnvelope,
@@ -12,21 +27,78 @@ from autogen_core._single_threaded_agent_runtime import (
     SendMessageEnvelope,
 )
 
+from .checkpoint import CheckpointPolicy, CheckpointStore, CheckpointWriter
+from .events import EventBroadcaster
+from .injection import InjectItem, InjectKind
 from .intervention import AgDebuggerInterventionHandler
-from .log import ListHandler  # , LogToHistoryHandler
+from .json_cache import MessageJsonCache, encode_json, join_json_list
+from .log import ListHandler, LogCapture, LogEntry  # , LogToHistoryHandler
+from .message_queue import ObservableQueue
+from .model_cache import ModelResponseCache, wrap_model_clients
+from .profiler import Profiler
+from .recording import RecordingWriter
+from .scoring import IncrementalScorer, ScoringEngine
 from .serialization import get_message_type_descriptions
+from .storage import LRUCache
+from .tasks import TaskRegistry
 from .types import (
     AgentInfo,
     AGEPublishMessage,
+    AGEResponseMessage,
     AGESendMessage,
+    BreakpointHit,
+    InjectAck,
     MessageHistorySession,
+    QueueOperation,
+    RunUntilCondition,
     ScoreResult,
+    StepSummary,
+    TimeStampedMessage,
 )
-from .utils import message_to_json
+
+# encoded prior sessions kept in memory when the sessions themselves are on disk
+_PRIOR_SESSIONS_CACHED = 4
+
+
+def _cancel_envelope(envelope: PublishMessageEnvelope | SendMessageEnvelope | ResponseMessageEnvelope) -> None:
+    # whoever is waiting on a removed send or response must not wait forever
+    future = getattr(envelope, "future", None)
+    if future is not None and not future.done():
+        future.cancel()
+
+
+def _recorded_replies(
+    messages: Sequence[TimeStampedMessage],
+) -> Dict[Tuple[AgentId | None, AgentId | None], Deque[Any]]:
+    # replies by (replying agent, agent that sent the request), in the order they were recorded
+    replies: Dict[Tuple[AgentId | None, AgentId | None], Deque[Any]] = {}
+    for timestamped_message in messages:
+        message = timestamped_message.message
+        if isinstance(message, AGEResponseMessage):
+            replies.setdefault((message.sender, message.recipient), deque()).append(message.message)
+    return replies
 
 
-async def wait_for_future(fut):  # type: ignore
-    await fut
+def _answer_replayed_send(
+    replies: Dict[Tuple[AgentId | None, AgentId | None], Deque[Any]],
+    envelope: PublishMessageEnvelope | SendMessageEnvelope | ResponseMessageEnvelope,
+) -> None:
+    """
+    Resolve a send made during replay with the reply recorded for it. The runtime is stopped while replaying, so a
+    send nobody answers would leave its handler waiting forever -- one without a recorded reply fails instead.
+    """
+    if not isinstance(envelope, SendMessageEnvelope) or envelope.future.done():
+        return
+    recorded = replies.get((envelope.recipient, envelope.sender))
+    if recorded:
+        envelope.future.set_result(recorded.popleft())
+    else:
+        envelope.future.set_exception(LookupError(f"No recorded reply from {envelope.recipient} to replay"))
+
+
+def _consume_result(future: asyncio.Future[Any]) -> None:
+    if not future.cancelled():
+        future.exception()
 
 
 class BackendRuntimeManager:
@@ -36,18 +108,73 @@ class BackendRuntimeManager:
         logger: logging.Logger,
         message_history=None,
         state_cache=None,
+        checkpoint_policy: CheckpointPolicy | None = None,
+        max_background_tasks: int | None = 1024,
+        log_handler: ListHandler | None = None,
+        model_cache: ModelResponseCache | None = None,
+        scorer: IncrementalScorer[Any] | None = None,
+        prior_sessions: MutableMapping[int, MessageHistorySession] | None = None,
+        json_cache_size: int | None = None,
     ):
         self._groupchat = groupchat
+        self.logger = logger
+        # a replayed handler that runs longer than this is abandoned and the agents are left at the checkpoint
+        self.replay_timeout = 30.0
+        # model responses are recorded during live runs and served again when a reverted session replays its prompts
+        self.model_cache = model_cache
+        if model_cache is not None:
+            wrap_model_clients([groupchat, *groupchat._participants], model_cache)
+        # publishes and sends waiting to be enqueued or answered; failures go to the log
+        self.tasks = TaskRegistry(logger, max_background_tasks)
+        # sends waiting to be put on the queue, by message id
+        self._enqueue_waiters: Dict[str, asyncio.Future[None]] = {}
         self.message_info = get_message_type_descriptions()
-        self.prior_histories: Dict[int, MessageHistorySession] = {}
-        self.session_counter = 0
+        # sessions reverted away from, e.g. kept on disk by a session store
+        self.prior_histories: MutableMapping[int, MessageHistorySession] = (
+            {} if prior_sessions is None else prior_sessions
+        )
+        self.session_counter = max(self.prior_histories, default=-1) + 1
         self.current_session_reset_from: int | None = None
-        self.agent_checkpoints = {} if state_cache is None else state_cache
+        self.agent_checkpoints = CheckpointStore.from_mapping(state_cache)
+        self.checkpoint_writer = CheckpointWriter(self.agent_checkpoints)
+        self._last_checkpoint_time = self.agent_checkpoints.latest()
+        self.checkpoint_policy = CheckpointPolicy() if checkpoint_policy is None else checkpoint_policy
+        self._messages_since_checkpoint = 0
+        # agents whose state may have changed since the last checkpoint (on_change policy only)
+        self._dirty_agents: Set[AgentId] = set()
+        # take a full checkpoint on the next message, e.g. when agent state was just loaded
+        self._force_checkpoint = True
+        # serialized history and queue messages, reused across polls
+        self.json_cache = MessageJsonCache(json_cache_size)
+        # encoded prior sessions, which never change once saved
+        self._prior_history_bytes: LRUCache[int, bytes] = LRUCache(
+            _PRIOR_SESSIONS_CACHED if prior_sessions is not None else sys.maxsize
+        )
         self.run_context: RunContext | None = None
         self.intervention_handler = AgDebuggerInterventionHandler(self.checkpoint_agents, message_history)
+        # checkpoints can outlive reverted messages -- never reuse their timestamps
+        counter = self.intervention_handler.timestamp_counter
+        if self._last_checkpoint_time is not None and self._last_checkpoint_time >= counter.get():
+            counter.set(self._last_checkpoint_time + 1)
+        # live score of the current session, updated as messages come in
+        self.scoring = ScoringEngine(scorer, self.intervention_handler.history) if scorer is not None else None
+        if self.scoring is not None:
+            self.intervention_handler.history_listeners.append(self.scoring.add)
         self.all_topics: List[str] = []
-        self.log_handler = ListHandler()
-        logger.addHandler(self.log_handler)
+        self.log_handler = ListHandler() if log_handler is None else log_handler
+        # records are captured on a background thread so logging never slows down message dispatch
+        self.log_capture = LogCapture(logger, self.log_handler)
+
+        # push channel for UI updates, fed by the hooks below
+        self.events = EventBroadcaster()
+        self.intervention_handler.history_listeners.append(self._on_history_add)
+        # per-agent handler timing and LLM usage
+        self.profiler = Profiler(logger)
+        self.intervention_handler.history_listeners.append(self.profiler.on_dispatch)
+        self.log_handler.listeners.append(self._on_log)
+        self.intervention_handler.breakpoint_listeners.append(self._on_breakpoint)
+        self.intervention_handler.recipients_func = self._get_recipients
+        self.recording: RecordingWriter | None = None
         self.ready = False
 
         print("Initial Backend loaded.")
@@ -68,18 +195,30 @@ class BackendRuntimeManager:
         if self.runtime._intervention_handlers is None:
             self.runtime._intervention_handlers = []
         self.runtime._intervention_handlers.append(self.intervention_handler)
+        self.install_message_queue()
+        self._instrument_agents()
+        self.checkpoint_writer.start()
 
         # load the last checkpoint - N.B. might be earlier than last message so we get the max key
         if len(self.intervention_handler.history) > 0:
-            last_checkpoint_time = max(self.agent_checkpoints.keys())
+            last_checkpoint_time = self.agent_checkpoints.latest()
             print("resetting to checkpoint: ", last_checkpoint_time)
-            checkpoint = self.agent_checkpoints.get(last_checkpoint_time)
-            if checkpoint is not None:
-                await self.runtime.load_state(checkpoint)
+            if last_checkpoint_time is not None:
+                await self.runtime.load_state(self.agent_checkpoints[last_checkpoint_time])
 
         self.ready = True
         print("Finished backend async load")
 
+    def attach_recording(self, recording: RecordingWriter, write_existing: bool = True) -> None:
+        """
+        Append every message, revert and checkpoint of this session to the recording as they happen.
+        """
+        if write_existing:
+            recording.write_session(self.intervention_handler.history, self.agent_checkpoints)
+        self.recording = recording
+        self.intervention_handler.history_listeners.append(recording.write_message)
+        self.agent_checkpoints.write_listeners.append(recording.write_checkpoint)
+
     @property
     def groupchat(self) -> BaseGroupChat:
         return self._groupchat
@@ -94,7 +233,7 @@ class BackendRuntimeManager:
 
     @property
     def current_score(self) -> ScoreResult | None:
-        return self.intervention_handler._current_score
+        return self.scoring.score if self.scoring is not None else None
 
     @property
     def agent_names(self) -> List[str]:
@@ -105,6 +244,10 @@ class BackendRuntimeManager:
         # read and serialize without having to reconstruct a new Queue each time
         return list(self.runtime._message_queue._queue)  # type: ignore
 
+    @property
+    def message_queue(self) -> ObservableQueue[PublishMessageEnvelope | SendMessageEnvelope | ResponseMessageEnvelope]:
+        return self.runtime._message_queue  # type: ignore
+
     @property
     def unprocessed_messages_count(self):
         return self.runtime.unprocessed_messages_count
@@ -113,23 +256,302 @@ class BackendRuntimeManager:
     def is_processing(self) -> bool:
         return self.runtime._run_context is not None
 
+    def install_message_queue(self) -> None:
+        """
+        Swap the runtime queue for one that reports changes. Must be re-run whenever the runtime replaces its queue
+        (e.g. after stopping).
+        """
+        if not isinstance(self.runtime._message_queue, ObservableQueue):
+            queue: ObservableQueue[PublishMessageEnvelope | SendMessageEnvelope | ResponseMessageEnvelope] = (
+                ObservableQueue.from_queue(self.runtime._message_queue)  # type: ignore[arg-type]
+            )
+            queue.listeners.append(self._on_queue_change)
+            queue.put_listeners.append(self.profiler.on_enqueue)
+            queue.put_listeners.append(self._on_enqueue)
+            self.runtime._message_queue = queue  # type: ignore[assignment]
+        self._on_queue_change()
+
+    def _instrument_agents(self) -> None:
+        """
+        Have the profiler time every agent's handler, including agents the runtime instantiates later.
+        """
+        for agent in self.runtime._instantiated_agents.values():
+            self.profiler.instrument(agent)
+
+        get_agent = self.runtime._get_agent
+
+        async def _get_agent(agent_id: AgentId) -> Agent:
+            agent = await get_agent(agent_id)
+            self.profiler.instrument(agent)
+            return agent
+
+        self.runtime._get_agent = _get_agent  # type: ignore
+
+    def _on_queue_change(self) -> None:
+        if self.events.has_subscribers:
+            self.events.publish("queue", {"size": self.unprocessed_messages_count})
+
+    def _on_history_add(self, message: TimeStampedMessage) -> None:
+        if self.events.has_subscribers:
+            self.events.publish(
+                "history",
+                {"session": self.session_counter, "message": self.history_message_to_json(message)},
+            )
+
+    def _on_log(self, entry: LogEntry) -> None:
+        if self.events.has_subscribers:
+            self.events.publish("log", entry.to_message())
+
+    def close(self) -> None:
+        self.log_capture.close()
+        self.profiler.close()
+
     def start_processing(self) -> None:
+        # breakpoints only pause the free-running loop -- while stepping they just end the step
+        self.intervention_handler.pause_on_breakpoints = True
         self.runtime.start()
+        self.events.publish("loop_status", True)
+
+    def _on_breakpoint(self, hit: BreakpointHit) -> None:
+        self.events.publish("breakpoint", hit)
 
-    async def process_next(self):
+    async def process_next(self) -> None:
         await self.runtime.process_next()
 
+    async def _wait_for_messages(self) -> bool:
+        """
+        Wait for in-flight deliveries, and for spawned sends and publishes to reach the queue, until a message is
+        queued. False if the runtime went idle with an empty queue.
+        """
+        while self.unprocessed_messages_count == 0:
+            in_flight: Set[asyncio.Future[Any]] = set(self.runtime._background_tasks)
+            in_flight.update(self.tasks.unqueued())
+            if not in_flight:
+                return False
+            await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+        return True
+
+    async def step(self, n: int = 1, condition: RunUntilCondition | None = None) -> StepSummary:
+        """
+        Process up to n messages, or with a condition, until a processed message matches it. Waits for in-flight
+        deliveries when the queue runs dry, and stops once nothing is left to process.
+        """
+        summary = StepSummary()
+        history = self.intervention_handler.history
+        while summary.steps < n:
+            if not await self._wait_for_messages():
+                summary.stop_reason = "queue_empty"
+                break
+
+            start = self.intervention_handler.timestamp_counter.get()
+            breakpoint_hits = self.intervention_handler.breakpoint_hits
+            await self.process_next()
+            summary.steps += 1
+
+            processed = history.between(start)
+            for message in processed:
+                type_name = type(message.message.message).__name__
+                summary.message_types[type_name] = summary.message_types.get(type_name, 0) + 1
+                if summary.first_timestamp is None:
+                    summary.first_timestamp = message.timestamp
+                summary.last_timestamp = message.timestamp
+
+            if self.intervention_handler.breakpoint_hits != breakpoint_hits:
+                summary.stop_reason = "breakpoint"
+                break
+            if condition is not None and await self._matches_condition(processed, condition):
+                summary.stop_reason = "condition"
+                break
+        else:
+            summary.stop_reason = "steps" if condition is None else "max_steps"
+
+        if condition is not None and condition.queue_empty and summary.stop_reason == "queue_empty":
+            summary.stop_reason = "condition"
+        summary.queue_size = self.unprocessed_messages_count
+        return summary
+
+    async def run_until(self, condition: RunUntilCondition) -> StepSummary:
+        return await self.step(condition.max_steps, condition)
+
+    async def _matches_condition(self, processed: List[TimeStampedMessage], condition: RunUntilCondition) -> bool:
+        for message in processed:
+            if condition.message_type is not None and type(message.message.message).__name__ == condition.message_type:
+                return True
+            if condition.timestamp is not None and message.timestamp >= condition.timestamp:
+                return True
+            if condition.sender is not None and message.message.sender is not None:
+                if condition.sender in (message.message.sender.type, str(message.message.sender)):
+                    return True
+            if condition.recipient is not None:
+                recipients = await self._get_recipients(message.message)
+                if any(condition.recipient in (r.type, str(r)) for r in recipients):
+                    return True
+        return False
+
     async def stop_processing(self) -> None:
+        self.intervention_handler.pause_on_breakpoints = False
+        if self.intervention_handler.paused:
+            self.intervention_handler.resume()
         await self.runtime.stop_when_idle()
         # OR maybe below to stop immediatley
         # await self.runtime.stop()
+        self.install_message_queue()
+        await self.checkpoint_writer.flush()
+        self.events.publish("loop_status", False)
 
-    async def checkpoint_agents(self, timestamp: int) -> None:
-        checkpoint = await self.runtime.save_state()
-        self.agent_checkpoints[timestamp] = checkpoint
+    async def checkpoint_agents(
+        self, timestamp: int, message: AGEPublishMessage | AGESendMessage | AGEResponseMessage | None = None
+    ) -> None:
+        """
+        Called before each message is delivered. Snapshots agent state according to the checkpoint policy.
 
-    def get_current_history(self):
-        return [message_to_json(m.message, m.timestamp) for m in self.intervention_handler.history]
+        Only the save_state capture happens here, storing the snapshot is handed to the background checkpoint writer.
+        """
+        policy = self.checkpoint_policy
+        track_changes = policy.mode == "on_change"
+        last_checkpoint = self._last_checkpoint_time
+
+        if self._force_checkpoint or last_checkpoint is None:
+            await self.checkpoint_writer.submit(timestamp, await self.runtime.save_state())
+        elif track_changes:
+            agent_states = {
+                str(agent_id): dict(await self.runtime.agent_save_state(agent_id))
+                for agent_id in self._dirty_agents
+                if agent_id in self.runtime._instantiated_agents
+            }
+            if not agent_states:
+                # nothing changed since the last checkpoint, which restoring this message can start from
+                await self._track_dirty_agents(message)
+                return
+            await self.checkpoint_writer.submit(timestamp, agent_states, base_timestamp=last_checkpoint)
+        elif (policy.mode == "every" and self._messages_since_checkpoint + 1 >= policy.every_n) or (
+            policy.mode == "boundary" and message is not None and isinstance(message.message, GroupChatRequestPublish)
+        ):
+            await self.checkpoint_writer.submit(timestamp, await self.runtime.save_state())
+        else:
+            self._messages_since_checkpoint += 1
+            return
+
+        self._last_checkpoint_time = timestamp
+        if self.scoring is not None:
+            self.scoring.snapshot(timestamp)
+        self._force_checkpoint = False
+        self._messages_since_checkpoint = 0
+        if track_changes:
+            await self._track_dirty_agents(message)
+
+    async def _track_dirty_agents(
+        self, message: AGEPublishMessage | AGESendMessage | AGEResponseMessage | None
+    ) -> None:
+        # deliveries run in the background, so agents stay dirty until no earlier delivery is still in flight
+        if len(self.runtime._background_tasks) == 0:
+            self._dirty_agents = set()
+        if message is not None:
+            self._dirty_agents.update(await self._get_recipients(message))
+
+    async def _get_recipients(self, message: AGEPublishMessage | AGESendMessage | AGEResponseMessage) -> Set[AgentId]:
+        if isinstance(message, AGEPublishMessage):
+            recipients = await self.runtime._subscription_manager.get_subscribed_recipients(message.topic_id)
+            return {agent_id for agent_id in recipients if agent_id != message.sender}
+        if message.recipient is None:
+            return set()
+        return {message.recipient}
+
+    async def restore_agents(self, timestamp: int) -> bool:
+        """
+        Put agents back in the state they had just before the message at timestamp was delivered: load the nearest
+        earlier checkpoint, then replay the recorded messages between it and the timestamp.
+
+        Returns False if the replay had to be abandoned, leaving the agents at the checkpoint.
+        """
+        await self.checkpoint_writer.flush()
+        checkpoint_time = self.agent_checkpoints.nearest(timestamp)
+        if checkpoint_time is None:
+            print("[WARN] Was unable to find agent state checkpoint for time ", timestamp)
+            return False
+
+        checkpoint = self.agent_checkpoints[checkpoint_time]
+        await self.runtime.load_state(checkpoint)
+        self._force_checkpoint = True
+
+        replay = self.intervention_handler.history.between(checkpoint_time, timestamp)
+        if len(replay) == 0:
+            return True
+
+        print(f"Replaying {len(replay)} messages from checkpoint {checkpoint_time}")
+        queue_size = self.unprocessed_messages_count
+        # sends made by replayed handlers are answered with the replies recorded for them
+        replies = _recorded_replies(replay)
+        answer_send = functools.partial(_answer_replayed_send, replies)
+        self.message_queue.put_listeners.append(answer_send)
+        # replayed handlers are not part of the run being profiled
+        self.profiler.enabled = False
+        try:
+            for timestamped_message in replay:
+                await asyncio.wait_for(self._replay_message(timestamped_message.message), self.replay_timeout)
+        except asyncio.TimeoutError:
+            message = (
+                f"Replaying message {timestamped_message.timestamp} took longer than {self.replay_timeout}s, "
+                f"agents were restored to checkpoint {checkpoint_time} instead of timestamp {timestamp}"
+            )
+            print(f"[WARN] {message}")
+            self.logger.warning(message)
+            await self.runtime.load_state(checkpoint)
+            return False
+        finally:
+            self.profiler.enabled = True
+            self.message_queue.put_listeners.remove(answer_send)
+            # anything the agents sent while replaying was already recorded in history, so it is discarded
+            self._truncate_message_queue(queue_size)
+        return True
+
+    async def _replay_message(self, message: AGEPublishMessage | AGESendMessage | AGEResponseMessage) -> None:
+        """
+        Deliver a recorded message straight to its recipient agents, bypassing the queue and intervention handler.
+        Responses are skipped as they only resolve the original sender's pending future.
+        """
+        if isinstance(message, AGEResponseMessage):
+            return
+
+        for agent_id in await self._get_recipients(message):
+            agent = await self.runtime._get_agent(agent_id)
+            message_context = MessageContext(
+                sender=message.sender,
+                topic_id=message.topic_id if isinstance(message, AGEPublishMessage) else None,
+                is_rpc=isinstance(message, AGESendMessage),
+                cancellation_token=CancellationToken(),
+                message_id=message.message_id,
+            )
+            with MessageHandlerContext.populate_context(agent_id):
+                try:
+                    await agent.on_message(message.message, ctx=message_context)
+                except Exception as e:
+                    print(f"[WARN] Error replaying message to {agent_id}: ", e)
+
+    def _truncate_message_queue(self, size: int) -> None:
+        queue = self.message_queue
+        with queue.batch():
+            while queue.qsize() > size:
+                _cancel_envelope(queue.delete(-1))
+
+    def history_message_to_json(self, message: TimeStampedMessage) -> Dict[str, Any]:
+        return self.json_cache.history_json(message)
+
+    def invalidate_history_json(self, cutoff: int) -> None:
+        """
+        Drop cached serialized messages at or after the cutoff timestamp.
+        """
+        self.json_cache.invalidate_history(cutoff)
+
+    def message_queue_json(self) -> List[Dict[str, Any]]:
+        return self.json_cache.queue_json(self.message_queue_list)
+
+    def message_queue_json_bytes(self) -> bytes:
+        return self.json_cache.queue_bytes(self.message_queue_list)
+
+    def get_current_history(self, since_timestamp: int | None = None) -> List[Dict[str, Any]]:
+        start = None if since_timestamp is None else since_timestamp + 1
+        return [self.history_message_to_json(m) for m in self.intervention_handler.history.between(start)]
 
     def save_history_session_from_reset(self, new_reset_from: int) -> None:
         self.prior_histories[self.session_counter] = MessageHistorySession(
@@ -142,8 +564,8 @@ class BackendRuntimeManager:
         self.session_counter += 1
         self.current_session_reset_from = new_reset_from
 
-    def read_current_session_history(self):
-        saved_sessions = self.prior_histories.copy()
+    def read_current_session_history(self) -> Dict[int, MessageHistorySession]:
+        saved_sessions = dict(self.prior_histories)
 
         # save current messages
         saved_sessions[self.session_counter] = MessageHistorySession(
@@ -154,6 +576,76 @@ class BackendRuntimeManager:
         )
         return saved_sessions
 
+    def read_session_history_since(self, since_timestamp: int | None, session: int | None) -> Dict[str, Any]:
+        """
+        Read the session history relative to a client cursor.
+
+        If the client is on the current session, only messages newer than since_timestamp are returned for the
+        current session. Otherwise (first load, or the session was reset since) everything is returned and the
+        client should replace its copy.
+        """
+        incremental = since_timestamp is not None and session == self.session_counter
+        if incremental:
+            message_history = {
+                self.session_counter: MessageHistorySession(
+                    messages=self.get_current_history(since_timestamp),
+                    current_session_reset_from=self.current_session_reset_from,
+                    next_session_starts_at=None,
+                    current_session_score=self.current_score,
+                )
+            }
+        else:
+            message_history = self.read_current_session_history()
+
+        history = self.intervention_handler.history
+        return {
+            "current_session": self.session_counter,
+            "incremental": incremental,
+            "latest_timestamp": history[-1].timestamp if len(history) > 0 else None,
+            "message_history": message_history,
+        }
+
+    def _session_json_bytes(self, messages: List[bytes], reset_from: int | None) -> bytes:
+        rest = encode_json(
+            {
+                "current_session_reset_from": reset_from,
+                "next_session_starts_at": None,
+                "current_session_score": self.current_score,
+            }
+        )
+        return b'{"messages":' + join_json_list(messages) + b"," + rest[1:]
+
+    def read_session_history_json(self, since_timestamp: int | None, session: int | None) -> bytes:
+        """
+        Same as read_session_history_since, encoded as JSON. Messages are spliced in from their cached encodings
+        instead of re-encoding the whole history on every poll.
+        """
+        history = self.intervention_handler.history
+        incremental = since_timestamp is not None and session == self.session_counter
+        sessions: Dict[int, bytes] = {}
+        if not incremental:
+            for session_id in sorted(self.prior_histories):
+                encoded = self._prior_history_bytes.get(session_id)
+                if encoded is None:
+                    encoded = encode_json(self.prior_histories[session_id])
+                    self._prior_history_bytes.put(session_id, encoded)
+                sessions[session_id] = encoded
+
+        start = None if not incremental else since_timestamp + 1  # type: ignore
+        sessions[self.session_counter] = self._session_json_bytes(
+            [self.json_cache.history_bytes(m) for m in history.between(start)], self.current_session_reset_from
+        )
+
+        header = encode_json(
+            {
+                "current_session": self.session_counter,
+                "incremental": incremental,
+                "latest_timestamp": history[-1].timestamp if len(history) > 0 else None,
+            }
+        )
+        message_history = b",".join(b'"%d":' % session_id + encoded for session_id, encoded in sessions.items())
+        return header[:-1] + b',"message_history":{' + message_history + b"}}"
+
     async def get_agent_config(self, agent_name) -> AgentInfo:
         agent_id = await self.runtime.get(agent_name, key=self.agent_key)
 
@@ -171,36 +663,156 @@ class BackendRuntimeManager:
         if isinstance(topic, str):
             topic = DefaultTopicId(topic)
 
-        asyncio.create_task(wait_for_future(self.runtime.publish_message(new_message, topic)))
+        self.tasks.spawn(self.runtime.publish_message(new_message, topic), name=f"publish {type(new_message).__name__}")
 
     async def send_message(self, new_message: Any, recipient: str | AgentId, sender=None):
         """
         SEND new message to the runtime.
         """
         agent_id = await self.runtime.get(recipient, key=self.agent_key)
-        return asyncio.create_task(wait_for_future(self.runtime.send_message(new_message, agent_id, sender=sender)))
+        task, _ = self._spawn_send(new_message, agent_id, sender=sender)
+        return task
 
-    async def edit_message_queue(self, new_message: Any, edit_idx: int):
+    def _spawn_send(
+        self, message: Any, recipient: AgentId, sender: AgentId | None = None, message_id: str | None = None
+    ) -> Tuple[asyncio.Task[Any], asyncio.Future[None]]:
         """
-        Edit existing message in the runtime queue.
+        Send through the runtime in a background task. Returns the task, which waits for the reply, and a future that
+        resolves once the message is on the queue (or fails if the send ended before it got there).
         """
-        if edit_idx >= self.runtime._message_queue.qsize():
-            raise IndexError(f"Index out of range in queue {edit_idx}")
+        message_id = str(uuid.uuid4()) if message_id is None else message_id
+        enqueued: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        enqueued.add_done_callback(_consume_result)
+        self._enqueue_waiters[message_id] = enqueued
+        task = self.tasks.spawn(
+            self.runtime.send_message(message, recipient, sender=sender, message_id=message_id),
+            name=f"send {type(message).__name__}",
+            queued=enqueued,
+        )
 
-        # #1 simple way -- directly edit queue array
-        # backend.runtime._message_queue._queue[editMessage.idx].message = newMessage
+        def _on_done(_: asyncio.Task[Any]) -> None:
+            self._enqueue_waiters.pop(message_id, None)
+            if not enqueued.done():
+                enqueued.set_exception(RuntimeError(f"Send of {type(message).__name__} ended before it was queued"))
 
-        # #2 more robust -- make new queue
-        current_queue = []
-        while not self.runtime._message_queue.empty():
-            current_queue.append(self.runtime._message_queue.get_nowait())
+        task.add_done_callback(_on_done)
+        return task, enqueued
 
-        current_queue[edit_idx].message = new_message
+    def _on_enqueue(self, envelope: Any) -> None:
+        waiter = self._enqueue_waiters.pop(getattr(envelope, "message_id", None), None)  # type: ignore
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
 
-        newQueue = Queue()
-        for item in current_queue:
-            await newQueue.put(item)
-        self.runtime._message_queue = newQueue
+    async def inject_messages(
+        self,
+        items: Sequence[InjectItem],
+        kind: InjectKind,
+        received: float | None = None,
+    ) -> List[InjectAck]:
+        """
+        Publish or send a batch of parsed messages through the runtime, queued in batch order. Recipients are resolved
+        for the whole batch before anything is queued, and each message is acknowledged once it is on the queue.
+        Nobody awaits the replies of injected sends. Returns one acknowledgement per item.
+        """
+        received = time.perf_counter() if received is None else received
+
+        targets: List[TopicId | AgentId | None] = []
+        errors: List[str | None] = []
+        for item in items:
+            target: TopicId | AgentId | None = None
+            error = item.error
+            if error is None and kind == "publish":
+                target = DefaultTopicId(item.target)  # type: ignore
+            elif error is None:
+                target = await self.runtime.get(item.target, key=self.agent_key)  # type: ignore
+                if target.type not in self.runtime._known_agent_names:
+                    error = f"Unknown recipient: {target}"
+            targets.append(target)
+            errors.append(error)
+
+        acks: List[InjectAck] = []
+        for item, target, error in zip(items, targets, errors, strict=True):
+            if error is not None:
+                acks.append(InjectAck(index=item.index, status="error", error=error))
+                continue
+            message_id = str(uuid.uuid4())
+            if isinstance(target, TopicId):
+                await self.runtime.publish_message(item.message, target, message_id=message_id)
+            else:
+                _, enqueued = self._spawn_send(item.message, target, message_id=message_id)  # type: ignore
+                try:
+                    await enqueued
+                except RuntimeError as e:
+                    acks.append(InjectAck(index=item.index, status="error", error=str(e)))
+                    continue
+            acks.append(
+                InjectAck(
+                    index=item.index,
+                    status="ok",
+                    message_id=message_id,
+                    latency=time.perf_counter() - received,
+                )
+            )
+        return acks
+
+    async def edit_message_queue(self, new_message: Any, edit_idx: int):
+        """
+        Edit existing message in the runtime queue.
+        """
+        self.apply_queue_operations([QueueOperation(op="edit", idx=edit_idx, message=new_message)])
+
+    def apply_queue_operations(self, operations: Sequence[QueueOperation]) -> None:
+        """
+        Edit, delete, move or insert queued messages in place. Either all operations are applied or, if one fails
+        (e.g. an index is out of range), none are.
+        """
+        queue = self.message_queue
+        removed = []
+        with queue.batch():
+            for operation in operations:
+                if operation.op == "edit":
+                    envelope = queue._queue[operation.idx]
+                    queue.replace(operation.idx, dataclasses.replace(envelope, message=operation.message))
+                elif operation.op == "delete":
+                    removed.append(queue.delete(operation.idx))
+                elif operation.op == "move":
+                    if operation.to_idx is None:
+                        raise ValueError("Moving a queued message needs to_idx")
+                    queue.move(operation.idx, operation.to_idx)
+                elif operation.op == "insert":
+                    if not 0 <= operation.idx <= queue.qsize():
+                        raise IndexError(f"Index out of range in queue {operation.idx}")
+                    queue.insert(operation.idx, self._make_envelope(operation))
+                else:
+                    raise ValueError(f"Unknown queue operation: {operation.op}")
+
+        for envelope in removed:
+            _cancel_envelope(envelope)
+
+    def _make_envelope(self, operation: QueueOperation) -> PublishMessageEnvelope | SendMessageEnvelope:
+        if operation.recipient is not None:
+            if operation.recipient.type not in self.runtime._known_agent_names:
+                raise ValueError(f"Unknown recipient: {operation.recipient}")
+            # nobody awaits the reply of an inserted send
+            future = asyncio.get_running_loop().create_future()
+            future.add_done_callback(_consume_result)
+            return SendMessageEnvelope(
+                message=operation.message,
+                sender=None,
+                recipient=operation.recipient,
+                future=future,
+                cancellation_token=CancellationToken(),
+                message_id=str(uuid.uuid4()),
+            )
+        if operation.topic_id is not None:
+            return PublishMessageEnvelope(
+                message=operation.message,
+                cancellation_token=CancellationToken(),
+                sender=None,
+                topic_id=operation.topic_id,
+                message_id=str(uuid.uuid4()),
+            )
+        raise ValueError("Inserting a message needs a topic or a recipient")
 
     async def edit_and_revert_message(self, new_message: Any | None, cutoff_timestamp: int):
         # immediately stop and clear queue
@@ -213,6 +825,19 @@ class BackendRuntimeManager:
 
         self.save_history_session_from_reset(cutoff_timestamp)
         self.intervention_handler.purge_history_after_cutoff(cutoff_timestamp)
+        if self.scoring is not None:
+            self.scoring.revert(cutoff_timestamp, self.intervention_handler.history)
+        self.invalidate_history_json(cutoff_timestamp)
+        if self.recording is not None:
+            self.recording.write_truncate(cutoff_timestamp)
+        self.events.publish("history_reset", {"session": self.session_counter})
+
+        # the prompts repeated until the session diverges are answered from the cache
+        if self.model_cache is not None:
+            self.model_cache.replay_until_miss()
+
+        # restore agents before re-sending, as replaying recorded messages clears anything queued
+        await self.restore_agents(cutoff_timestamp)
 
         # edit actual message and add to queue
         if new_message is None:
@@ -229,10 +854,3 @@ class BackendRuntimeManager:
             raise ValueError(
                 f"Failed to re-send message after history reset. Unsure how to handle message of type: {current_message.message}"
             )
-
-        # NOTE: reset can be slow if heavy state so performing after message is sent.
-        checkpoint = self.agent_checkpoints.get(cutoff_timestamp, None)
-        if checkpoint is not None:
-            await self.runtime.load_state(checkpoint)
-        else:
-            print("[WARN] Was unable to find agent state checkpoint for time ", cutoff_timestamp)
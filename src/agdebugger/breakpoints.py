@@ -0,0 +1,123 @@
+import json
+import re
+from dataclasses import dataclass
+from typing import AbstractSet, Any, Callable, List
+
+from autogen_core import AgentId
+
+from .serialization import serialize
+from .types import AGEPublishMessage, AGEResponseMessage, AGESendMessage, Breakpoint
+
+# (message, agents receiving it) -> hit
+Matcher = Callable[[AGEPublishMessage | AGESendMessage | AGEResponseMessage, AbstractSet[AgentId]], bool]
+
+_PATH_TOKEN = re.compile(r"\.?([^.\[\]]+)|\[(\d+|\*)\]")
+
+
+def _agent_matches(agent: AgentId | None, name: str) -> bool:
+    # "type" or the full "type/key"
+    return agent is not None and (agent.type == name or str(agent) == name)
+
+
+def parse_path(path: str) -> List[str | int]:
+    """
+    Parse a JSONPath-like path into keys and indices, e.g. "$.messages[0].content" or "messages[*].source".
+    "*" matches every element of a list or every value of an object.
+    """
+    path = path.strip()
+    if path.startswith("$"):
+        path = path[1:]
+
+    steps: List[str | int] = []
+    pos = 0
+    while pos < len(path):
+        match = _PATH_TOKEN.match(path, pos)
+        if match is None or match.end() == pos:
+            raise ValueError(f"Invalid path {path!r} at position {pos}")
+        key, index = match.groups()
+        if key is not None:
+            steps.append(key)
+        else:
+            steps.append("*" if index == "*" else int(index))
+        pos = match.end()
+    return steps
+
+
+def select(value: Any, steps: List[str | int]) -> List[Any]:
+    """
+    All values at the parsed path.
+    """
+    values = [value]
+    for step in steps:
+        selected: List[Any] = []
+        for v in values:
+            if step == "*":
+                if isinstance(v, dict):
+                    selected.extend(v.values())
+                elif isinstance(v, list):
+                    selected.extend(v)
+            elif isinstance(step, int):
+                if isinstance(v, list) and -len(v) <= step < len(v):
+                    selected.append(v[step])
+            elif isinstance(v, dict) and step in v:
+                selected.append(v[step])
+        values = selected
+    return values
+
+
+@dataclass
+class CompiledBreakpoint:
+    id: int
+    matches: Matcher
+    # whether matching needs the subscribers of published messages
+    needs_recipients: bool
+
+
+def compile_breakpoint(breakpoint: Breakpoint) -> CompiledBreakpoint:
+    """
+    Turn a breakpoint into a single matcher. Conditions are combined with AND, the cheap ones are checked first,
+    and the message is only serialized if a content condition needs it. Raises ValueError for a breakpoint without
+    any condition, which would otherwise match every message.
+    """
+    checks: List[Matcher] = []
+
+    if breakpoint.message_type is not None:
+        message_type = breakpoint.message_type
+        checks.append(lambda m, _: type(m.message).__name__ == message_type)
+
+    if breakpoint.sender is not None:
+        sender = breakpoint.sender
+        checks.append(lambda m, _: _agent_matches(m.sender, sender))
+
+    if breakpoint.recipient is not None:
+        recipient = breakpoint.recipient
+        checks.append(lambda _, recipients: any(_agent_matches(r, recipient) for r in recipients))
+
+    if breakpoint.topic is not None:
+        topic = breakpoint.topic
+        checks.append(
+            lambda m, _: isinstance(m, AGEPublishMessage) and (m.topic_id.type == topic or str(m.topic_id) == topic)
+        )
+
+    if breakpoint.content is not None or breakpoint.path is not None:
+        pattern = re.compile(breakpoint.content) if breakpoint.content is not None else None
+        steps = parse_path(breakpoint.path) if breakpoint.path is not None else None
+
+        def content_matches(
+            m: AGEPublishMessage | AGESendMessage | AGEResponseMessage, _: AbstractSet[AgentId]
+        ) -> bool:
+            serialized = serialize(m.message)
+            values = [serialized] if steps is None else select(serialized, steps)
+            if pattern is None:
+                return any(v is not None for v in values)
+            return any(pattern.search(v if isinstance(v, str) else json.dumps(v, default=str)) for v in values)
+
+        checks.append(content_matches)
+
+    if not checks:
+        raise ValueError("Breakpoint needs at least one condition")
+    if len(checks) == 1:
+        matches = checks[0]
+    else:
+        matches = lambda m, recipients: all(check(m, recipients) for check in checks)  # noqa: E731
+    return CompiledBreakpoint(breakpoint.id or 0, matches, breakpoint.recipient is not None)
@@ -0,0 +1,371 @@
+import asyncio
+import bisect
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Literal, Mapping, MutableMapping, Set, Tuple
+
+# node kinds in the content-addressed state tree
+_DICT = "d"
+_LIST = "l"
+_TUPLE = "t"
+_VALUE = "v"
+
+StateNode = Tuple[str, Any]
+
+
+def _digest(data: str) -> str:
+    return hashlib.blake2b(data.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+
+
+def node_digest(node: StateNode) -> str:
+    """
+    Content address of a state node. Container nodes refer to their children by digest.
+    """
+    kind, data = node
+    if kind == _VALUE:
+        return _digest(f"{type(data).__module__}.{type(data).__qualname__}:{data!r}")
+    return _digest(repr(node))
+
+
+CheckpointMode = Literal["every", "on_change", "boundary"]
+
+
+@dataclass
+class CheckpointPolicy:
+    """
+    When to snapshot agent state while messages are delivered.
+
+    - every: full checkpoint every `every_n` messages
+    - on_change: checkpoint every message, but only re-save agents that have handled a message since the last one
+    - boundary: full checkpoint only before GroupChatRequestPublish messages (i.e. at the start of each agent turn)
+
+    Reverting to a message without its own checkpoint restores the nearest earlier one and replays recorded messages.
+    """
+
+    mode: CheckpointMode = "every"
+    every_n: int = 1
+
+
+class CheckpointStore(MutableMapping[int, Mapping[str, Any]]):
+    """
+    Agent state checkpoints keyed by timestamp.
+
+    Each checkpoint is split per agent, and every agent state is interned as a tree of content-addressed nodes. Any
+    sub-tree that is unchanged between checkpoints (e.g. the earlier messages of a model context) is stored once and
+    shared, so memory grows with new content rather than with the full state size per message. Full states are
+    rebuilt on read.
+
+    Writes are serialized with a lock so a CheckpointWriter can fill the store from a background thread. Nodes and
+    per-checkpoint roots live in plain dicts unless other mappings are given (e.g. disk-backed ones from storage.py).
+    """
+
+    def __init__(
+        self,
+        nodes: MutableMapping[str, StateNode] | None = None,
+        roots: MutableMapping[int, Dict[str, str]] | None = None,
+    ) -> None:
+        self._nodes: MutableMapping[str, StateNode] = {} if nodes is None else nodes
+        self._checkpoints: MutableMapping[int, Dict[str, str]] = {} if roots is None else roots
+        self._timestamps: List[int] = sorted(self._checkpoints)
+        self._lock = threading.RLock()
+        # called with (timestamp, roots, newly added nodes) after every write, e.g. to append to a recording
+        self.write_listeners: List[Callable[[int, Dict[str, str], List[Tuple[str, StateNode]]], None]] = []
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        del state["_lock"]
+        del state["write_listeners"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+        self.write_listeners = []
+
+    @classmethod
+    def from_mapping(cls, checkpoints: Mapping[int, Mapping[str, Any]] | None) -> "CheckpointStore":
+        if isinstance(checkpoints, CheckpointStore):
+            return checkpoints
+
+        store = cls()
+        if checkpoints is not None:
+            for timestamp, state in checkpoints.items():
+                store[timestamp] = state
+        return store
+
+    def _intern(self, value: Any, new_nodes: List[Tuple[str, StateNode]]) -> str:
+        if isinstance(value, dict):
+            node: StateNode = (_DICT, tuple((key, self._intern(v, new_nodes)) for key, v in value.items()))
+        elif isinstance(value, (list, tuple)):
+            kind = _LIST if isinstance(value, list) else _TUPLE
+            node = (kind, tuple(self._intern(v, new_nodes) for v in value))
+        else:
+            node = (_VALUE, value)
+
+        digest = node_digest(node)
+        if digest not in self._nodes:
+            self._nodes[digest] = node
+            new_nodes.append((digest, node))
+        return digest
+
+    def _materialize(self, digest: str) -> Any:
+        kind, data = self._nodes[digest]
+        if kind == _DICT:
+            return {key: self._materialize(child) for key, child in data}
+        if kind == _LIST:
+            return [self._materialize(child) for child in data]
+        if kind == _TUPLE:
+            return tuple(self._materialize(child) for child in data)
+        return data
+
+    def _set_roots(self, timestamp: int, roots: Dict[str, str], new_nodes: List[Tuple[str, StateNode]]) -> None:
+        if timestamp not in self._checkpoints:
+            bisect.insort(self._timestamps, timestamp)
+        self._checkpoints[timestamp] = roots
+
+        for listener in self.write_listeners:
+            listener(timestamp, roots, new_nodes)
+
+    def __setitem__(self, timestamp: int, state: Mapping[str, Any]) -> None:
+        with self._lock:
+            new_nodes: List[Tuple[str, StateNode]] = []
+            roots = {agent_id: self._intern(agent_state, new_nodes) for agent_id, agent_state in state.items()}
+            self._set_roots(timestamp, roots, new_nodes)
+
+    def put_agents(self, timestamp: int, agent_states: Mapping[str, Any], base_timestamp: int) -> None:
+        """
+        Store a checkpoint that only re-saves some agents -- all others share their state with base_timestamp.
+        """
+        with self._lock:
+            new_nodes: List[Tuple[str, StateNode]] = []
+            roots = dict(self._checkpoints[base_timestamp])
+            roots.update(
+                {agent_id: self._intern(agent_state, new_nodes) for agent_id, agent_state in agent_states.items()}
+            )
+            self._set_roots(timestamp, roots, new_nodes)
+
+    def put_roots(self, timestamp: int, roots: Dict[str, str], new_nodes: List[Tuple[str, StateNode]]) -> None:
+        """
+        Store an already interned checkpoint, e.g. when loading a recording.
+        """
+        with self._lock:
+            for digest, node in new_nodes:
+                self._nodes[digest] = node
+            self._set_roots(timestamp, roots, new_nodes)
+
+    def export(self) -> Tuple[List[Tuple[str, StateNode]], Dict[int, Dict[str, str]]]:
+        """
+        Copy of all nodes and checkpoint roots, for writing the store out.
+        """
+        with self._lock:
+            return list(self._nodes.items()), {t: dict(self._checkpoints[t]) for t in self._timestamps}
+
+    def iter_nodes(self, digests: Iterable[str], seen: Set[str]) -> Iterator[Tuple[str, StateNode]]:
+        """
+        Nodes reachable from the given digests and not in seen, children before their parents. Adds them to seen.
+        """
+        for digest in digests:
+            if digest in seen:
+                continue
+            node = self._nodes[digest]
+            kind, data = node
+            if kind == _DICT:
+                yield from self.iter_nodes((child for _, child in data), seen)
+            elif kind in (_LIST, _TUPLE):
+                yield from self.iter_nodes(data, seen)
+            seen.add(digest)
+            yield digest, node
+
+    def nearest(self, timestamp: int) -> int | None:
+        """
+        Latest checkpoint timestamp at or before the given timestamp.
+        """
+        idx = bisect.bisect_right(self._timestamps, timestamp)
+        return self._timestamps[idx - 1] if idx > 0 else None
+
+    def latest(self) -> int | None:
+        return self._timestamps[-1] if len(self._timestamps) > 0 else None
+
+    def __getitem__(self, timestamp: int) -> Dict[str, Any]:
+        with self._lock:
+            roots = self._checkpoints[timestamp]
+            return {agent_id: self._materialize(root) for agent_id, root in roots.items()}
+
+    def __delitem__(self, timestamp: int) -> None:
+        with self._lock:
+            del self._checkpoints[timestamp]
+            self._timestamps.remove(timestamp)
+
+    def __iter__(self) -> Iterator[int]:
+        with self._lock:
+            return iter(list(self._checkpoints))
+
+    def __len__(self) -> int:
+        return len(self._checkpoints)
+
+    def __contains__(self, timestamp: object) -> bool:
+        return timestamp in self._checkpoints
+
+    def flush(self) -> None:
+        """
+        Persist buffered writes, for disk-backed mappings.
+        """
+        with self._lock:
+            for mapping in (self._nodes, self._checkpoints):
+                flush = getattr(mapping, "flush", None)
+                if flush is not None:
+                    flush()
+
+    def compact(self) -> int:
+        """
+        Drop nodes no longer reachable from any checkpoint (e.g. after deleting checkpoints). Returns number removed.
+        """
+        with self._lock:
+            return self._compact()
+
+    def _compact(self) -> int:
+        reachable = set()
+        stack = [root for roots in self._checkpoints.values() for root in roots.values()]
+        while stack:
+            digest = stack.pop()
+            if digest in reachable:
+                continue
+            reachable.add(digest)
+            kind, data = self._nodes[digest]
+            if kind == _DICT:
+                stack.extend(child for _, child in data)
+            elif kind in (_LIST, _TUPLE):
+                stack.extend(data)
+
+        unreachable = [digest for digest in self._nodes if digest not in reachable]
+        for digest in unreachable:
+            del self._nodes[digest]
+        return len(unreachable)
+
+    def stats(self) -> Dict[str, int]:
+        return {"checkpoints": len(self._checkpoints), "nodes": len(self._nodes)}
+
+
+def _copy_containers(value: Any) -> Any:
+    # copies the structure _intern walks; leaf values are stored as they are
+    if isinstance(value, Mapping):
+        return {key: _copy_containers(v) for key, v in value.items()}
+    if isinstance(value, list):
+        return [_copy_containers(v) for v in value]
+    if isinstance(value, tuple):
+        return tuple(_copy_containers(v) for v in value)
+    return value
+
+
+class CheckpointWriter:
+    """
+    Moves checkpoint storage off the message delivery path.
+
+    Captured states (copies of the containers returned by save_state) are queued and interned into the store by a single
+    background thread, in submission order. The queue is bounded: when it is full, submit waits, and the time spent
+    waiting is reported in stats() so slow storage shows up as backpressure instead of unbounded memory.
+    """
+
+    def __init__(self, store: CheckpointStore, max_pending: int = 64) -> None:
+        self.store = store
+        self.max_pending = max_pending
+        self._queue: asyncio.Queue[Tuple[int, Mapping[str, Any], int | None]] | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        self._task: asyncio.Task[None] | None = None
+
+        self.submitted = 0
+        self.written = 0
+        self.failed = 0
+        self.blocked = 0
+        self.blocked_seconds = 0.0
+        self.write_seconds = 0.0
+        self.max_depth = 0
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="agdebugger-checkpoint")
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+        await self.flush()
+        self._task.cancel()
+        self._task = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    @property
+    def pending(self) -> int:
+        return 0 if self._queue is None else self._queue.qsize()
+
+    async def submit(self, timestamp: int, state: Mapping[str, Any], base_timestamp: int | None = None) -> None:
+        """
+        Queue a full checkpoint, or with base_timestamp a partial one holding only the re-saved agents.
+        """
+        self.submitted += 1
+        # save_state may hand back the agent's live dicts and lists, which keep changing until the writer gets to them
+        state = _copy_containers(state)
+        if self._queue is None:
+            # not started -- store inline
+            self._write(timestamp, state, base_timestamp)
+            return
+
+        if self._queue.full():
+            self.blocked += 1
+            start = time.perf_counter()
+            await self._queue.put((timestamp, state, base_timestamp))
+            self.blocked_seconds += time.perf_counter() - start
+        else:
+            self._queue.put_nowait((timestamp, state, base_timestamp))
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+
+    async def flush(self) -> None:
+        """
+        Wait until every submitted checkpoint is in the store.
+        """
+        if self._queue is not None:
+            await self._queue.join()
+
+    def _write(self, timestamp: int, state: Mapping[str, Any], base_timestamp: int | None) -> None:
+        start = time.perf_counter()
+        try:
+            if base_timestamp is None:
+                self.store[timestamp] = state
+            else:
+                self.store.put_agents(timestamp, state, base_timestamp)
+            self.store.flush()
+            self.written += 1
+        except Exception as e:
+            self.failed += 1
+            print(f"[WARN] Failed to store checkpoint {timestamp}: ", e)
+        self.write_seconds += time.perf_counter() - start
+
+    async def _run(self) -> None:
+        assert self._queue is not None
+        loop = asyncio.get_running_loop()
+        while True:
+            timestamp, state, base_timestamp = await self._queue.get()
+            try:
+                await loop.run_in_executor(self._executor, self._write, timestamp, state, base_timestamp)
+            finally:
+                self._queue.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "max_depth": self.max_depth,
+            "submitted": self.submitted,
+            "written": self.written,
+            "failed": self.failed,
+            "blocked": self.blocked,
+            "blocked_seconds": self.blocked_seconds,
+            "write_seconds": self.write_seconds,
+            **self.store.stats(),
+        }
@@ -1,12 +1,26 @@
 import asyncio
+import os
 import pickle
+import sys
 import webbrowser
+from typing import List, Optional
 
 import typer
 import uvicorn
 from typing_extensions import Annotated
 
 from .app import get_server
+from .checkpoint import CheckpointPolicy
+from .history import MessageHistory
+from .hosting import SessionHost, get_host_server
+from .log import ListHandler
+from .model_cache import ModelResponseCache
+from .recording import RecordedSession, RecordingWriter, is_recording, open_recording
+from .replay import build_replay_jobs, parse_edits, replay_jobs
+from .scoring import SCORERS
+from .serialization import is_session_export, read_session_export
+from .storage import SqliteSessionStore
+from .types import TimeStampedMessage
 
 cli_app = typer.Typer()
 
@@ -21,6 +35,17 @@ def run(
     launch: Annotated[bool, typer.Option("--launch")] = False,
     history: str | None = None,
     cache: str | None = None,
+    checkpoint_policy: str = "every",
+    checkpoint_every: int = 1,
+    store: str | None = None,
+    store_cache_size: int = 1024,
+    record: str | None = None,
+    fsync: str = "interval",
+    log_capacity: int = 10000,
+    log_spill: str | None = None,
+    model_cache: str | None = None,
+    model_cache_mode: str = "record",
+    scorer: str | None = None,
 ):
     """
     Run the AGEDebugger app.
@@ -32,28 +57,206 @@ def run(
         workers (int, optional): Number of workers to run the UI with. Defaults to 1.
         reload (bool, optional): Whether to reload the UI on code changes. Defaults to False.
         open (bool, optional): Whether to open the UI in the browser. Defaults to False.
-        history (str, optional): Path to a history file to load.
+        history (str, optional): Path to a history file, session recording or session export to load.
         cache (str, optional): Path to a cache file to load.
+        checkpoint_policy (str, optional): When to checkpoint agent state: every, on_change or boundary. Defaults to every.
+        checkpoint_every (int, optional): Checkpoint every N messages with the `every` policy. Defaults to 1.
+        store (str, optional): SQLite file to keep history and checkpoints on disk in. Resumes the session if it exists.
+        store_cache_size (int, optional): Entries kept in memory with --store or a recording. Defaults to 1024.
+        record (str, optional): File to append messages and checkpoints to as they happen. Resumes it if it exists.
+        fsync (str, optional): When to fsync the recording: always, interval (~1s) or never. Defaults to interval.
+        log_capacity (int, optional): Log records kept in memory for the UI. Defaults to 10000.
+        log_spill (str, optional): File to append log records to once they no longer fit in memory.
+        model_cache (str, optional): JSON lines file to record model responses to and replay them from after a revert.
+        model_cache_mode (str, optional): record (replay after a revert, until the session diverges), replay or offline.
+            Defaults to record.
         scorer (str, optional): name of score function
     """
-    loaded_history = None
+    if checkpoint_policy not in ("every", "on_change", "boundary"):
+        raise typer.BadParameter("must be one of: every, on_change, boundary", param_hint="--checkpoint-policy")
+    if checkpoint_every < 1:
+        raise typer.BadParameter("must be at least 1", param_hint="--checkpoint-every")
+    policy = CheckpointPolicy(mode=checkpoint_policy, every_n=checkpoint_every)  # type: ignore
+    if fsync not in ("always", "interval", "never"):
+        raise typer.BadParameter("must be one of: always, interval, never", param_hint="--fsync")
+    if record is not None and store is not None:
+        raise typer.BadParameter("cannot be combined with --store", param_hint="--record")
+    if log_capacity < 1:
+        raise typer.BadParameter("must be at least 1", param_hint="--log-capacity")
+    if model_cache_mode not in ("record", "replay", "offline"):
+        raise typer.BadParameter("must be one of: record, replay, offline", param_hint="--model-cache-mode")
+    if scorer is not None and scorer not in SCORERS:
+        raise typer.BadParameter(f"must be one of: {', '.join(SCORERS)}", param_hint="--scorer")
+
+    resume_recording = record is not None and os.path.exists(record) and os.path.getsize(record) > 0
+    if resume_recording and (history is not None or cache is not None):
+        raise typer.BadParameter("cannot load --history/--cache when resuming a recording", param_hint="--record")
+    resume_store = store is not None and os.path.exists(store) and os.path.getsize(store) > 0
+    if resume_store and (history is not None or cache is not None):
+        raise typer.BadParameter("cannot load --history/--cache when resuming a store", param_hint="--store")
+
+    if resume_recording:
+        history = record
+    loaded_history, loaded_cache, recorded = load_session(history, cache, store_cache_size)
+
+    if launch:
+        webbrowser.open(f"http://{host}:{port}")
+
+    session_store = SqliteSessionStore(store, store_cache_size) if store is not None else None
+    recording = RecordingWriter(record, fsync=fsync) if record is not None else None  # type: ignore
+    log_handler = ListHandler(log_capacity, log_spill)
+    response_cache = ModelResponseCache(model_cache, model_cache_mode) if model_cache is not None else None  # type: ignore
+
+    asyncio.run(
+        async_run(
+            module,
+            loaded_history,
+            loaded_cache,
+            host,
+            port,
+            workers,
+            reload,
+            policy,
+            session_store,
+            recording,
+            not resume_recording,
+            log_handler,
+            response_cache,
+            SCORERS[scorer] if scorer is not None else None,
+        )
+    )
+
+    if recorded is not None:
+        recorded.close()
+
+
+def load_session(history: str | None, cache: str | None, store_cache_size: int = 1024):
+    """
+    Load a history file, session recording or session export, and optionally a cache file. Returns the history, the
+    checkpoints and the opened recording (to close when done), if it was one.
+    """
+    loaded_history: MessageHistory | List[TimeStampedMessage] | None = None
     loaded_cache = None
-    if history is not None:
+    recorded: RecordedSession | None = None
+    if history is not None and is_recording(history):
+        # only the index is read here -- messages and checkpoints are loaded as they are used
+        recorded = open_recording(history, store_cache_size)
+        loaded_history = recorded.history
+        loaded_cache = recorded.checkpoints
+    elif history is not None and is_session_export(history):
+        loaded_history, loaded_cache = read_session_export(history)
+    elif history is not None:
         with open(history, "rb") as f:
             loaded_history = pickle.load(f)
 
     if cache is not None:
         with open(cache, "rb") as f:
             loaded_cache = pickle.load(f)
+    return loaded_history, loaded_cache, recorded
 
-    if launch:
-        webbrowser.open(f"http://{host}:{port}")
 
-    asyncio.run(async_run(module, loaded_history, loaded_cache, host, port, workers, reload))
+@cli_app.command()
+def replay(
+    module: str,
+    history: Annotated[str, typer.Option()],
+    edits: Annotated[str, typer.Option()],
+    out: Annotated[str, typer.Option()],
+    cache: str | None = None,
+    scorer: str | None = None,
+    workers: int | None = None,
+    mode: str = "process",
+    max_steps: int = 1000,
+    model_cache: str | None = None,
+    model_cache_mode: str = "record",
+):
+    """
+    Replay a recorded session headlessly with scripted edits, one variant per edit, and write each variant's history
+    and score to a directory.
 
+    Args:
+        module (str): description of agent app loader
+        history (str): Path to the history file, session recording or session export to replay.
+        edits (str): JSON lines file of edits: {"timestamp": ..., "body": {...} | null, "name": ...} per variant.
+        out (str): Directory to write <name>.json per variant and summary.jsonl to.
+        cache (str, optional): Path to a cache file with the session's checkpoints.
+        scorer (str, optional): name of score function
+        workers (int, optional): Variants to run at once. Defaults to the number of CPUs.
+        mode (str, optional): Run variants in worker processes or threads. Defaults to process.
+        max_steps (int, optional): Messages to deliver at most per variant. Defaults to 1000.
+        model_cache (str, optional): JSON lines file of model responses the variants share, e.g. the one the session
+            was run with.
+        model_cache_mode (str, optional): record (replay after a revert, until the session diverges), replay or offline.
+            Defaults to record.
+    """
+    if scorer is not None and scorer not in SCORERS:
+        raise typer.BadParameter(f"must be one of: {', '.join(SCORERS)}", param_hint="--scorer")
+    if mode not in ("process", "thread"):
+        raise typer.BadParameter("must be one of: process, thread", param_hint="--mode")
+    if workers is not None and workers < 1:
+        raise typer.BadParameter("must be at least 1", param_hint="--workers")
+    if model_cache_mode not in ("record", "replay", "offline"):
+        raise typer.BadParameter("must be one of: record, replay, offline", param_hint="--model-cache-mode")
+
+    with open(edits, "r", encoding="utf-8") as f:
+        try:
+            parsed_edits = parse_edits(f.read())
+        except ValueError as e:
+            raise typer.BadParameter(str(e), param_hint="--edits") from e
+
+    loaded_history, loaded_cache, recorded = load_session(history, cache)
+    try:
+        if not loaded_cache:
+            raise typer.BadParameter("the session has no checkpoints to replay from", param_hint="--cache")
+        try:
+            jobs = build_replay_jobs(
+                module,
+                MessageHistory.from_messages(loaded_history),
+                loaded_cache,
+                parsed_edits,
+                max_steps,
+                scorer,
+                model_cache,
+                model_cache_mode,  # type: ignore
+            )
+        except ValueError as e:
+            raise typer.BadParameter(str(e), param_hint="--edits") from e
+    finally:
+        if recorded is not None:
+            recorded.close()
 
-async def async_run(module, loaded_history, loaded_cache, host, port, workers, reload):
-    server_app = await get_server(module, loaded_history, loaded_cache)
+    results = asyncio.run(replay_jobs(jobs, out, mode, workers))  # type: ignore
+    failed = sum(1 for result in results if result.error is not None)
+    print(f"Replayed {len(results)} variants to {out} ({failed} failed)")
+
+
+async def async_run(
+    module,
+    loaded_history,
+    loaded_cache,
+    host,
+    port,
+    workers,
+    reload,
+    checkpoint_policy=None,
+    session_store=None,
+    recording=None,
+    record_existing=True,
+    log_handler=None,
+    model_cache=None,
+    scorer=None,
+):
+    server_app = await get_server(
+        module,
+        loaded_history,
+        loaded_cache,
+        checkpoint_policy,
+        session_store,
+        recording,
+        record_existing,
+        log_handler,
+        model_cache,
+        scorer,
+    )
 
     config = uvicorn.Config(
         server_app,
@@ -67,6 +270,57 @@ async def async_run(module, loaded_history, loaded_cache, host, port, workers, r
     print("Starting server...")
     await server.serve()
 
+    if session_store is not None:
+        session_store.close()
+    if recording is not None:
+        recording.close()
+    if log_handler is not None:
+        log_handler.close()
+    if model_cache is not None:
+        model_cache.close()
+
+
+@cli_app.command()
+def host(
+    session: Annotated[Optional[List[str]], typer.Option("--session")] = None,
+    host: str = "127.0.0.1",
+    port: int = 8081,
+):
+    """
+    Host several debug sessions, each in its own worker process. Session APIs are served under /api/sessions/{id}/.
+
+    Args:
+        session (str, optional): Session to start, as id=module (e.g. chat=scenario:get_agent_team). Repeatable; more
+            sessions can be started with POST /api/sessions.
+        host (str, optional): Host to run the server on. Defaults to 127.0.0.1 (localhost).
+        port (int, optional): Port to run the server on. Defaults to 8081.
+    """
+    sessions = []
+    for spec in session or []:
+        session_id, sep, module = spec.partition("=")
+        if not sep or not session_id or not module:
+            raise typer.BadParameter(f"expected id=module, got {spec!r}", param_hint="--session")
+        sessions.append((session_id, module))
+    asyncio.run(async_host(sessions, host, port))
+
+
+async def async_host(sessions, host, port):
+    session_host = SessionHost()
+    for session_id, module in sessions:
+        await session_host.start_session(module, session_id)
+        print(f"Started session {session_id} ({module})")
+
+    server = uvicorn.Server(uvicorn.Config(get_host_server(session_host), host=host, port=port))
+    print("Starting server...")
+    try:
+        await server.serve()
+    finally:
+        await session_host.stop_all()
+
 
 def main_cli():
+    # `agdebugger module:app` predates the subcommands -- treat anything that is not a command as `run`'s module
+    commands = {command.name or command.callback.__name__ for command in cli_app.registered_commands}  # type: ignore
+    if len(sys.argv) > 1 and not sys.argv[1].startswith("-") and sys.argv[1] not in commands:
+        sys.argv.insert(1, "run")
     cli_app()
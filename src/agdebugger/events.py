@@ -0,0 +1,101 @@
+import asyncio
+import json
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, List
+
+from fastapi.encoders import jsonable_encoder
+
+
+@dataclass
+class DebuggerEvent:
+    type: str
+    data: Any = None
+
+
+# events that only signal "this changed" -- only the latest one is worth sending
+COALESCED_EVENT_TYPES = {"queue", "loop_status"}
+
+
+def _is_running_in(loop: asyncio.AbstractEventLoop) -> bool:
+    try:
+        return asyncio.get_running_loop() is loop
+    except RuntimeError:
+        return False
+
+
+class EventBroadcaster:
+    """Fans out debugger state changes to every connected event stream client. publish may be called from any thread."""
+
+    def __init__(self, max_queue_size: int = 1000) -> None:
+        self.max_queue_size = max_queue_size
+        self._subscribers: List[asyncio.Queue[DebuggerEvent]] = []
+        # the loop the subscribers live on; publishes from other threads (e.g. log capture) are handed to it
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    @property
+    def has_subscribers(self) -> bool:
+        return len(self._subscribers) > 0
+
+    def subscribe(self) -> asyncio.Queue[DebuggerEvent]:
+        self._loop = asyncio.get_running_loop()
+        queue: asyncio.Queue[DebuggerEvent] = asyncio.Queue(maxsize=self.max_queue_size)
+        self._subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue[DebuggerEvent]) -> None:
+        if queue in self._subscribers:
+            self._subscribers.remove(queue)
+
+    def publish(self, event_type: str, data: Any = None) -> None:
+        if not self._subscribers:
+            return
+
+        loop = self._loop
+        if loop is not None and not _is_running_in(loop):
+            try:
+                loop.call_soon_threadsafe(self.publish, event_type, data)
+            except RuntimeError:
+                pass  # loop already closed
+            return
+
+        event = DebuggerEvent(type=event_type, data=data)
+        for queue in self._subscribers:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # client fell behind -- drop what it has not read and ask it to re-fetch everything
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(DebuggerEvent(type="resync"))
+
+
+def format_sse(event: DebuggerEvent) -> str:
+    data = json.dumps(jsonable_encoder(event.data))
+    return f"event: {event.type}\ndata: {data}\n\n"
+
+
+async def stream_events(broadcaster: EventBroadcaster, keepalive_seconds: float = 15.0) -> AsyncIterator[str]:
+    """
+    Server-sent event stream of debugger events. Events that arrive together are sent in one batch, with
+    repeated state-change events collapsed to the latest one.
+    """
+    queue = broadcaster.subscribe()
+    try:
+        yield format_sse(DebuggerEvent(type="resync"))
+        while True:
+            try:
+                first = await asyncio.wait_for(queue.get(), timeout=keepalive_seconds)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+
+            batch = [first]
+            while not queue.empty():
+                batch.append(queue.get_nowait())
+
+            latest = {e.type: i for i, e in enumerate(batch) if e.type in COALESCED_EVENT_TYPES}
+            yield "".join(
+                format_sse(e) for i, e in enumerate(batch) if e.type not in COALESCED_EVENT_TYPES or latest[e.type] == i
+            )
+    finally:
+        broadcaster.unsubscribe(queue)
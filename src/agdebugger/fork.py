@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Literal, Mapping, Sequence
+
+from .backend import BackendRuntimeManager
+from .history import MessageHistory
+from .log import current_fork
+from .model_cache import ModelCacheMode, ModelResponseCache
+from .scoring import SCORERS, score_messages
+from .types import ScoreResult, TimeStampedMessage
+from .utils import load_app
+
+ForkMode = Literal["thread", "process"]
+
+
+@dataclass
+class ForkJob:
+    """
+    Everything a fork needs to run on its own: the messages from the checkpoint it starts from up to the fork
+    point, and that checkpoint. Picklable, so it can be sent to a worker process.
+    """
+
+    module: str
+    name: str
+    timestamp: int
+    # replaces the message at timestamp; None re-sends it unchanged
+    message: Any
+    history: List[TimeStampedMessage]
+    checkpoints: Dict[int, Mapping[str, Any]]
+    team_id: str | None
+    max_steps: int = 1000
+    # name of a SCORERS entry to score the branch with
+    scorer: str | None = None
+    # messages before the checkpoint, only needed for scoring the whole conversation
+    prefix: List[TimeStampedMessage] = field(default_factory=list)
+    # model response cache file to serve and record the fork's model calls with, shared with the live session
+    model_cache: str | None = None
+    model_cache_mode: ModelCacheMode = "record"
+
+
+@dataclass
+class ForkResult:
+    name: str
+    timestamp: int
+    # serialized messages of the branch, starting at the fork point
+    messages: List[Dict[str, Any]] = field(default_factory=list)
+    steps: int = 0
+    stop_reason: str | None = None
+    score: ScoreResult | None = None
+    seconds: float = 0.0
+    error: str | None = None
+
+
+def build_fork_jobs(
+    module: str,
+    history: MessageHistory,
+    checkpoints: Mapping[int, Mapping[str, Any]],
+    timestamp: int,
+    messages: Sequence[Any],
+    team_id: str | None,
+    max_steps: int = 1000,
+    scorer: str | None = None,
+    names: Sequence[str] | None = None,
+    model_cache: str | None = None,
+    model_cache_mode: ModelCacheMode = "record",
+) -> List[ForkJob]:
+    """
+    One job per message to try at timestamp. Only the nearest checkpoint at or before the timestamp and the messages
+    after it are copied into the jobs. team_id is the id of the forked team: agent ids in the checkpoints and history
+    contain it, so the new teams take it over. model_cache is the model response cache file the forks share.
+    """
+    if scorer is not None and scorer not in SCORERS:
+        raise ValueError(f"Unknown scorer {scorer}")
+    if history.get(timestamp) is None:
+        raise ValueError(f"Unable to find message in history with timestamp {timestamp}")
+    earlier = [t for t in checkpoints if t <= timestamp]
+    if not earlier:
+        raise ValueError(f"No checkpoint at or before timestamp {timestamp} to fork from")
+    checkpoint_time = max(earlier)
+    replay = list(history.between(checkpoint_time, timestamp + 1))
+    prefix = list(history.between(None, checkpoint_time)) if scorer is not None else []
+
+    return [
+        ForkJob(
+            module=module,
+            name=names[i] if names is not None else f"fork-{i}",
+            timestamp=timestamp,
+            message=message,
+            history=replay,
+            checkpoints={checkpoint_time: checkpoints[checkpoint_time]},
+            team_id=team_id,
+            max_steps=max_steps,
+            scorer=scorer,
+            prefix=prefix,
+            model_cache=model_cache,
+            model_cache_mode=model_cache_mode,
+        )
+        for i, message in enumerate(messages)
+    ]
+
+
+async def run_fork_async(job: ForkJob) -> ForkResult:
+    result = ForkResult(name=job.name, timestamp=job.timestamp)
+    start = time.perf_counter()
+    # keeps this runtime's events out of the live session's log and profile when run in a thread
+    current_fork.set(job.name)
+    backend = None
+    model_cache = None
+    try:
+        team = await load_app(job.module)
+        if job.team_id is not None:
+            team._team_id = job.team_id
+        logger = logging.getLogger(f"agdebugger.fork.{job.name}")
+        if job.model_cache is not None:
+            model_cache = ModelResponseCache(job.model_cache, job.model_cache_mode)
+        backend = BackendRuntimeManager(team, logger, job.history, job.checkpoints, model_cache=model_cache)
+        await backend.async_initialize()
+        await backend.edit_and_revert_message(job.message, job.timestamp)
+
+        summary = await backend.step(job.max_steps)
+        await backend.checkpoint_writer.close()
+        result.messages = backend.get_current_history()
+        result.steps = summary.steps
+        result.stop_reason = summary.stop_reason
+        if job.scorer is not None:
+            branch = job.prefix + list(backend.intervention_handler.history)
+            result.score = score_messages(branch, SCORERS[job.scorer])
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    finally:
+        if backend is not None:
+            backend.close()
+        if model_cache is not None:
+            model_cache.close()
+        result.seconds = time.perf_counter() - start
+    return result
+
+
+def run_fork(job: ForkJob) -> ForkResult:
+    """
+    Run a fork to completion on its own event loop, e.g. in a worker thread or process.
+    """
+    return asyncio.run(run_fork_async(job))
+
+
+def make_fork_executor(mode: ForkMode, max_workers: int | None = None) -> Executor:
+    if mode == "thread":
+        return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agdebugger-fork")
+    # spawn rather than fork: the server process has threads (loggers, executors) that must not be copied mid-state
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+async def fork_session(
+    jobs: Sequence[ForkJob], mode: ForkMode = "process", max_workers: int | None = None
+) -> List[ForkResult]:
+    """
+    Run forks concurrently, each with its own runtime on its own event loop, and return their results in order.
+    """
+    if not jobs:
+        return []
+    loop = asyncio.get_running_loop()
+    with make_fork_executor(mode, max_workers or len(jobs)) as executor:
+        results = await asyncio.gather(*(loop.run_in_executor(executor, run_fork, job) for job in jobs))
+    return list(results)
@@ -0,0 +1,69 @@
+import bisect
+from typing import Iterable, Iterator, List, Sequence, overload
+
+from .types import TimeStampedMessage
+
+
+def _timestamp(message: TimeStampedMessage) -> int:
+    return message.timestamp
+
+
+class MessageHistory(Sequence[TimeStampedMessage]):
+    """
+    Recorded messages of the current session, in timestamp order.
+
+    Timestamps only ever increase, so lookups are binary searches over the list and truncation is a slice delete.
+    """
+
+    def __init__(self, messages: Iterable[TimeStampedMessage] | None = None) -> None:
+        self._messages: List[TimeStampedMessage] = [] if messages is None else list(messages)
+
+    @classmethod
+    def from_messages(cls, messages: Iterable[TimeStampedMessage] | None) -> "MessageHistory":
+        if isinstance(messages, MessageHistory):
+            return messages
+        return cls(messages)
+
+    @overload
+    def __getitem__(self, idx: int) -> TimeStampedMessage: ...
+
+    @overload
+    def __getitem__(self, idx: slice) -> List[TimeStampedMessage]: ...
+
+    def __getitem__(self, idx: int | slice) -> TimeStampedMessage | List[TimeStampedMessage]:
+        return self._messages[idx]
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def __iter__(self) -> Iterator[TimeStampedMessage]:
+        return iter(self._messages)
+
+    def append(self, message: TimeStampedMessage) -> None:
+        self._messages.append(message)
+
+    def _index(self, timestamp: int) -> int:
+        """
+        Position of the first message at or after timestamp.
+        """
+        return bisect.bisect_left(self._messages, timestamp, key=_timestamp)
+
+    def get(self, timestamp: int) -> TimeStampedMessage | None:
+        idx = self._index(timestamp)
+        if idx == len(self._messages) or self._messages[idx].timestamp != timestamp:
+            return None
+        return self._messages[idx]
+
+    def between(self, start: int | None = None, stop: int | None = None) -> List[TimeStampedMessage]:
+        """
+        Messages with start <= timestamp < stop (either bound optional).
+        """
+        lo = 0 if start is None else self._index(start)
+        hi = len(self._messages) if stop is None else self._index(stop)
+        return self._messages[lo:hi]
+
+    def truncate(self, cutoff: int) -> None:
+        """
+        Remove messages at or after the cutoff timestamp.
+        """
+        del self._messages[self._index(cutoff) :]
@@ -0,0 +1,361 @@
+import asyncio
+import itertools
+import multiprocessing
+import os
+import threading
+import traceback
+import uuid
+from dataclasses import dataclass
+from multiprocessing.connection import Connection
+from typing import Dict, List, Tuple
+
+from fastapi import FastAPI, Request, Response
+from pydantic import BaseModel
+from starlette.types import ASGIApp, Message, Scope
+
+Headers = List[Tuple[bytes, bytes]]
+
+# responses that never end cannot be relayed as one message
+UNSUPPORTED_PATHS = {"events"}
+# recomputed by the host's response
+_HOP_HEADERS = {b"content-length", b"transfer-encoding", b"connection"}
+
+
+async def call_asgi(
+    app: ASGIApp, method: str, path: str, query_string: bytes, headers: Headers, body: bytes
+) -> Tuple[int, Headers, bytes]:
+    """
+    Run one HTTP request through an ASGI app in-process and collect the whole response.
+    """
+    scope: Scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query_string,
+        "headers": headers,
+        "client": ("127.0.0.1", 0),
+        "server": ("127.0.0.1", 0),
+    }
+    response_done = asyncio.Event()
+    request_sent = False
+    status = 500
+    response_headers: Headers = []
+    chunks: List[bytes] = []
+
+    async def receive() -> Message:
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await response_done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: Message) -> None:
+        nonlocal status, response_headers
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            response_headers = list(message.get("headers", []))
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                response_done.set()
+
+    await app(scope, receive, send)
+    response_done.set()
+    return status, response_headers, b"".join(chunks)
+
+
+class Lifespan:
+    """
+    Drives an ASGI app's startup and shutdown events, as a server would.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self._events: asyncio.Queue[Message] = asyncio.Queue()
+        self._completed: asyncio.Queue[str] = asyncio.Queue()
+        self._task: asyncio.Future[None] | None = None
+
+    async def _send(self, message: Message) -> None:
+        await self._completed.put(message["type"])
+
+    async def _run(self, event: str) -> None:
+        await self._events.put({"type": f"lifespan.{event}"})
+        completed = await self._completed.get()
+        if completed != f"lifespan.{event}.complete":
+            raise RuntimeError(f"ASGI app failed lifespan {event}: {completed}")
+
+    async def startup(self) -> None:
+        scope: Scope = {"type": "lifespan", "asgi": {"version": "3.0"}}
+        self._task = asyncio.ensure_future(self.app(scope, self._events.get, self._send))
+        await self._run("startup")
+
+    async def shutdown(self) -> None:
+        if self._task is not None:
+            await self._run("shutdown")
+            await self._task
+            self._task = None
+
+
+async def _serve_session(conn: Connection, module: str) -> None:
+    from .app import get_server
+
+    loop = asyncio.get_running_loop()
+    try:
+        app = await get_server(module)
+        lifespan = Lifespan(app)
+        await lifespan.startup()
+    except Exception as e:
+        conn.send(("failed", f"{type(e).__name__}: {e}"))
+        return
+    conn.send(("ready", None))
+
+    async def handle(request_id: int, method: str, path: str, query: bytes, headers: Headers, body: bytes) -> None:
+        try:
+            status, response_headers, response_body = await call_asgi(app, method, path, query, headers, body)
+        except Exception:
+            status, response_headers, response_body = 500, [], traceback.format_exc().encode()
+        # sends only happen on the loop thread, so responses never interleave
+        conn.send(("response", request_id, status, response_headers, response_body))
+
+    tasks = set()
+    while True:
+        try:
+            message = await loop.run_in_executor(None, conn.recv)
+        except EOFError:
+            break
+        if message[0] == "stop":
+            break
+        task = asyncio.create_task(handle(*message[1:]))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    for task in list(tasks):
+        task.cancel()
+    await lifespan.shutdown()
+
+
+def session_worker(conn: Connection, module: str) -> None:
+    """
+    Entry point of a session's worker process: host one debugger backend and answer requests relayed over conn.
+    """
+    # the host serves the UI; workers only answer API requests
+    os.environ["AGDEBUGGER_BACKEND_SERVE_UI"] = "FALSE"
+    try:
+        asyncio.run(_serve_session(conn, module))
+    finally:
+        conn.close()
+
+
+@dataclass
+class SessionInfo:
+    id: str
+    module: str
+    pid: int | None
+    alive: bool
+
+
+class SessionProcess:
+    """
+    A debug session running in its own worker process, with requests relayed over a pipe. Responses are matched to
+    requests by id, so many requests can be in flight at once.
+    """
+
+    def __init__(self, session_id: str, module: str) -> None:
+        self.id = session_id
+        self.module = module
+        context = multiprocessing.get_context("spawn")
+        self._conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=session_worker, args=(child_conn, module), name=f"agdebugger-session-{session_id}", daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self._request_ids = itertools.count()
+        self._pending: Dict[int, asyncio.Future[Tuple[int, Headers, bytes]]] = {}
+        self._send_lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._reader: threading.Thread | None = None
+
+    async def wait_ready(self, timeout: float = 120.0) -> None:
+        loop = asyncio.get_running_loop()
+        ready = await loop.run_in_executor(None, self._conn.poll, timeout)
+        if not ready:
+            self.terminate()
+            raise TimeoutError(f"Session {self.id} did not start within {timeout}s")
+        try:
+            kind, error = await loop.run_in_executor(None, self._conn.recv)
+        except EOFError:
+            kind, error = "failed", "worker exited during startup"
+        if kind != "ready":
+            self.terminate()
+            raise RuntimeError(f"Session {self.id} failed to start: {error}")
+
+        self._loop = loop
+        self._reader = threading.Thread(target=self._read_responses, name=f"agdebugger-session-{self.id}", daemon=True)
+        self._reader.start()
+
+    def _read_responses(self) -> None:
+        loop = self._loop
+        assert loop is not None
+        while True:
+            try:
+                _, request_id, status, headers, body = self._conn.recv()
+            except (EOFError, OSError):
+                break
+            # the host's loop may already be gone when a worker answers during shutdown
+            if loop.is_closed():
+                return
+            loop.call_soon_threadsafe(self._resolve, request_id, (status, headers, body))
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(self._fail_pending)
+
+    def _resolve(self, request_id: int, response: Tuple[int, Headers, bytes]) -> None:
+        future = self._pending.pop(request_id, None)
+        if future is not None and not future.done():
+            future.set_result(response)
+
+    def _fail_pending(self) -> None:
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError(f"Session {self.id} exited"))
+        self._pending.clear()
+
+    @property
+    def alive(self) -> bool:
+        return self.process.is_alive()
+
+    async def request(
+        self, method: str, path: str, query_string: bytes = b"", headers: Headers | None = None, body: bytes = b""
+    ) -> Tuple[int, Headers, bytes]:
+        if not self.alive:
+            raise ConnectionError(f"Session {self.id} is not running")
+        request_id = next(self._request_ids)
+        future: asyncio.Future[Tuple[int, Headers, bytes]] = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            with self._send_lock:
+                self._conn.send(("request", request_id, method, path, query_string, headers or [], body))
+        except (BrokenPipeError, OSError) as e:
+            self._pending.pop(request_id, None)
+            raise ConnectionError(f"Session {self.id} is not running") from e
+        return await future
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        try:
+            with self._send_lock:
+                self._conn.send(("stop",))
+        except (BrokenPipeError, OSError):
+            pass
+        await asyncio.get_running_loop().run_in_executor(None, self.process.join, timeout)
+        self.terminate()
+
+    def terminate(self) -> None:
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self._conn.close()
+
+    def info(self) -> SessionInfo:
+        return SessionInfo(id=self.id, module=self.module, pid=self.process.pid, alive=self.alive)
+
+
+class SessionHost:
+    """
+    Runs many debug sessions side by side, one worker process each, so a busy session cannot hold up the others.
+    """
+
+    def __init__(self) -> None:
+        self.sessions: Dict[str, SessionProcess] = {}
+
+    async def start_session(self, module: str, session_id: str | None = None) -> SessionProcess:
+        session_id = session_id or uuid.uuid4().hex[:8]
+        if session_id in self.sessions:
+            raise ValueError(f"Session {session_id} already exists")
+        session = SessionProcess(session_id, module)
+        self.sessions[session_id] = session
+        try:
+            await session.wait_ready()
+        except Exception:
+            del self.sessions[session_id]
+            raise
+        return session
+
+    async def stop_session(self, session_id: str) -> None:
+        session = self.sessions.pop(session_id)
+        await session.stop()
+
+    async def stop_all(self) -> None:
+        await asyncio.gather(*(self.stop_session(session_id) for session_id in list(self.sessions)))
+
+
+class StartSession(BaseModel):
+    module: str
+    id: str | None = None
+
+
+def get_host_server(host: SessionHost, serve_ui: bool = True) -> FastAPI:
+    """
+    Front server for a SessionHost. Session APIs are under /api/sessions/{id}/..., e.g. /api/sessions/a/agents.
+    """
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.staticfiles import StaticFiles
+
+    app = FastAPI()
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["http://localhost", "http://localhost:5173", "http://localhost:*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    app.router.add_event_handler("shutdown", host.stop_all)
+
+    @app.get("/api/sessions")
+    async def list_sessions():
+        return [session.info() for session in host.sessions.values()]
+
+    @app.post("/api/sessions")
+    async def start_session(request: StartSession):
+        try:
+            session = await host.start_session(request.module, request.id)
+        except (ValueError, RuntimeError, TimeoutError) as e:
+            return {"status": "error", "message": str(e)}
+        return {"status": "ok", "session": session.info()}
+
+    @app.delete("/api/sessions/{session_id}")
+    async def stop_session(session_id: str):
+        if session_id not in host.sessions:
+            return {"status": "error", "message": f"Unknown session {session_id}"}
+        await host.stop_session(session_id)
+        return {"status": "ok"}
+
+    @app.api_route("/api/sessions/{session_id}/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH"])
+    async def relay(session_id: str, path: str, request: Request):
+        session = host.sessions.get(session_id)
+        if session is None:
+            return Response(status_code=404, content=f"Unknown session {session_id}")
+        if path in UNSUPPORTED_PATHS:
+            return Response(status_code=501, content=f"/{path} is not available for hosted sessions")
+        headers = [(k, v) for k, v in request.headers.raw if k.lower() not in _HOP_HEADERS]
+        try:
+            status, response_headers, body = await session.request(
+                request.method, f"/api/{path}", request.url.query.encode(), headers, await request.body()
+            )
+        except ConnectionError as e:
+            return Response(status_code=502, content=str(e))
+        return Response(
+            content=body,
+            status_code=status,
+            headers={k.decode(): v.decode() for k, v in response_headers if k.lower() not in _HOP_HEADERS},
+        )
+
+    ui_folder_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "web/dist")
+    if serve_ui and os.path.isdir(ui_folder_path):
+        app.mount("/", StaticFiles(directory=ui_folder_path, html=True), name="ui")
+    return app
@@ -0,0 +1,51 @@
+import json
+from dataclasses import dataclass
+from typing import Any, List, Literal
+
+from .serialization import DeserializationError, Deserializer
+
+InjectKind = Literal["publish", "send"]
+
+
+@dataclass
+class InjectItem:
+    index: int
+    message: Any = None
+    # topic type for publishes, agent type for sends
+    target: str | None = None
+    error: str | None = None
+
+
+def parse_inject_batch(body: bytes | str, kind: InjectKind, deserializer: Deserializer) -> List[InjectItem]:
+    """
+    Parse an NDJSON batch, one {"topic" | "recipient": ..., "body": {...}} object per line. Blank lines are skipped;
+    lines that fail keep their index with an error so every line gets an acknowledgement.
+    """
+    if isinstance(body, bytes):
+        body = body.decode("utf-8")
+    target_key = "topic" if kind == "publish" else "recipient"
+
+    items: List[InjectItem] = []
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        item = InjectItem(index=len(items))
+        items.append(item)
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            item.error = f"Invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict) or not isinstance(record.get(target_key), str):
+            item.error = f"Expected an object with a {target_key!r} and a 'body'"
+            continue
+        if record.get("body") is None:
+            item.error = "Message body cannot be None"
+            continue
+        try:
+            item.message = deserializer.deserialize(record["body"])
+        except DeserializationError as e:
+            item.error = str(e)
+            continue
+        item.target = record[target_key]
+    return items
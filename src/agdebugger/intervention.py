@@ -1,13 +1,17 @@
+import asyncio
 import threading
-from typing import Any, Awaitable, Callable, List
+from typing import AbstractSet, Any, Awaitable, Callable, Dict, Iterable, List
 
 from autogen_core import AgentId, DropMessage, InterventionHandler, MessageContext
 
+from .breakpoints import CompiledBreakpoint, compile_breakpoint
+from .history import MessageHistory
 from .types import (
     AGEPublishMessage,
     AGEResponseMessage,
     AGESendMessage,
-    ScoreResult,
+    Breakpoint,
+    BreakpointHit,
     TimeStampedMessage,
 )
 
@@ -41,26 +45,109 @@ class AgDebuggerInterventionHandler(InterventionHandler):
 
     def __init__(
         self,
-        checkpointFunc: Callable[[int], Awaitable[None]],
-        history: List[TimeStampedMessage] | None = None,
+        checkpointFunc: Callable[[int, AGEPublishMessage | AGESendMessage | AGEResponseMessage], Awaitable[None]],
+        history: Iterable[TimeStampedMessage] | None = None,
     ) -> None:
         self.drop = False
-        self.history: List[TimeStampedMessage] = [] if history is None else history
+        self.history = MessageHistory.from_messages(history)
         self.timestamp_counter = Counter()
         self.checkpointFunc = checkpointFunc
-        self._current_score: ScoreResult | None = None
+        self.history_listeners: List[Callable[[TimeStampedMessage], None]] = []
+
+        # breakpoints are only checked when some are enabled, or after a step over
+        self.breakpoints: Dict[int, Breakpoint] = {}
+        self._compiled_breakpoints: List[CompiledBreakpoint] = []
+        self._needs_recipients = False
+        # subscribers of a published message, for breakpoints on recipients
+        self.recipients_func: (
+            Callable[[AGEPublishMessage | AGESendMessage | AGEResponseMessage], Awaitable[AbstractSet[AgentId]]] | None
+        ) = None
+        self._next_breakpoint_id = 0
+        self._break_next = False
+        # pause on a hit (free-running loop) or only record it (manual stepping)
+        self.pause_on_breakpoints = False
+        self._resume = asyncio.Event()
+        self.paused_at: BreakpointHit | None = None
+        self.breakpoint_hits = 0
+        self.breakpoint_listeners: List[Callable[[BreakpointHit], None]] = []
 
         if len(self.history) > 0:
             self.timestamp_counter.set(self.history[-1].timestamp + 1)
 
-    def invalidate_cache(self) -> None:
-        self._current_score = None
-
-    def handle_history_add(self, message: AGEPublishMessage | AGESendMessage | AGEResponseMessage) -> None:
+    def handle_history_add(self, message: AGEPublishMessage | AGESendMessage | AGEResponseMessage) -> int:
         curr_timestep = self.timestamp_counter.get()
-        self.history.append(TimeStampedMessage(message=message, timestamp=curr_timestep))
+        timestamped_message = TimeStampedMessage(message=message, timestamp=curr_timestep)
+        self.history.append(timestamped_message)
         self.timestamp_counter.increment()
 
+        for listener in self.history_listeners:
+            listener(timestamped_message)
+        return curr_timestep
+
+    def add_breakpoint(self, breakpoint: Breakpoint) -> Breakpoint:
+        """
+        Register (or with an existing id, replace) a breakpoint. Raises ValueError for an invalid regex or path, or
+        without any condition.
+        """
+        if breakpoint.id is None:
+            breakpoint = breakpoint.model_copy(update={"id": self._next_breakpoint_id})
+            self._next_breakpoint_id += 1
+        compile_breakpoint(breakpoint)  # validate before registering
+        self.breakpoints[breakpoint.id] = breakpoint  # type: ignore
+        self._compile_breakpoints()
+        return breakpoint
+
+    def remove_breakpoint(self, breakpoint_id: int) -> None:
+        del self.breakpoints[breakpoint_id]
+        self._compile_breakpoints()
+
+    def _compile_breakpoints(self) -> None:
+        self._compiled_breakpoints = [compile_breakpoint(bp) for bp in self.breakpoints.values() if bp.enabled]
+        self._needs_recipients = any(bp.needs_recipients for bp in self._compiled_breakpoints)
+
+    @property
+    def paused(self) -> bool:
+        return self.paused_at is not None
+
+    def resume(self, step_over: bool = False) -> None:
+        """
+        Deliver the message paused at. With step_over, break again on the next message.
+        """
+        self._break_next = step_over
+        self._resume.set()
+
+    async def _check_breakpoints(
+        self, message: AGEPublishMessage | AGESendMessage | AGEResponseMessage, timestamp: int
+    ) -> None:
+        if not self._compiled_breakpoints and not self._break_next:
+            return
+
+        recipients: AbstractSet[AgentId] = frozenset()
+        if not isinstance(message, AGEPublishMessage):
+            recipients = frozenset() if message.recipient is None else frozenset([message.recipient])
+        elif self._needs_recipients and self.recipients_func is not None:
+            recipients = await self.recipients_func(message)
+
+        breakpoint_id = next((bp.id for bp in self._compiled_breakpoints if bp.matches(message, recipients)), None)
+        if breakpoint_id is None and not self._break_next:
+            return
+
+        self._break_next = False
+        self.breakpoint_hits += 1
+        hit = BreakpointHit(breakpoint_id=breakpoint_id, timestamp=timestamp, paused=self.pause_on_breakpoints)
+        for listener in self.breakpoint_listeners:
+            listener(hit)
+        if not self.pause_on_breakpoints:
+            return
+
+        # holds up the runtime's processing loop until resumed
+        self._resume.clear()
+        self.paused_at = hit
+        try:
+            await self._resume.wait()
+        finally:
+            self.paused_at = None
+
     async def on_send(
         self, message: Any, *, message_context: MessageContext, recipient: AgentId
     ) -> Any | type[DropMessage]:
@@ -74,9 +161,9 @@ class AgDebuggerInterventionHandler(InterventionHandler):
             recipient=recipient,
             message_id=message_context.message_id,
         )
-        self.invalidate_cache()
-        await self.checkpointFunc(self.timestamp_counter.get())
-        self.handle_history_add(m)
+        await self.checkpointFunc(self.timestamp_counter.get(), m)
+        timestamp = self.handle_history_add(m)
+        await self._check_breakpoints(m, timestamp)
         return message
 
     async def on_publish(self, message: Any, *, message_context: MessageContext) -> Any | type[DropMessage]:
@@ -87,12 +174,12 @@ class AgDebuggerInterventionHandler(InterventionHandler):
         m = AGEPublishMessage(
             message=message,
             sender=message_context.sender,
-            topic_id=message_context.topic_id,  # type: ignore -- topic id guaranteed non-null for publish
+            topic_id=message_context.topic_id,  # type: ignore[arg-type]  # topic id guaranteed non-null for publish
             message_id=message_context.message_id,
         )
-        self.invalidate_cache()
-        await self.checkpointFunc(self.timestamp_counter.get())
-        self.handle_history_add(m)
+        await self.checkpointFunc(self.timestamp_counter.get(), m)
+        timestamp = self.handle_history_add(m)
+        await self._check_breakpoints(m, timestamp)
         return message
 
     async def on_response(self, message: Any, *, sender: AgentId, recipient: AgentId | None) -> Any | type[DropMessage]:
@@ -105,17 +192,16 @@ class AgDebuggerInterventionHandler(InterventionHandler):
             sender=sender,
             recipient=recipient,
         )
-        self.invalidate_cache()
-        await self.checkpointFunc(self.timestamp_counter.get())
-        self.handle_history_add(m)
+        await self.checkpointFunc(self.timestamp_counter.get(), m)
+        timestamp = self.handle_history_add(m)
+        await self._check_breakpoints(m, timestamp)
         return message
 
     def get_message_at_timestamp(self, timestamp: int) -> TimeStampedMessage | None:
-        return next((m for m in self.history if m.timestamp == timestamp), None)
+        return self.history.get(timestamp)
 
     def purge_history_after_cutoff(self, cutoff: int) -> None:
         """
         Remove messages from history after cutoff timestamp.
         """
-        self.history = [m for m in self.history if m.timestamp < cutoff]
-        self.invalidate_cache()
+        self.history.truncate(cutoff)
@@ -1,15 +1,19 @@
+import asyncio
 import pickle
+from typing import Any
 
 import aiofiles
 from autogen_core import SingleThreadedAgentRuntime
 
+from .checkpoint import CheckpointStore
 from .intervention import AgDebuggerInterventionHandler
+from .recording import write_recording
 
 #### utils for running intervention handler from python script
-STATE_CACHE = {}
+STATE_CACHE = CheckpointStore()
 
 
-async def save_agent_state_to_cache(runtime: SingleThreadedAgentRuntime, timestep: int) -> None:
+async def save_agent_state_to_cache(runtime: SingleThreadedAgentRuntime, timestep: int, message: Any = None) -> None:
     checkpoint = await runtime.save_state()
     STATE_CACHE[timestep] = checkpoint
 
@@ -18,13 +22,12 @@ async def write_cache_and_history(ihandler: AgDebuggerInterventionHandler) -> No
     # run_id = int(time.time())
     run_id = ""
 
-    hist_path = f"history{run_id}.pickle"
-    cache_path = f"cache{run_id}.pickle"
+    path = f"session{run_id}.agrec"
 
-    await write_file_async(hist_path, ihandler.history)
-    await write_file_async(cache_path, STATE_CACHE)
+    # written frame by frame in a thread, load with `agdebugger <module> --history <path>`
+    await asyncio.to_thread(write_recording, path, list(ihandler.history), STATE_CACHE)
 
-    print("Saved AgDebugger cache files to: ", [hist_path, cache_path])
+    print("Saved AgDebugger session recording to: ", path)
 
 
 async def write_file_async(path, data):
@@ -0,0 +1,91 @@
+import sys
+from typing import Any, Dict, Iterable, List, Tuple
+
+from autogen_core._single_threaded_agent_runtime import (
+    PublishMessageEnvelope,
+    ResponseMessageEnvelope,
+    SendMessageEnvelope,
+)
+from pydantic_core import to_json
+
+from .storage import LRUCache
+from .types import TimeStampedMessage
+from .utils import message_to_json
+
+Envelope = PublishMessageEnvelope | SendMessageEnvelope | ResponseMessageEnvelope
+
+
+def encode_json(value: Any) -> bytes:
+    # same output FastAPI would produce, without going through jsonable_encoder first
+    return to_json(value, fallback=str)
+
+
+def join_json_list(items: Iterable[bytes]) -> bytes:
+    return b"[" + b",".join(items) + b"]"
+
+
+class MessageJsonCache:
+    """
+    Memoized message_to_json output, as dicts and as encoded JSON bytes.
+
+    History messages are keyed by timestamp since they never change once recorded; edits revert the history, which
+    must call invalidate_history. Queued envelopes are keyed by identity and only reused while the same envelope
+    still holds the same message, so queue edits (which swap in new envelopes) never return stale output. The
+    returned dicts are shared and must not be modified.
+
+    With history_size, only that many history messages are kept (least recently used first out), e.g. when the
+    history itself lives on disk.
+    """
+
+    def __init__(self, history_size: int | None = None) -> None:
+        self._history: LRUCache[int, Tuple[Dict[str, Any], bytes | None]] = LRUCache(
+            history_size if history_size is not None else sys.maxsize
+        )
+        # id(envelope) -> (envelope, message, json, encoded). Holding the envelope keeps its id from being reused.
+        self._queue: Dict[int, Tuple[Envelope, Any, Dict[str, Any], bytes]] = {}
+
+    def history_json(self, message: TimeStampedMessage) -> Dict[str, Any]:
+        entry = self._history.get(message.timestamp)
+        if entry is None:
+            entry = (message_to_json(message.message, message.timestamp), None)
+            self._history.put(message.timestamp, entry)
+        return entry[0]
+
+    def history_bytes(self, message: TimeStampedMessage) -> bytes:
+        entry = self._history.get(message.timestamp)
+        if entry is None or entry[1] is None:
+            serialized = self.history_json(message)
+            entry = (serialized, encode_json(serialized))
+            self._history.put(message.timestamp, entry)
+        return entry[1]  # type: ignore
+
+    def invalidate_history(self, cutoff: int) -> None:
+        """
+        Drop cached messages at or after the cutoff timestamp.
+        """
+        for timestamp in [t for t in self._history if t >= cutoff]:
+            self._history.discard(timestamp)
+
+    def _queue_entries(self, envelopes: List[Envelope]) -> List[Tuple[Envelope, Any, Dict[str, Any], bytes]]:
+        entries = []
+        queue: Dict[int, Tuple[Envelope, Any, Dict[str, Any], bytes]] = {}
+        for envelope in envelopes:
+            entry = self._queue.get(id(envelope))
+            if entry is None or entry[0] is not envelope or entry[1] is not envelope.message:
+                serialized = message_to_json(envelope)
+                entry = (envelope, envelope.message, serialized, encode_json(serialized))
+            queue[id(envelope)] = entry
+            entries.append(entry)
+        # only keep envelopes that are still queued
+        self._queue = queue
+        return entries
+
+    def queue_json(self, envelopes: List[Envelope]) -> List[Dict[str, Any]]:
+        return [entry[2] for entry in self._queue_entries(envelopes)]
+
+    def queue_bytes(self, envelopes: List[Envelope]) -> bytes:
+        return join_json_list(entry[3] for entry in self._queue_entries(envelopes))
+
+    def clear(self) -> None:
+        self._history.clear()
+        self._queue.clear()
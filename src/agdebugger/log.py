@@ -1,5 +1,11 @@
+import json
 import logging
-from typing import List
+import queue
+from collections import deque
+from contextvars import ContextVar
+from itertools import islice
+from logging.handlers import QueueHandler, QueueListener
+from typing import IO, Any, Callable, Deque, Iterable, List
 
 from pydantic import BaseModel
 
@@ -10,30 +16,177 @@ from pydantic import BaseModel
 # from .types import ThoughtMessage
 
 
+# name of the fork running in the current context, if any (see fork.py). Forks run in threads share the process-wide
+# event logger with the live session, so handlers check it to keep only their own runtime's records.
+current_fork: ContextVar[str | None] = ContextVar("agdebugger_current_fork", default=None)
+
+
+class CurrentForkFilter(logging.Filter):
+    """
+    Passes only records logged from the fork (or the live session) that was current when the filter was created.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.fork = current_fork.get()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return current_fork.get() == self.fork
+
+
 class LogMessage(BaseModel):
     message: str
     level: str
     name: str
     time: float
+    # position in the log, for paging with /logs?since=
+    id: int | None = None
+
+
+class LogEntry:
+    """
+    A captured log record. Kept as a plain slotted object so capturing stays cheap, and the message is only
+    formatted when first read -- event payloads can be large and most records are never looked at.
+    """
+
+    __slots__ = ("id", "level", "levelno", "name", "time", "_msg", "_args", "_message")
+
+    def __init__(self, id: int, msg: Any, args: Any, level: str, levelno: int, name: str, time: float) -> None:
+        self.id = id
+        self.level = level
+        self.levelno = levelno
+        self.name = name
+        self.time = time
+        self._msg = msg
+        self._args = args
+        self._message: str | None = None
+
+    @property
+    def message(self) -> str:
+        message = self._message
+        if message is None:
+            # same as LogRecord.getMessage
+            message = str(self._msg)
+            if self._args:
+                try:
+                    message = message % self._args
+                except (TypeError, ValueError):
+                    pass
+            self._message = message
+            self._msg = self._args = None
+        return message
+
+    def to_message(self) -> LogMessage:
+        return LogMessage(message=self.message, level=self.level, name=self.name, time=self.time, id=self.id)
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {"id": self.id, "message": self.message, "level": self.level, "name": self.name, "time": self.time}
+        )
 
 
 class ListHandler(logging.Handler):
-    def __init__(self) -> None:
+    """
+    Keeps the latest `capacity` log records in memory. Older records are dropped or, with spill_path, appended to
+    that file as JSON lines.
+    """
+
+    def __init__(self, capacity: int = 10000, spill_path: str | None = None) -> None:
         super().__init__()
-        self.log_messages: List[LogMessage] = []
+        self.capacity = capacity
+        self.spill_path = spill_path
+        self.entries: Deque[LogEntry] = deque(maxlen=capacity)
+        self.listeners: List[Callable[[LogEntry], None]] = []
+        self._next_id = 0
+        self._spill_file: IO[str] | None = None
 
     def emit(self, record: logging.LogRecord) -> None:
-        self.log_messages.append(
-            LogMessage(
-                message=str(record.msg),
-                level=record.levelname,
-                name=record.name,
-                time=record.created,
-            )
+        entry = LogEntry(
+            self._next_id, record.msg, record.args, record.levelname, record.levelno, record.name, record.created
         )
+        self._next_id += 1
+        if len(self.entries) == self.capacity and self.spill_path is not None:
+            self._spill(self.entries[0])
+        self.entries.append(entry)
+
+        for listener in self.listeners:
+            listener(entry)
+
+    def _spill(self, entry: LogEntry) -> None:
+        spill_file = self._spill_file
+        if spill_file is None:
+            assert self.spill_path is not None
+            spill_file = self._spill_file = open(self.spill_path, "a", encoding="utf-8")
+        spill_file.write(entry.to_json() + "\n")
+
+    def get_log_messages(
+        self, since: int | None = None, level: str | int | None = None, limit: int | None = None
+    ) -> List[LogMessage]:
+        """
+        Records after the `since` id, at or above `level`. With since, limit pages forward from it; without, it keeps
+        the most recent records.
+        """
+        levelno = None
+        if level is not None:
+            levelno = level if isinstance(level, int) else logging.getLevelName(level.upper())
+            if not isinstance(levelno, int):
+                raise ValueError(f"Unknown log level: {level}")
+
+        # records may be captured on another thread (see LogCapture)
+        with self.lock:  # type: ignore
+            entries: Iterable[LogEntry] = self.entries
+            if since is not None and len(self.entries) > 0:
+                # ids are consecutive, so the first record after since can be found without scanning
+                start = since + 1 - self.entries[0].id
+                entries = islice(self.entries, max(start, 0), None)
+            if levelno is not None:
+                entries = (e for e in entries if e.levelno >= levelno)
+
+            if limit is None:
+                selected = list(entries)
+            elif since is not None:
+                selected = list(islice(entries, limit))
+            else:
+                selected = list(deque(entries, maxlen=limit)) if limit > 0 else []
+        return [e.to_message() for e in selected]
+
+    def close(self) -> None:
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+        super().close()
+
+
+class _RecordQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # records stay in this process, so skip the default prepare(), which formats the message up front
+        return record
+
+
+class LogCapture:
+    """
+    Captures a logger's records into handlers on a background thread. The logging call only puts the record on a
+    queue, so the runtime logging every message event never waits on formatting, capture or listeners.
+    """
+
+    def __init__(self, logger: logging.Logger, *handlers: logging.Handler) -> None:
+        self.logger = logger
+        self._queue: queue.Queue[logging.LogRecord] = queue.Queue()
+        self.queue_handler = _RecordQueueHandler(self._queue)
+        self.queue_handler.addFilter(CurrentForkFilter())
+        self.listener = QueueListener(self._queue, *handlers, respect_handler_level=True)
+        self.listener.start()
+        logger.addHandler(self.queue_handler)
+
+    def flush(self) -> None:
+        """
+        Block until every record logged so far has been handled.
+        """
+        self._queue.join()
 
-    def get_log_messages(self) -> List[LogMessage]:
-        return self.log_messages
+    def close(self) -> None:
+        self.logger.removeHandler(self.queue_handler)
+        self.listener.stop()
 
 
 # class LogToHistoryHandler(logging.Handler):
@@ -0,0 +1,131 @@
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, TypeVar
+
+from autogen_core._queue import Queue
+
+T = TypeVar("T")
+
+
+class ObservableQueue(Queue[T]):
+    """
+    Runtime message queue that notifies listeners whenever an item is added or removed, and supports editing queued
+    items in place.
+
+    Edits happen under a lock and never swap out the underlying deque, so producers putting items concurrently are
+    never lost. Indexed edits near either end of the queue are O(1).
+    """
+
+    def __init__(self, maxsize: int = 0) -> None:
+        super().__init__(maxsize)
+        self.listeners: List[Callable[[], None]] = []
+        # called with each item added by producers (not with edits)
+        self.put_listeners: List[Callable[[T], None]] = []
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        self._changed = False
+
+    def _notify(self) -> None:
+        if self._batch_depth > 0:
+            self._changed = True
+            return
+        for listener in self.listeners:
+            listener()
+
+    def _put(self, item: T) -> None:
+        with self._lock:
+            super()._put(item)
+        for listener in self.put_listeners:
+            listener(item)
+        self._notify()
+
+    def _get(self) -> T:
+        with self._lock:
+            item = super()._get()
+        self._notify()
+        return item
+
+    def replace(self, idx: int, item: T) -> T:
+        """
+        Swap the item at idx, returning the old one.
+        """
+        with self._lock:
+            old = self._queue[idx]
+            self._queue[idx] = item
+        self._notify()
+        return old
+
+    def delete(self, idx: int) -> T:
+        """
+        Remove the item at idx. It counts as done for join().
+        """
+        with self._lock:
+            item = self._queue[idx]
+            del self._queue[idx]
+            self.task_done()
+        self._notify()
+        return item
+
+    def insert(self, idx: int, item: T) -> None:
+        """
+        Add an item at idx (ignores maxsize).
+        """
+        with self._lock:
+            self._queue.insert(idx, item)
+            self._unfinished_tasks += 1
+            self._finished.clear()
+            self._wakeup_next(self._getters)
+        self._notify()
+
+    def move(self, idx: int, to_idx: int) -> None:
+        """
+        Move the item at idx so it ends up at position to_idx.
+        """
+        with self._lock:
+            if not -len(self._queue) <= to_idx < len(self._queue):
+                raise IndexError(f"Index out of range in queue {to_idx}")
+            to_idx %= len(self._queue)
+            item = self._queue[idx]
+            del self._queue[idx]
+            self._queue.insert(to_idx, item)
+        self._notify()
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """
+        Apply several edits atomically: listeners are notified once at the end, and if an edit fails the queue is
+        restored to how it was before the batch.
+        """
+        with self._lock:
+            items = list(self._queue)
+            unfinished = self._unfinished_tasks
+            self._batch_depth += 1
+            try:
+                yield
+            except BaseException:
+                self._queue.clear()
+                self._queue.extend(items)
+                self._unfinished_tasks = unfinished
+                if unfinished > 0:
+                    self._finished.clear()
+                else:
+                    self._finished.set()
+                raise
+            finally:
+                self._batch_depth -= 1
+
+        if self._batch_depth == 0 and self._changed:
+            self._changed = False
+            self._notify()
+
+    @classmethod
+    def from_queue(cls, queue: Queue[T]) -> "ObservableQueue[T]":
+        """
+        Take over the contents of an existing (not yet running) queue, including unfinished task accounting.
+        """
+        new_queue: ObservableQueue[T] = cls(queue.maxsize)
+        new_queue._queue.extend(queue._queue)
+        new_queue._unfinished_tasks = queue._unfinished_tasks
+        if new_queue._unfinished_tasks > 0:
+            new_queue._finished.clear()
+        return new_queue
@@ -0,0 +1,222 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Any, AsyncGenerator, Dict, List, Literal, Mapping, Optional, Sequence, Union
+
+from autogen_core import CancellationToken
+from autogen_core.models import (
+    ChatCompletionClient,
+    CreateResult,
+    LLMMessage,
+    ModelCapabilities,  # type: ignore
+    ModelInfo,
+    RequestUsage,
+)
+from autogen_core.tools import Tool, ToolSchema
+from pydantic_core import to_json
+
+# record: always call the model and keep the response
+# replay: serve kept responses, call the model (and keep the response) on a miss
+# offline: serve kept responses, fail on a miss
+ModelCacheMode = Literal["record", "replay", "offline"]
+
+
+class ModelCacheMiss(LookupError):
+    """
+    An offline model cache was asked for a prompt it has no response for.
+    """
+
+
+def client_identity(client: ChatCompletionClient) -> Dict[str, Any]:
+    """
+    What tells model clients apart in a prompt_key: the client class, the model it is configured for (when it
+    exposes one) and its model_info, so agents on different models do not share responses.
+    """
+    create_args = getattr(client, "_create_args", None)
+    model = create_args.get("model") if isinstance(create_args, Mapping) else getattr(client, "model", None)
+    try:
+        model_info: Any = dict(client.model_info)
+    except Exception:
+        model_info = None
+    return {"client": type(client).__qualname__, "model": model, "model_info": model_info}
+
+
+def prompt_key(
+    messages: Sequence[LLMMessage],
+    tools: Sequence[Tool | ToolSchema] = (),
+    json_output: Optional[bool] = None,
+    extra_create_args: Mapping[str, Any] = {},
+    client: Mapping[str, Any] | None = None,
+) -> str:
+    """
+    Hash of everything that goes into a model request, including the identity of the client it is sent to (see
+    client_identity).
+    """
+    tool_schemas = [tool.schema if isinstance(tool, Tool) else tool for tool in tools]
+    request = [list(messages), tool_schemas, json_output, dict(extra_create_args), client]
+    return hashlib.sha256(to_json(request, fallback=str)).hexdigest()
+
+
+class ModelResponseCache:
+    """
+    Model responses by prompt_key, optionally persisted to a JSON lines file that is appended to as responses are
+    recorded, so a later (or offline) run can reuse them. Later lines win when a prompt was recorded more than once.
+    Each response is appended with a single unbuffered write, so forks and replay jobs can share the file.
+    """
+
+    def __init__(self, path: str | None = None, mode: ModelCacheMode = "replay") -> None:
+        self.path = path
+        self.mode: ModelCacheMode = mode
+        self.hits = 0
+        self.misses = 0
+        self._record_on_miss = False
+        self._responses: Dict[str, CreateResult] = {}
+        self._lock = threading.Lock()
+        self._file = None
+        if path is not None:
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            record = json.loads(line)
+                            self._responses[record["key"]] = CreateResult.model_validate(record["result"])
+            self._file = open(path, "ab", buffering=0)
+
+    def __len__(self) -> int:
+        return len(self._responses)
+
+    def get(self, key: str) -> CreateResult | None:
+        if self.mode == "record":
+            return None
+        result = self._responses.get(key)
+        if result is None:
+            self.misses += 1
+            if self._record_on_miss:
+                self.mode = "record"
+                self._record_on_miss = False
+            if self.mode == "offline":
+                raise ModelCacheMiss(f"No recorded model response for prompt {key}")
+            return None
+        self.hits += 1
+        return result.model_copy(update={"cached": True})
+
+    def put(self, key: str, result: CreateResult) -> None:
+        with self._lock:
+            self._responses[key] = result
+            if self._file is not None:
+                line = json.dumps({"key": key, "result": result.model_dump(mode="json")}) + "\n"
+                self._file.write(line.encode("utf-8"))
+
+    def replay_until_miss(self) -> None:
+        """
+        In record mode, serve recorded responses until a prompt has none, then go back to recording. Used after a
+        revert: the agents re-handle messages they already handled, asking the same prompts, until the session
+        diverges from the recorded one.
+        """
+        if self.mode == "record":
+            self.mode = "replay"
+            self._record_on_miss = True
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class CachingChatCompletionClient(ChatCompletionClient):
+    """
+    Wraps a model client so its responses are recorded to, and served from, a ModelResponseCache. Responses served
+    from the cache are marked cached and do not count towards the wrapped client's usage.
+    """
+
+    def __init__(self, client: ChatCompletionClient, cache: ModelResponseCache) -> None:
+        self.client = client
+        self.cache = cache
+        self.identity = client_identity(client)
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        key = prompt_key(messages, tools, json_output, extra_create_args, self.identity)
+        result = self.cache.get(key)
+        if result is not None:
+            return result
+        result = await self.client.create(
+            messages,
+            tools=tools,
+            json_output=json_output,
+            extra_create_args=extra_create_args,
+            cancellation_token=cancellation_token,
+        )
+        self.cache.put(key, result)
+        return result
+
+    async def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        key = prompt_key(messages, tools, json_output, extra_create_args, self.identity)
+        result = self.cache.get(key)
+        if result is not None:
+            if isinstance(result.content, str):
+                yield result.content
+            yield result
+            return
+        async for chunk in self.client.create_stream(
+            messages,
+            tools=tools,
+            json_output=json_output,
+            extra_create_args=extra_create_args,
+            cancellation_token=cancellation_token,
+        ):
+            if isinstance(chunk, CreateResult):
+                self.cache.put(key, chunk)
+            yield chunk
+
+    def actual_usage(self) -> RequestUsage:
+        return self.client.actual_usage()
+
+    def total_usage(self) -> RequestUsage:
+        return self.client.total_usage()
+
+    def count_tokens(self, messages: Sequence[LLMMessage], *, tools: Sequence[Tool | ToolSchema] = []) -> int:
+        return self.client.count_tokens(messages, tools=tools)
+
+    def remaining_tokens(self, messages: Sequence[LLMMessage], *, tools: Sequence[Tool | ToolSchema] = []) -> int:
+        return self.client.remaining_tokens(messages, tools=tools)
+
+    @property
+    def capabilities(self) -> ModelCapabilities:  # type: ignore
+        return self.client.capabilities  # type: ignore
+
+    @property
+    def model_info(self) -> ModelInfo:
+        return self.client.model_info
+
+
+def wrap_model_clients(objects: Sequence[Any], cache: ModelResponseCache) -> List[CachingChatCompletionClient]:
+    """
+    Route the model clients held by objects (e.g. a team and its participants) through the cache, by replacing any
+    ChatCompletionClient attribute with a CachingChatCompletionClient around it. Returns the new wrappers.
+    """
+    wrapped = []
+    for obj in objects:
+        for name, value in list(vars(obj).items()):
+            if isinstance(value, ChatCompletionClient) and not isinstance(value, CachingChatCompletionClient):
+                client = CachingChatCompletionClient(value, cache)
+                setattr(obj, name, client)
+                wrapped.append(client)
+    return wrapped
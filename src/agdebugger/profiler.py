@@ -0,0 +1,225 @@
+import logging
+import statistics
+import time
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Tuple
+
+from autogen_core import Agent, MessageContext
+from autogen_core.logging import LLMCallEvent
+
+from .log import CurrentForkFilter
+from .types import TimeStampedMessage
+
+
+@dataclass(slots=True)
+class HandlerSample:
+    """
+    One agent handling one message. Times are in seconds; start is wall-clock time.
+    """
+
+    id: int
+    agent: str
+    message_type: str
+    message_id: str | None
+    # history timestamp of the delivered message, if it went through the queue
+    timestamp: int | None
+    start: float
+    # time between the message being queued and delivered
+    queue_wait: float | None
+    duration: float
+    llm_calls: int = 0
+    # time spent in LLM calls -- see Profiler.on_llm_call
+    llm_seconds: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    error: str | None = None
+
+
+@dataclass
+class AgentProfile:
+    messages: int = 0
+    total_seconds: float = 0.0
+    mean_seconds: float = 0.0
+    p50_seconds: float = 0.0
+    p95_seconds: float = 0.0
+    max_seconds: float = 0.0
+    mean_queue_wait: float | None = None
+    errors: int = 0
+    llm_calls: int = 0
+    llm_seconds: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    # completion tokens per second of LLM time
+    tokens_per_second: float | None = None
+    message_types: Dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class _Span:
+    sample: HandlerSample
+    # end of the last LLM call, or when the handler started
+    mark: float
+
+
+class _LLMCallHandler(logging.Handler):
+    def __init__(self, profiler: "Profiler") -> None:
+        super().__init__()
+        self.profiler = profiler
+        self.fork_filter = CurrentForkFilter()
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        # runs synchronously in the agent's task, so the handler span is still in context; skips Handler's locking
+        # and filters since it only looks at one event type
+        if isinstance(record.msg, LLMCallEvent) and self.fork_filter.filter(record):
+            self.profiler.on_llm_call(record.msg)
+        return True
+
+    def emit(self, record: logging.LogRecord) -> None:
+        pass
+
+
+class Profiler:
+    """
+    Records how long each agent takes to handle each message, how long messages waited in the queue, and the LLM
+    calls and tokens spent while handling them, as a bounded series of HandlerSamples.
+
+    Handlers are timed by wrapping instantiated agents' on_message (see instrument); LLM calls come from the
+    LLMCallEvents model clients log to the event logger.
+    """
+
+    def __init__(self, logger: logging.Logger, capacity: int = 10000, pending_capacity: int = 10000) -> None:
+        self.enabled = True
+        self.samples: Deque[HandlerSample] = deque(maxlen=capacity)
+        self.pending_capacity = pending_capacity
+        # message id -> when it was queued, until it is delivered
+        self._enqueued: OrderedDict[str, float] = OrderedDict()
+        # message id -> (history timestamp, queue wait) of delivered messages, for the handlers that run on them
+        self._dispatched: OrderedDict[str, Tuple[int, float | None]] = OrderedDict()
+        self._span: ContextVar[_Span | None] = ContextVar("agdebugger_profiler_span", default=None)
+        self._next_id = 0
+        self.logger = logger
+        self._llm_handler = _LLMCallHandler(self)
+        logger.addHandler(self._llm_handler)
+
+    def close(self) -> None:
+        self.logger.removeHandler(self._llm_handler)
+
+    def reset(self) -> None:
+        self.samples.clear()
+        self._enqueued.clear()
+        self._dispatched.clear()
+
+    @staticmethod
+    def _remember(pending: "OrderedDict[str, Any]", key: str, value: Any, capacity: int) -> None:
+        # dropped or deleted messages never get delivered -- keep only the most recent entries
+        pending[key] = value
+        if len(pending) > capacity:
+            pending.popitem(last=False)
+
+    def on_enqueue(self, envelope: Any) -> None:
+        message_id = getattr(envelope, "message_id", None)
+        if self.enabled and message_id is not None:
+            self._remember(self._enqueued, message_id, time.perf_counter(), self.pending_capacity)
+
+    def on_dispatch(self, message: TimeStampedMessage) -> None:
+        message_id = getattr(message.message, "message_id", None)
+        if not self.enabled or message_id is None:
+            return
+        enqueued = self._enqueued.pop(message_id, None)
+        queue_wait = None if enqueued is None else time.perf_counter() - enqueued
+        self._remember(self._dispatched, message_id, (message.timestamp, queue_wait), self.pending_capacity)
+
+    def instrument(self, agent: Agent) -> None:
+        """
+        Time the agent's message handler. Safe to call more than once.
+        """
+        if "on_message" in vars(agent):
+            return
+        on_message = agent.on_message
+        agent_name = str(agent.id)
+
+        async def profiled_on_message(message: Any, ctx: MessageContext) -> Any:
+            if not self.enabled:
+                return await on_message(message, ctx)
+
+            timestamp, queue_wait = self._dispatched.get(ctx.message_id, (None, None))
+            sample = HandlerSample(
+                id=-1,
+                agent=agent_name,
+                message_type=type(message).__name__,
+                message_id=ctx.message_id,
+                timestamp=timestamp,
+                start=time.time(),
+                queue_wait=queue_wait,
+                duration=0.0,
+            )
+            start = time.perf_counter()
+            token = self._span.set(_Span(sample, start))
+            try:
+                return await on_message(message, ctx)
+            except BaseException as e:
+                sample.error = type(e).__name__
+                raise
+            finally:
+                self._span.reset(token)
+                sample.duration = time.perf_counter() - start
+                sample.id = self._next_id
+                self._next_id += 1
+                self.samples.append(sample)
+
+        agent.on_message = profiled_on_message  # type: ignore
+
+    def on_llm_call(self, event: LLMCallEvent) -> None:
+        """
+        Attribute an LLM call to the handler it was made from. Events carry no duration, so a call is taken to have
+        lasted since the handler started or its previous LLM call ended -- close enough for handlers that mostly wait
+        on the model.
+        """
+        span = self._span.get()
+        if span is None:
+            return
+        now = time.perf_counter()
+        span.sample.llm_calls += 1
+        span.sample.llm_seconds += now - span.mark
+        span.sample.prompt_tokens += event.prompt_tokens
+        span.sample.completion_tokens += event.completion_tokens
+        span.mark = now
+
+    def get_samples(self, since: int | None = None, limit: int | None = None) -> List[HandlerSample]:
+        samples = [s for s in self.samples if since is None or s.id > since]
+        return samples if limit is None else samples[:limit]
+
+    def summary(self) -> Dict[str, AgentProfile]:
+        """
+        Per-agent totals over the recorded samples, slowest agent (by total handler time) first.
+        """
+        by_agent: Dict[str, List[HandlerSample]] = {}
+        for sample in self.samples:
+            by_agent.setdefault(sample.agent, []).append(sample)
+
+        profiles = {}
+        for agent, samples in by_agent.items():
+            durations = sorted(s.duration for s in samples)
+            waits = [s.queue_wait for s in samples if s.queue_wait is not None]
+            profile = AgentProfile(
+                messages=len(samples),
+                total_seconds=sum(durations),
+                mean_seconds=statistics.fmean(durations),
+                p50_seconds=durations[len(durations) // 2],
+                p95_seconds=durations[min(len(durations) - 1, int(len(durations) * 0.95))],
+                max_seconds=durations[-1],
+                mean_queue_wait=statistics.fmean(waits) if waits else None,
+                errors=sum(1 for s in samples if s.error is not None),
+                llm_calls=sum(s.llm_calls for s in samples),
+                llm_seconds=sum(s.llm_seconds for s in samples),
+                prompt_tokens=sum(s.prompt_tokens for s in samples),
+                completion_tokens=sum(s.completion_tokens for s in samples),
+            )
+            if profile.llm_seconds > 0:
+                profile.tokens_per_second = profile.completion_tokens / profile.llm_seconds
+            for s in samples:
+                profile.message_types[s.message_type] = profile.message_types.get(s.message_type, 0) + 1
+            profiles[agent] = profile
+        return dict(sorted(profiles.items(), key=lambda item: item[1].total_seconds, reverse=True))
@@ -0,0 +1,450 @@
+import bisect
+import io
+import os
+import pickle
+import struct
+import threading
+import time
+from array import array
+from dataclasses import dataclass, field
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    Mapping,
+    MutableMapping,
+    Set,
+    Tuple,
+    TypeVar,
+    overload,
+)
+
+from .checkpoint import CheckpointStore, StateNode
+from .history import MessageHistory
+from .storage import LRUCache
+from .types import TimeStampedMessage
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+MAGIC = b"AGDBGREC"
+END_MAGIC = b"AGDBGEND"
+VERSION = 1
+
+# frame kinds
+FRAME_MESSAGE = 1
+FRAME_TRUNCATE = 2
+FRAME_CHECKPOINT = 3
+FRAME_INDEX = 4
+
+_HEADER = MAGIC + bytes([VERSION])
+_FRAME = struct.Struct("<IBq")  # payload length, kind, timestamp
+_FOOTER = struct.Struct("<Q8s")  # offset of the index frame, end magic
+
+FsyncPolicy = Literal["always", "interval", "never"]
+
+
+def is_recording(path: str) -> bool:
+    """
+    Whether the file at path is a session recording (as opposed to a pickled history or cache).
+    """
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+@dataclass
+class RecordingIndex:
+    """File offsets of the frames that make up the current state of a recording"""
+
+    message_timestamps: "array[int]" = field(default_factory=lambda: array("q"))
+    message_offsets: "array[int]" = field(default_factory=lambda: array("q"))
+    checkpoints: Dict[int, int] = field(default_factory=dict)
+    # state node digest -> offset of the checkpoint frame that introduced it
+    nodes: Dict[str, int] = field(default_factory=dict)
+
+    def add_message(self, timestamp: int, offset: int) -> None:
+        self.message_timestamps.append(timestamp)
+        self.message_offsets.append(offset)
+
+    def truncate(self, cutoff: int) -> None:
+        idx = bisect.bisect_left(self.message_timestamps, cutoff)
+        del self.message_timestamps[idx:]
+        del self.message_offsets[idx:]
+
+    def add_checkpoint(self, timestamp: int, offset: int, digests: Iterable[str]) -> None:
+        self.checkpoints[timestamp] = offset
+        for digest in digests:
+            self.nodes[digest] = offset
+
+
+def _encode_checkpoint(roots: Dict[str, str], new_nodes: List[Tuple[str, StateNode]]) -> bytes:
+    # roots and digests go first so indexing a recording can skip the (large) node values
+    return pickle.dumps((roots, [digest for digest, _ in new_nodes]), protocol=pickle.HIGHEST_PROTOCOL) + pickle.dumps(
+        [node for _, node in new_nodes], protocol=pickle.HIGHEST_PROTOCOL
+    )
+
+
+def _decode_checkpoint(payload: bytes) -> Tuple[Dict[str, str], Dict[str, StateNode]]:
+    buffer = io.BytesIO(payload)
+    roots, digests = pickle.load(buffer)
+    nodes = pickle.load(buffer)
+    return roots, dict(zip(digests, nodes, strict=True))
+
+
+def _check_header(f: IO[bytes]) -> None:
+    f.seek(0)
+    header = f.read(len(_HEADER))
+    if header[: len(MAGIC)] != MAGIC:
+        raise ValueError("not an agdebugger session recording")
+    if header[len(MAGIC) :] != bytes([VERSION]):
+        raise ValueError(f"unsupported recording version: {header[len(MAGIC) :]!r}")
+
+
+def _iter_frames(f: IO[bytes]) -> Iterator[Tuple[int, int, int, int]]:
+    """
+    Yields (offset, payload length, kind, timestamp) of every complete frame, with the file positioned at its payload.
+    """
+    _check_header(f)
+    size = os.fstat(f.fileno()).st_size
+    offset = len(_HEADER)
+    while offset + _FRAME.size <= size:
+        f.seek(offset)
+        length, kind, timestamp = _FRAME.unpack(f.read(_FRAME.size))
+        if offset + _FRAME.size + length > size:
+            return
+        yield offset, length, kind, timestamp
+        offset += _FRAME.size + length
+
+
+def _read_index(f: IO[bytes]) -> Tuple[RecordingIndex, int, bool]:
+    """
+    Index of a recording, the offset new frames go at, and whether it ended cleanly.
+
+    Uses the index written when the recording was closed. A recording that was not closed (e.g. the run crashed) is
+    indexed by walking its frame headers, up to the last complete frame.
+    """
+    _check_header(f)
+    size = os.fstat(f.fileno()).st_size
+    if size >= len(_HEADER) + _FRAME.size + _FOOTER.size:
+        f.seek(size - _FOOTER.size)
+        index_offset, end_magic = _FOOTER.unpack(f.read(_FOOTER.size))
+        if end_magic == END_MAGIC and index_offset < size:
+            f.seek(index_offset)
+            length, kind, _ = _FRAME.unpack(f.read(_FRAME.size))
+            if kind == FRAME_INDEX:
+                return pickle.loads(f.read(length)), index_offset, True
+
+    index = RecordingIndex()
+    end = len(_HEADER)
+    for offset, length, kind, timestamp in _iter_frames(f):
+        if kind == FRAME_INDEX:
+            return index, offset, True
+        if kind == FRAME_MESSAGE:
+            index.add_message(timestamp, offset)
+        elif kind == FRAME_TRUNCATE:
+            index.truncate(timestamp)
+        elif kind == FRAME_CHECKPOINT:
+            _, digests = pickle.load(f)
+            index.add_checkpoint(timestamp, offset, digests)
+        end = offset + _FRAME.size + length
+    return index, end, end == size
+
+
+class RecordingWriter:
+    """
+    Append-only session recording.
+
+    Every message, revert and checkpoint is written as one length-prefixed frame as soon as it happens, so saving
+    costs O(1) per message and a crashed run can still be loaded up to its last complete frame. Checkpoint frames
+    only carry the state nodes that are new to the store, so they stay as small as the store's own growth. On close,
+    an index of frame offsets is appended so the recording can be opened without reading it (see open_recording).
+
+    Frames are handed to the OS after each write; fsync is done on every frame ("always"), at most once per
+    fsync_interval seconds ("interval") or left to the OS ("never"). Checkpoint frames are written from the
+    checkpoint writer thread, so writes are serialized with a lock.
+    """
+
+    def __init__(self, path: str, fsync: FsyncPolicy = "interval", fsync_interval: float = 1.0) -> None:
+        self.path = path
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._last_sync = time.monotonic()
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            self._file: IO[bytes] = open(path, "r+b")
+            self.index, end, _ = _read_index(self._file)
+            # drop the index (or a partially written frame from a crash) before appending
+            self._file.truncate(end)
+            self._file.seek(end)
+        else:
+            self._file = open(path, "w+b")
+            self._file.write(_HEADER)
+            self._file.flush()
+            self.index = RecordingIndex()
+
+    def _write_frame(self, kind: int, timestamp: int, payload: bytes) -> int:
+        """
+        Append a frame, returning its offset. Must hold the lock.
+        """
+        offset = self._file.tell()
+        self._file.write(_FRAME.pack(len(payload), kind, timestamp) + payload)
+        self._file.flush()
+        now = time.monotonic()
+        if self.fsync == "always" or (self.fsync == "interval" and now - self._last_sync >= self.fsync_interval):
+            os.fsync(self._file.fileno())
+            self._last_sync = now
+        return offset
+
+    def write_message(self, message: TimeStampedMessage) -> None:
+        payload = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            if not self._file.closed:
+                self.index.add_message(message.timestamp, self._write_frame(FRAME_MESSAGE, message.timestamp, payload))
+
+    def write_truncate(self, cutoff: int) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._write_frame(FRAME_TRUNCATE, cutoff, b"")
+                self.index.truncate(cutoff)
+
+    def write_checkpoint(self, timestamp: int, roots: Dict[str, str], new_nodes: List[Tuple[str, StateNode]]) -> None:
+        payload = _encode_checkpoint(roots, new_nodes)
+        with self._lock:
+            if not self._file.closed:
+                offset = self._write_frame(FRAME_CHECKPOINT, timestamp, payload)
+                self.index.add_checkpoint(timestamp, offset, (digest for digest, _ in new_nodes))
+
+    def write_session(self, history: Iterable[TimeStampedMessage], checkpoints: CheckpointStore) -> None:
+        """
+        Record an already existing session, e.g. one loaded from files at startup.
+        """
+        nodes, roots = checkpoints.export()
+        written = False
+        for timestamp, checkpoint_roots in roots.items():
+            # all nodes go out with the first checkpoint
+            self.write_checkpoint(timestamp, checkpoint_roots, [] if written else nodes)
+            written = True
+        for message in history:
+            self.write_message(message)
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._last_sync = time.monotonic()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file.closed:
+                return
+            index_offset = self._write_frame(FRAME_INDEX, 0, pickle.dumps(self.index, protocol=pickle.HIGHEST_PROTOCOL))
+            self._file.write(_FOOTER.pack(index_offset, END_MAGIC))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+
+
+def write_recording(
+    path: str, history: Iterable[TimeStampedMessage], checkpoints: CheckpointStore | Mapping[int, Any]
+) -> None:
+    """
+    Write a whole session out as a recording, one frame at a time.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    writer = RecordingWriter(path, fsync="never")
+    try:
+        writer.write_session(history, CheckpointStore.from_mapping(checkpoints))
+    finally:
+        writer.close()
+
+
+class RecordingReader:
+    """
+    Random access to the frames of a recording, keeping recently decoded frames in an LRU cache. Safe to use from
+    the checkpoint writer thread.
+    """
+
+    def __init__(self, path: str, cache_size: int = 1024) -> None:
+        self.path = path
+        self._file: IO[bytes] = open(path, "rb")
+        self._lock = threading.Lock()
+        self._cache: LRUCache[int, Any] = LRUCache(cache_size)
+        self.index, _, self.complete = _read_index(self._file)
+
+    def read(self, offset: int) -> Any:
+        """
+        Decoded payload of the frame at offset: a TimeStampedMessage, or (roots, nodes) for a checkpoint.
+        """
+        with self._lock:
+            payload = self._cache.get(offset)
+            if payload is not None:
+                return payload
+
+            self._file.seek(offset)
+            length, kind, _ = _FRAME.unpack(self._file.read(_FRAME.size))
+            data = self._file.read(length)
+            payload = _decode_checkpoint(data) if kind == FRAME_CHECKPOINT else pickle.loads(data)
+            self._cache.put(offset, payload)
+            return payload
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class RecordedMapping(MutableMapping[K, V]):
+    """
+    Mapping whose values are read from recording frames on demand. Writes are kept in memory on top of them.
+    """
+
+    def __init__(self, reader: RecordingReader, offsets: Dict[K, int], extract: Callable[[Any, K], V]) -> None:
+        self._reader = reader
+        self._offsets = offsets
+        self._extract = extract
+        self._written: Dict[K, V] = {}
+        self._removed: Set[K] = set()
+        self._count = len(offsets)
+
+    def __getitem__(self, key: K) -> V:
+        if key in self._written:
+            return self._written[key]
+        if key in self._removed or key not in self._offsets:
+            raise KeyError(key)
+        return self._extract(self._reader.read(self._offsets[key]), key)
+
+    def __setitem__(self, key: K, value: V) -> None:
+        if key not in self:
+            self._count += 1
+        self._written[key] = value
+        self._removed.discard(key)
+
+    def __delitem__(self, key: K) -> None:
+        if key not in self:
+            raise KeyError(key)
+        self._count -= 1
+        self._written.pop(key, None)
+        if key in self._offsets:
+            self._removed.add(key)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._written or (key in self._offsets and key not in self._removed)
+
+    def __iter__(self) -> Iterator[K]:
+        recorded = [key for key in self._offsets if key not in self._removed and key not in self._written]
+        return iter(recorded + list(self._written))
+
+    def __len__(self) -> int:
+        return self._count
+
+
+class RecordedMessageHistory(MessageHistory):
+    """
+    Message history read from a recording on demand. Only timestamps and frame offsets are held in memory; messages
+    added during the session are kept in memory.
+    """
+
+    def __init__(self, reader: RecordingReader) -> None:
+        super().__init__()
+        self._reader = reader
+        self._timestamps = array("q", reader.index.message_timestamps)
+        # -1 for messages added since the recording was opened
+        self._offsets = array("q", reader.index.message_offsets)
+        self._added: Dict[int, TimeStampedMessage] = {}
+
+    def _load(self, idx: int) -> TimeStampedMessage:
+        offset = self._offsets[idx]
+        if offset < 0:
+            return self._added[self._timestamps[idx]]
+        message: TimeStampedMessage = self._reader.read(offset)
+        return message
+
+    @overload
+    def __getitem__(self, idx: int) -> TimeStampedMessage: ...
+
+    @overload
+    def __getitem__(self, idx: slice) -> List[TimeStampedMessage]: ...
+
+    def __getitem__(self, idx: int | slice) -> TimeStampedMessage | List[TimeStampedMessage]:
+        if isinstance(idx, slice):
+            return [self._load(i) for i in range(len(self._timestamps))[idx]]
+        return self._load(range(len(self._timestamps))[idx])
+
+    def __len__(self) -> int:
+        return len(self._timestamps)
+
+    def __iter__(self) -> Iterator[TimeStampedMessage]:
+        for i in range(len(self._timestamps)):
+            yield self._load(i)
+
+    def append(self, message: TimeStampedMessage) -> None:
+        self._timestamps.append(message.timestamp)
+        self._offsets.append(-1)
+        self._added[message.timestamp] = message
+
+    def get(self, timestamp: int) -> TimeStampedMessage | None:
+        idx = bisect.bisect_left(self._timestamps, timestamp)
+        if idx == len(self._timestamps) or self._timestamps[idx] != timestamp:
+            return None
+        return self._load(idx)
+
+    def between(self, start: int | None = None, stop: int | None = None) -> List[TimeStampedMessage]:
+        lo = 0 if start is None else bisect.bisect_left(self._timestamps, start)
+        hi = len(self._timestamps) if stop is None else bisect.bisect_left(self._timestamps, stop)
+        return [self._load(i) for i in range(lo, hi)]
+
+    def truncate(self, cutoff: int) -> None:
+        idx = bisect.bisect_left(self._timestamps, cutoff)
+        for t in self._timestamps[idx:]:
+            self._added.pop(t, None)
+        del self._timestamps[idx:]
+        del self._offsets[idx:]
+
+
+@dataclass
+class RecordedSession:
+    history: MessageHistory = field(default_factory=MessageHistory)
+    checkpoints: CheckpointStore = field(default_factory=CheckpointStore)
+    # False if the recording ended in a partially written frame (e.g. the run crashed)
+    complete: bool = True
+    reader: RecordingReader | None = None
+
+    def close(self) -> None:
+        if self.reader is not None:
+            self.reader.close()
+
+
+def open_recording(path: str, cache_size: int = 1024) -> RecordedSession:
+    """
+    Open a recording without loading it. Messages and checkpoint state are read from disk when first used, and up
+    to cache_size decoded frames are kept in memory.
+    """
+    reader = RecordingReader(path, cache_size)
+    if not reader.complete:
+        print(f"[WARN] Recording {path} was not closed cleanly, loaded up to its last complete frame")
+
+    checkpoints = CheckpointStore(
+        nodes=RecordedMapping(reader, reader.index.nodes, lambda payload, digest: payload[1][digest]),
+        roots=RecordedMapping(reader, reader.index.checkpoints, lambda payload, _: payload[0]),
+    )
+    return RecordedSession(RecordedMessageHistory(reader), checkpoints, reader.complete, reader)
+
+
+def read_recording(path: str) -> RecordedSession:
+    """
+    Load a whole recording into memory.
+    """
+    recorded = open_recording(path)
+    try:
+        nodes, roots = recorded.checkpoints.export()
+        return RecordedSession(MessageHistory(recorded.history), CheckpointStore(dict(nodes), roots), recorded.complete)
+    finally:
+        recorded.close()
@@ -0,0 +1,120 @@
+import asyncio
+import dataclasses
+import json
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping
+
+from .fork import ForkJob, ForkMode, ForkResult, build_fork_jobs, make_fork_executor, run_fork
+from .history import MessageHistory
+from .model_cache import ModelCacheMode
+from .serialization import DeserializationError, Deserializer
+from .types import EditHistoryMessage
+
+
+@dataclass
+class ReplayEdit:
+    name: str
+    timestamp: int
+    # None re-sends the original message
+    message: Any
+
+
+def parse_edits(text: str, deserializer: Deserializer | None = None) -> List[ReplayEdit]:
+    """
+    Parse an edit script: one EditHistoryMessage ({"timestamp": ..., "body": {...} | null}) per line, with an optional
+    "name" for the variant. Blank lines are skipped.
+    """
+    deserializer = deserializer or Deserializer()
+    edits: List[ReplayEdit] = []
+    for line_number, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            edit = EditHistoryMessage.model_validate(record)
+            message = None if edit.body is None else deserializer.deserialize(edit.body)
+        except (ValueError, DeserializationError) as e:
+            raise ValueError(f"Line {line_number}: {e}") from e
+        name = str(record.get("name") or f"edit-{len(edits)}")
+        edits.append(ReplayEdit(name=name, timestamp=edit.timestamp, message=message))
+
+    names = [edit.name for edit in edits]
+    if len(set(names)) != len(names):
+        raise ValueError("Variant names must be unique")
+    return edits
+
+
+def infer_team_id(checkpoints: Mapping[int, Mapping[str, Any]]) -> str | None:
+    """
+    The team id of a recorded session, from the agent ids ("type/key") its checkpoints were saved under.
+    """
+    for timestamp in sorted(checkpoints, reverse=True):
+        for agent_id in checkpoints[timestamp]:
+            if "/" in agent_id:
+                return agent_id.rsplit("/", 1)[1]
+    return None
+
+
+def build_replay_jobs(
+    module: str,
+    history: MessageHistory,
+    checkpoints: Mapping[int, Mapping[str, Any]],
+    edits: List[ReplayEdit],
+    max_steps: int = 1000,
+    scorer: str | None = None,
+    model_cache: str | None = None,
+    model_cache_mode: ModelCacheMode = "record",
+) -> List[ForkJob]:
+    team_id = infer_team_id(checkpoints)
+    jobs: List[ForkJob] = []
+    for edit in edits:
+        jobs.extend(
+            build_fork_jobs(
+                module,
+                history,
+                checkpoints,
+                edit.timestamp,
+                [edit.message],
+                team_id,
+                max_steps,
+                scorer,
+                [edit.name],
+                model_cache,
+                model_cache_mode,
+            )
+        )
+    return jobs
+
+
+def _file_name(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", name) + ".json"
+
+
+async def replay_jobs(
+    jobs: List[ForkJob], out_dir: str, mode: ForkMode = "process", max_workers: int | None = None
+) -> List[ForkResult]:
+    """
+    Run every job headlessly on a worker pool. Each variant's result is written to out_dir/<name>.json as soon as it
+    finishes, and a line is appended to out_dir/summary.jsonl, so an interrupted sweep keeps what it has done.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    loop = asyncio.get_running_loop()
+    results: List[ForkResult] = []
+    with (
+        make_fork_executor(mode, max_workers) as executor,
+        open(os.path.join(out_dir, "summary.jsonl"), "a", encoding="utf-8") as summary,
+    ):
+        for future in asyncio.as_completed([loop.run_in_executor(executor, run_fork, job) for job in jobs]):
+            result = await future
+            results.append(result)
+            record: Dict[str, Any] = dataclasses.asdict(result)
+            with open(os.path.join(out_dir, _file_name(result.name)), "w", encoding="utf-8") as f:
+                json.dump(record, f, default=str)
+            del record["messages"]
+            record["file"] = _file_name(result.name)
+            summary.write(json.dumps(record, default=str) + "\n")
+            summary.flush()
+            print(f"[{len(results)}/{len(jobs)}] {result.name}: {result.error or result.stop_reason}")
+    return results
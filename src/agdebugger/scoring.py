@@ -1,41 +1,135 @@
 """Similar to agbench tabulate utils for checking task completion of current session"""
 
-from typing import Callable, List
+import bisect
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Generic, Iterable, List, TypeVar
 
+from .history import MessageHistory
 from .types import ContentMessage, ScoreResult, TimeStampedMessage
 from .utils import parse_message_content
 
+S = TypeVar("S")
 
-def human_eval_scorer(messages: List[ContentMessage]) -> ScoreResult:
-    for m in messages:
-        if "ALL TESTS PASSED !#!#" in m.content:
-            return ScoreResult(
-                passed=True, first_timestamp=m.timestamp, expected=None, actual=None
-            )
-    return ScoreResult(passed=False, first_timestamp=None, expected=None, actual=None)
+HUMAN_EVAL_PASSED = "ALL TESTS PASSED !#!#"
 
 
-def run_score_func(
-    messages: List[TimeStampedMessage],
-    score_function: Callable[[List[ContentMessage]], ScoreResult] | None = None,
-) -> ScoreResult | None:
+def to_content_message(message: TimeStampedMessage) -> ContentMessage:
+    return ContentMessage(timestamp=message.timestamp, content=parse_message_content(message.message).content)
+
+
+class IncrementalScorer(ABC, Generic[S]):
     """
-    Tags each message with profile tags.
+    A score computed as a fold over a session's messages, one at a time. update must return a new state rather than
+    change the one it is given: states are kept as snapshots to resume from after a revert.
+    """
+
+    @abstractmethod
+    def initial(self) -> S: ...
+
+    @abstractmethod
+    def update(self, state: S, message: ContentMessage) -> S: ...
+
+    @abstractmethod
+    def result(self, state: S) -> ScoreResult: ...
+
 
-    Returns: array of same legnth
+class HumanEvalScorer(IncrementalScorer[int | None]):
     """
-    if score_function is None:
+    Passes once a message reports that all tests passed. The state is the timestamp of the first such message.
+    """
+
+    def initial(self) -> int | None:
         return None
 
-    content_messages = []
+    def update(self, state: int | None, message: ContentMessage) -> int | None:
+        if state is None and HUMAN_EVAL_PASSED in message.content:
+            return message.timestamp
+        return state
+
+    def result(self, state: int | None) -> ScoreResult:
+        return ScoreResult(passed=state is not None, first_timestamp=state, expected=None, actual=None)
+
 
+SCORERS: Dict[str, IncrementalScorer[Any]] = {"human_eval": HumanEvalScorer()}
+# the name older callers look scorers up by
+SCORE_FUNCS = SCORERS
+
+
+def human_eval_scorer(messages: List[ContentMessage]) -> ScoreResult:
+    scorer = HumanEvalScorer()
+    state = scorer.initial()
     for message in messages:
-        parsed_message = parse_message_content(message.message)
-        content_messages.append(
-            ContentMessage(timestamp=message.timestamp, content=parsed_message.content)
-        )
+        state = scorer.update(state, message)
+    return scorer.result(state)
 
-    return score_function(content_messages)
 
+class ScoringEngine(Generic[S]):
+    """
+    Keeps a session's score up to date as messages are added, parsing and scoring each message once.
 
-SCORE_FUNCS = {"human_eval": human_eval_scorer}
+    The scorer state from just before each checkpoint is kept (see snapshot), so after a revert the score resumes from
+    the nearest snapshot and only the messages between it and the revert point are scored again.
+    """
+
+    def __init__(self, scorer: IncrementalScorer[S], messages: Iterable[TimeStampedMessage] = ()) -> None:
+        self.scorer = scorer
+        self.state: S = scorer.initial()
+        self._result: ScoreResult | None = None
+        self._snapshot_times: List[int] = []
+        self._snapshots: Dict[int, S] = {}
+        self.extend(messages)
+
+    def add(self, message: TimeStampedMessage) -> None:
+        self.state = self.scorer.update(self.state, to_content_message(message))
+        self._result = None
+
+    def extend(self, messages: Iterable[TimeStampedMessage]) -> None:
+        for message in messages:
+            self.add(message)
+
+    def snapshot(self, timestamp: int) -> None:
+        """
+        Keep the current state as the one just before the message at timestamp, e.g. when agents are checkpointed.
+        """
+        if timestamp not in self._snapshots:
+            bisect.insort(self._snapshot_times, timestamp)
+        self._snapshots[timestamp] = self.state
+
+    def revert(self, cutoff: int, history: MessageHistory) -> None:
+        """
+        Rewind to just before the message at cutoff, given the history that remains after truncating it there.
+        """
+        idx = bisect.bisect_right(self._snapshot_times, cutoff)
+        for timestamp in self._snapshot_times[idx:]:
+            del self._snapshots[timestamp]
+        del self._snapshot_times[idx:]
+
+        if self._snapshot_times:
+            start = self._snapshot_times[-1]
+            self.state = self._snapshots[start]
+        else:
+            start = None
+            self.state = self.scorer.initial()
+        self._result = None
+        self.extend(history.between(start, cutoff))
+
+    @property
+    def score(self) -> ScoreResult:
+        if self._result is None:
+            self._result = self.scorer.result(self.state)
+        return self._result
+
+
+def score_messages(messages: Iterable[TimeStampedMessage], scorer: IncrementalScorer[Any]) -> ScoreResult:
+    return ScoringEngine(scorer, messages).score
+
+
+def run_score_func(
+    messages: Iterable[TimeStampedMessage], score_function: IncrementalScorer[Any] | None = None
+) -> ScoreResult | None:
+    """
+    Score messages with score_function, or None without one.
+    """
+    if score_function is None:
+        return None
+    return score_messages(messages, score_function)
@@ -1,6 +1,7 @@
+import gzip
 import json
 from dataclasses import dataclass
-from typing import Dict, List
+from typing import IO, Any, Callable, Dict, Iterable, List, Literal, Mapping, Set, Tuple, get_args, get_origin
 
 from autogen_agentchat.messages import (
     AgentEvent,
@@ -23,6 +24,7 @@ from autogen_agentchat.teams._group_chat._events import (
     GroupChatStart,
     GroupChatTermination,
 )
+from autogen_core import AgentId, TopicId
 from autogen_core.models import (
     AssistantMessage,
     FunctionExecutionResult,
@@ -31,6 +33,11 @@ from autogen_core.models import (
     SystemMessage,
     UserMessage,
 )
+from pydantic import BaseModel, ValidationError
+from pydantic_core import to_jsonable_python
+
+from .checkpoint import CheckpointStore, StateNode, node_digest
+from .types import AGEPublishMessage, AGEResponseMessage, AGESendMessage, TimeStampedMessage
 
 
 @dataclass
@@ -122,9 +129,9 @@ def get_message_type_descriptions() -> Dict[str, MessageTypeDescription]:
     }
 
 
-# ### Serialization ### -- maybe should be a class?
+# ### Serialization ###
 
-__message_map = {
+_MESSAGE_TYPES: Dict[str, type] = {
     # agentchat messages
     "TextMessage": TextMessage,
     "MultiModalMessage": MultiModalMessage,
@@ -168,24 +175,369 @@ def serialize(message: ChatMessage | AgentEvent | LLMMessage | None) -> dict:
         return {}
 
 
-def deserialize(
-    message_dict: Dict | str,
-) -> ChatMessage | AgentEvent | LLMMessage | None:
-    try:
-        if isinstance(message_dict, str):
-            message_dict = json.loads(message_dict)
+class DeserializationError(ValueError):
+    """
+    A message dict that could not be turned into a message. index is the position in the batch, if any, and errors
+    holds pydantic's validation errors when validation failed.
+    """
+
+    def __init__(
+        self,
+        reason: str,
+        type_name: str | None = None,
+        index: int | None = None,
+        errors: List[Dict[str, Any]] | None = None,
+    ) -> None:
+        self.reason = reason
+        self.type_name = type_name
+        self.index = index
+        self.errors = errors or []
+        location = "" if index is None else f"message {index}: "
+        type_info = "" if type_name is None else f" ({type_name})"
+        super().__init__(f"{location}{reason}{type_info}")
 
-        message_type = message_dict["type"]  # type: ignore
+    def at(self, index: int) -> "DeserializationError":
+        return DeserializationError(self.reason, self.type_name, index, self.errors)
 
-        if message_type == "None":
+
+def _literal_type(cls: type) -> str | None:
+    # the value of a model's `type: Literal[...]` discriminator, if it has one
+    field = cls.model_fields.get("type") if isinstance(cls, type) and issubclass(cls, BaseModel) else None
+    if field is None or get_origin(field.annotation) is not Literal:
+        return None
+    value: str = get_args(field.annotation)[0]
+    return value
+
+
+def _annotation_classes(annotation: Any) -> Set[Any]:
+    """
+    Classes (other than plain scalars) that a field annotation can hold, looking through unions, lists and Annotated.
+    """
+    origin = get_origin(annotation)
+    if origin is Literal:
+        return set()
+    if origin is None:
+        if annotation in (str, int, float, bool, type(None), Any) or not isinstance(annotation, type):
+            return set()
+        return {annotation}
+    classes: Set[Any] = set()
+    for arg in get_args(annotation):
+        classes |= _annotation_classes(arg)
+    return classes
+
+
+class Deserializer:
+    """
+    Turns message dicts (as produced by serialize) back into messages through a dispatch table built once per type.
+
+    With validate=True messages go through model_validate. With validate=False trusted input is built with
+    model_construct, after constructing nested messages by their "type"; messages whose other structured fields (e.g.
+    models_usage, tool calls) are set, or that miss a required field, still fall back to validation, so the result is
+    always made of proper objects. Validation runs in pydantic-core and is usually the faster of the two; skipping it
+    is for input that validation would reject or alter. Errors raise DeserializationError.
+    """
+
+    def __init__(self, validate: bool = True, message_types: Mapping[str, type] | None = None) -> None:
+        self.validate = validate
+        self.message_types = dict(_MESSAGE_TYPES if message_types is None else message_types)
+        self._constructors: Dict[type, Callable[[Dict[str, Any]], Any]] = {}
+        self._dispatch = {name: self._constructor(cls) for name, cls in self.message_types.items()}
+
+    def _constructor(self, cls: type) -> Callable[[Dict[str, Any]], Any]:
+        constructor = self._constructors.get(cls)
+        if constructor is None:
+            constructor = self._compile(cls)
+            self._constructors[cls] = constructor
+        return constructor
+
+    def _compile(self, cls: Any) -> Callable[[Dict[str, Any]], Any]:
+        # the core validator directly, skipping model_validate's python-side wrapper
+        validate: Callable[[Dict[str, Any]], Any] = (
+            cls.__pydantic_validator__.validate_python if cls.__pydantic_complete__ else cls.model_validate
+        )
+        if self.validate:
+            return validate
+
+        nested: List[Tuple[str, Dict[str, type]]] = []
+        structured: List[str] = []
+        required = [name for name, field in cls.model_fields.items() if field.is_required()]
+        for name, field in cls.model_fields.items():
+            classes = _annotation_classes(field.annotation)
+            choices = {_literal_type(c): c for c in classes}
+            if None in choices:
+                structured.append(name)
+            elif classes:
+                nested.append((name, choices))  # type: ignore
+
+        construct_model = cls.model_construct
+
+        def construct(data: Dict[str, Any]) -> Any:
+            for name in structured:
+                if data.get(name):
+                    return validate(data)
+            for name in required:
+                if name not in data:
+                    # let validation report the missing field
+                    return validate(data)
+            values = dict(data)
+            for name, choices in nested:
+                value = values.get(name)
+                if value is not None:
+                    values[name] = self._construct_nested(value, choices)
+            return construct_model(**values)
+
+        return construct
+
+    def _construct_nested(self, value: Any, choices: Dict[str, type]) -> Any:
+        if isinstance(value, list):
+            return [self._construct_nested(v, choices) for v in value]
+        if isinstance(value, BaseModel):
+            return value
+        type_name = value.get("type") if isinstance(value, dict) else None
+        if type_name not in choices:
+            raise DeserializationError(f"Unexpected nested message {type_name!r}")
+        return self._constructor(choices[type_name])(value)
+
+    def deserialize(self, message_dict: Dict[str, Any] | str | bytes) -> ChatMessage | AgentEvent | LLMMessage | None:
+        if isinstance(message_dict, (str, bytes)):
+            try:
+                message_dict = json.loads(message_dict)
+            except ValueError as e:
+                raise DeserializationError(f"Invalid JSON: {e}") from e
+        if not isinstance(message_dict, dict):
+            raise DeserializationError(f"Expected an object, got {type(message_dict).__name__}")
+
+        type_name = message_dict.get("type")
+        if type_name == "None":
             return None
+        constructor = self._dispatch.get(type_name)  # type: ignore
+        if constructor is None:
+            raise DeserializationError("Unknown message type", type_name)
+        try:
+            message: ChatMessage | AgentEvent | LLMMessage = constructor(message_dict)
+            return message
+        except DeserializationError:
+            raise
+        except ValidationError as e:
+            errors = [dict(error) for error in e.errors(include_url=False)]
+            raise DeserializationError("Invalid message", type_name, errors=errors) from e
+        except Exception as e:
+            raise DeserializationError(str(e), type_name) from e
+
+    __call__ = deserialize
+
+    def deserialize_many(
+        self, message_dicts: Iterable[Dict[str, Any]] | str | bytes
+    ) -> List[ChatMessage | AgentEvent | LLMMessage | None]:
+        """
+        Deserialize a list of message dicts (or a JSON array). The first failure raises, with its index set.
+        """
+        if isinstance(message_dicts, (str, bytes)):
+            try:
+                message_dicts = json.loads(message_dicts)
+            except ValueError as e:
+                raise DeserializationError(f"Invalid JSON: {e}") from e
+            if not isinstance(message_dicts, list):
+                raise DeserializationError(f"Expected an array, got {type(message_dicts).__name__}")
+
+        messages = []
+        for index, message_dict in enumerate(message_dicts):
+            try:
+                messages.append(self.deserialize(message_dict))
+            except DeserializationError as e:
+                raise e.at(index) from e
+        return messages
 
-        new_message_class = __message_map[message_type]
-        new_message = new_message_class(**message_dict)
-        return new_message
-    except Exception as e:
+
+_deserializer = Deserializer()
+
+
+def deserialize(
+    message_dict: Dict | str,
+) -> ChatMessage | AgentEvent | LLMMessage | None:
+    try:
+        return _deserializer.deserialize(message_dict)
+    except DeserializationError as e:
         print(
             f"[WARN] Unable to deserialize message dict into Pydantic class. Error: {str(e)}.\nMessage dict: ",
             message_dict,
         )
         return None
+
+
+# ### Session export ###
+#
+# Gzip-compressed JSON lines, readable without agdebugger or pickle. The first line is a header with the format
+# version; every other line is a JSON array whose first element is the record kind:
+#
+#   ["s", value]                                       string, referenced by its index in order of appearance
+#   ["n", kind, data]                                  agent state node, referenced by its index (see checkpoint.py)
+#   ["c", timestamp, [[agent string, node], ...]]      checkpoint, agent -> root state node
+#   ["m", timestamp, envelope, sender string, target string, message_id, message]
+#                                                      history message; envelope is "p" (publish, target is the
+#                                                      topic), "s" (send) or "r" (response, target is the
+#                                                      recipient); message as given by serialize()
+#
+# Agent ids, topics and checkpoint agent keys are interned as strings. Readers skip record kinds they do not know.
+
+SESSION_EXPORT_FORMAT = "agdebugger-session"
+SESSION_EXPORT_VERSION = 1
+
+
+class _StringTable:
+    def __init__(self, out: IO[str]) -> None:
+        self._out = out
+        self._refs: Dict[str, int] = {}
+
+    def ref(self, value: Any) -> int | None:
+        if value is None:
+            return None
+        value = str(value)
+        ref = self._refs.get(value)
+        if ref is None:
+            ref = self._refs[value] = len(self._refs)
+            _write_record(self._out, ["s", value])
+        return ref
+
+
+def _jsonable(value: Any) -> Any:
+    # agent state can hold values json cannot encode (bytes, images, ...); keep them as base64 or their str()
+    return to_jsonable_python(value, fallback=str, bytes_mode="base64")
+
+
+def _write_record(out: IO[str], record: Any) -> None:
+    out.write(json.dumps(record, separators=(",", ":"), ensure_ascii=False, default=_jsonable))
+    out.write("\n")
+
+
+def _message_record(message: TimeStampedMessage, strings: _StringTable) -> List[Any] | None:
+    """
+    The export record for a message, or None if its message could not be read back from the export.
+    """
+    envelope = message.message
+    serialized = serialize(envelope.message)
+    type_name = serialized.get("type")
+    if type_name != "None" and type_name not in _deserializer.message_types:
+        return None
+
+    target: TopicId | AgentId | None
+    if isinstance(envelope, AGEPublishMessage):
+        kind, target, message_id = "p", envelope.topic_id, envelope.message_id
+    elif isinstance(envelope, AGESendMessage):
+        kind, target, message_id = "s", envelope.recipient, envelope.message_id
+    else:
+        kind, target, message_id = "r", envelope.recipient, None
+
+    inner = to_jsonable_python(serialized, fallback=str)
+    return ["m", message.timestamp, kind, strings.ref(envelope.sender), strings.ref(target), message_id, inner]
+
+
+def write_session_export(
+    path: str, history: Iterable[TimeStampedMessage], checkpoints: Mapping[int, Mapping[str, Any]]
+) -> None:
+    """
+    Write the session history and checkpoints in the versioned export format.
+    """
+    store = CheckpointStore.from_mapping(checkpoints)
+    with gzip.open(path, "wt", encoding="utf-8", compresslevel=6) as out:
+        _write_record(out, {"format": SESSION_EXPORT_FORMAT, "version": SESSION_EXPORT_VERSION})
+        strings = _StringTable(out)
+
+        node_refs: Dict[str, int] = {}
+        seen: Set[str] = set()
+        _, roots = store.export()
+        for timestamp, checkpoint_roots in roots.items():
+            for digest, (kind, data) in store.iter_nodes(checkpoint_roots.values(), seen):
+                if kind == "d":
+                    data = [[key, node_refs[child]] for key, child in data]
+                elif kind in ("l", "t"):
+                    data = [node_refs[child] for child in data]
+                _write_record(out, ["n", kind, data])
+                node_refs[digest] = len(node_refs)
+            agent_roots = [[strings.ref(agent), node_refs[root]] for agent, root in checkpoint_roots.items()]
+            _write_record(out, ["c", timestamp, agent_roots])
+
+        for message in history:
+            record = _message_record(message, strings)
+            if record is None:
+                print(
+                    f"[WARN] Skipping message {message.timestamp} of type {type(message.message.message).__name__} "
+                    f"in session export {path}: it cannot be serialized"
+                )
+                continue
+            _write_record(out, record)
+
+
+def is_session_export(path: str) -> bool:
+    with open(path, "rb") as f:
+        if f.read(2) != b"\x1f\x8b":
+            return False
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return bool(json.loads(f.readline()).get("format") == SESSION_EXPORT_FORMAT)
+    except (OSError, ValueError, AttributeError):
+        return False
+
+
+def read_session_export(path: str) -> Tuple[List[TimeStampedMessage], CheckpointStore]:
+    """
+    Load a session export written by write_session_export. A malformed line or a message that does not deserialize
+    raises ValueError with its line number.
+    """
+    history: List[TimeStampedMessage] = []
+    store = CheckpointStore()
+    strings: List[str] = []
+    node_digests: List[str] = []
+    new_nodes: List[Tuple[str, StateNode]] = []
+
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        if header.get("format") != SESSION_EXPORT_FORMAT:
+            raise ValueError(f"{path} is not an agdebugger session export")
+        if header.get("version", 0) > SESSION_EXPORT_VERSION:
+            raise ValueError(f"Unsupported session export version {header.get('version')}, upgrade agdebugger")
+
+        for line_number, line in enumerate(f, start=2):
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path}, line {line_number}: {e}") from e
+            kind = record[0]
+            if kind == "s":
+                strings.append(record[1])
+            elif kind == "n":
+                node_kind, data = record[1], record[2]
+                if node_kind == "d":
+                    data = tuple((key, node_digests[child]) for key, child in data)
+                elif node_kind in ("l", "t"):
+                    data = tuple(node_digests[child] for child in data)
+                node: StateNode = (node_kind, data)
+                digest = node_digest(node)
+                node_digests.append(digest)
+                new_nodes.append((digest, node))
+            elif kind == "c":
+                roots = {strings[agent]: node_digests[root] for agent, root in record[2]}
+                store.put_roots(record[1], roots, new_nodes)
+                new_nodes = []
+            elif kind == "m":
+                _, timestamp, envelope, sender, target, message_id, inner = record
+                sender_id = AgentId.from_str(strings[sender]) if sender is not None else None
+                try:
+                    message = _deserializer.deserialize(inner)
+                except DeserializationError as e:
+                    raise ValueError(f"{path}, line {line_number}: {e}") from e
+                m: AGEPublishMessage | AGESendMessage | AGEResponseMessage
+                if envelope == "p":
+                    topic_id = TopicId.from_str(strings[target])
+                    m = AGEPublishMessage(message=message, sender=sender_id, topic_id=topic_id, message_id=message_id)
+                else:
+                    recipient = AgentId.from_str(strings[target]) if target is not None else None
+                    if envelope == "s":
+                        m = AGESendMessage(message, sender_id, recipient, message_id)  # type: ignore
+                    else:
+                        m = AGEResponseMessage(message=message, sender=sender_id, recipient=recipient)
+                history.append(TimeStampedMessage(message=m, timestamp=timestamp))
+            else:
+                print(f"[WARN] Skipping unknown record kind {kind!r} in session export {path}")
+
+    return history, store
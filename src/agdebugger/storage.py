@@ -0,0 +1,273 @@
+import bisect
+import pickle
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, Generic, Iterator, List, MutableMapping, Tuple, TypeVar, overload
+
+from .checkpoint import CheckpointStore
+from .history import MessageHistory
+from .types import MessageHistorySession, TimeStampedMessage
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+class LRUCache(Generic[K, V]):
+    """Size-bounded mapping that evicts the least recently used entry"""
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._entries: OrderedDict[K, V] = OrderedDict()
+
+    def get(self, key: K) -> V | None:
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: K, value: V) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def discard(self, key: K) -> None:
+        self._entries.pop(key, None)
+
+    def __iter__(self) -> Iterator[K]:
+        return iter(list(self._entries))
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SqliteSessionStore:
+    """
+    Disk-backed session: message history, agent checkpoints and the sessions reverted away from in a single SQLite
+    file.
+
+    Everything is written to disk as it is recorded, and only a bounded number of recently used entries are kept in
+    memory, so long sessions are limited by disk rather than RAM. Opening an existing file resumes the session.
+    """
+
+    def __init__(self, path: str, cache_size: int = 1024) -> None:
+        self.path = path
+        self.cache_size = cache_size
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS history (timestamp INTEGER PRIMARY KEY, data BLOB NOT NULL)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS checkpoints (key INTEGER PRIMARY KEY, data BLOB NOT NULL)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS nodes (key TEXT PRIMARY KEY, data BLOB NOT NULL)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS sessions (key INTEGER PRIMARY KEY, data BLOB NOT NULL)")
+            self.conn.commit()
+
+        self.history = SqliteMessageHistory(self, cache_size)
+        self.checkpoints = CheckpointStore(
+            nodes=SqliteMapping(self, "nodes", cache_size * 16),
+            roots=SqliteMapping(self, "checkpoints", cache_size),
+        )
+        # whole sessions are large and rarely read, so only a couple are kept in memory and each is written at once
+        self.prior_sessions: SqliteMapping[int, MessageHistorySession] = SqliteMapping(
+            self, "sessions", cache_size=2, batch_size=1
+        )
+
+    def flush(self) -> None:
+        self.history.flush()
+        self.checkpoints.flush()
+        self.prior_sessions.flush()
+
+    def close(self) -> None:
+        self.flush()
+        with self.lock:
+            self.conn.close()
+
+
+class SqliteMapping(MutableMapping[K, V]):
+    """
+    Mapping persisted to one SQLite table with pickled values.
+
+    Keys are indexed in memory so membership checks never hit the disk. Writes are buffered and committed in
+    batches; values are read back through an LRU cache.
+    """
+
+    def __init__(self, session: SqliteSessionStore, table: str, cache_size: int, batch_size: int = 512) -> None:
+        self._session = session
+        self._table = table
+        self._cache: LRUCache[K, V] = LRUCache(cache_size)
+        self._pending: Dict[K, V] = {}
+        self._batch_size = batch_size
+        with session.lock:
+            self._keys = {row[0] for row in session.conn.execute(f"SELECT key FROM {table}")}
+
+    def __getitem__(self, key: K) -> V:
+        value = self._pending.get(key)
+        if value is not None:
+            return value
+        value = self._cache.get(key)
+        if value is not None:
+            return value
+        if key not in self._keys:
+            raise KeyError(key)
+
+        with self._session.lock:
+            row = self._session.conn.execute(f"SELECT data FROM {self._table} WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        loaded: V = pickle.loads(row[0])
+        self._cache.put(key, loaded)
+        return loaded
+
+    def __setitem__(self, key: K, value: V) -> None:
+        self._keys.add(key)
+        self._pending[key] = value
+        self._cache.put(key, value)
+        if len(self._pending) >= self._batch_size:
+            self.flush()
+
+    def __delitem__(self, key: K) -> None:
+        if key not in self._keys:
+            raise KeyError(key)
+        self._keys.discard(key)
+        self._pending.pop(key, None)
+        self._cache.discard(key)
+        with self._session.lock:
+            self._session.conn.execute(f"DELETE FROM {self._table} WHERE key = ?", (key,))
+            self._session.conn.commit()
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._keys
+
+    def __iter__(self) -> Iterator[K]:
+        return iter(list(self._keys))
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        rows = [(key, pickle.dumps(value)) for key, value in self._pending.items()]
+        with self._session.lock:
+            self._session.conn.executemany(f"INSERT OR REPLACE INTO {self._table} (key, data) VALUES (?, ?)", rows)
+            self._session.conn.commit()
+        self._pending.clear()
+
+
+class SqliteMessageHistory(MessageHistory):
+    """
+    Message history kept in SQLite. Only timestamps are held in memory (as a compact array) to support positional
+    access; messages are loaded on demand through an LRU cache.
+
+    Appends are buffered and committed in batches, once batch_size messages are waiting or flush_interval seconds
+    after the last commit, so recording a message does not cost a commit on the event loop.
+    """
+
+    _page_size = 256
+
+    def __init__(
+        self, session: SqliteSessionStore, cache_size: int, batch_size: int = 256, flush_interval: float = 1.0
+    ) -> None:
+        super().__init__()
+        self._session = session
+        self._cache: LRUCache[int, TimeStampedMessage] = LRUCache(cache_size)
+        self._pending: Dict[int, Tuple[TimeStampedMessage, bytes]] = {}
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._last_flush = time.monotonic()
+        with session.lock:
+            rows = session.conn.execute("SELECT timestamp FROM history ORDER BY timestamp").fetchall()
+        self._timestamps = array("q", (row[0] for row in rows))
+
+    def _load(self, timestamps: List[int]) -> List[TimeStampedMessage]:
+        found: Dict[int, TimeStampedMessage] = {}
+        missing = set()
+        for t in timestamps:
+            pending = self._pending.get(t)
+            message = pending[0] if pending is not None else self._cache.get(t)
+            if message is None:
+                missing.add(t)
+            else:
+                found[t] = message
+
+        if missing:
+            with self._session.lock:
+                rows = self._session.conn.execute(
+                    "SELECT timestamp, data FROM history WHERE timestamp BETWEEN ? AND ?",
+                    (min(missing), max(missing)),
+                ).fetchall()
+            for t, data in rows:
+                if t in missing:
+                    found[t] = pickle.loads(data)
+                    self._cache.put(t, found[t])
+
+        return [found[t] for t in timestamps]
+
+    @overload
+    def __getitem__(self, idx: int) -> TimeStampedMessage: ...
+
+    @overload
+    def __getitem__(self, idx: slice) -> List[TimeStampedMessage]: ...
+
+    def __getitem__(self, idx: int | slice) -> TimeStampedMessage | List[TimeStampedMessage]:
+        if isinstance(idx, slice):
+            return self._load(list(self._timestamps[idx]))
+        return self._load([self._timestamps[idx]])[0]
+
+    def __len__(self) -> int:
+        return len(self._timestamps)
+
+    def __iter__(self) -> Iterator[TimeStampedMessage]:
+        for start in range(0, len(self._timestamps), self._page_size):
+            yield from self._load(list(self._timestamps[start : start + self._page_size]))
+
+    def append(self, message: TimeStampedMessage) -> None:
+        self._pending[message.timestamp] = (message, pickle.dumps(message))
+        self._timestamps.append(message.timestamp)
+        self._cache.put(message.timestamp, message)
+        if len(self._pending) >= self._batch_size or time.monotonic() - self._last_flush >= self._flush_interval:
+            self.flush()
+
+    def get(self, timestamp: int) -> TimeStampedMessage | None:
+        idx = bisect.bisect_left(self._timestamps, timestamp)
+        if idx == len(self._timestamps) or self._timestamps[idx] != timestamp:
+            return None
+        return self._load([timestamp])[0]
+
+    def between(self, start: int | None = None, stop: int | None = None) -> List[TimeStampedMessage]:
+        lo = 0 if start is None else bisect.bisect_left(self._timestamps, start)
+        hi = len(self._timestamps) if stop is None else bisect.bisect_left(self._timestamps, stop)
+        timestamps = list(self._timestamps[lo:hi])
+        messages: List[TimeStampedMessage] = []
+        for page in range(0, len(timestamps), self._page_size):
+            messages.extend(self._load(timestamps[page : page + self._page_size]))
+        return messages
+
+    def truncate(self, cutoff: int) -> None:
+        for t in [t for t in self._pending if t >= cutoff]:
+            del self._pending[t]
+        with self._session.lock:
+            self._session.conn.execute("DELETE FROM history WHERE timestamp >= ?", (cutoff,))
+            self._session.conn.commit()
+        idx = bisect.bisect_left(self._timestamps, cutoff)
+        for t in self._timestamps[idx:]:
+            self._cache.discard(t)
+        del self._timestamps[idx:]
+
+    def flush(self) -> None:
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+        rows = [(t, data) for t, (_, data) in self._pending.items()]
+        with self._session.lock:
+            self._session.conn.executemany("INSERT OR REPLACE INTO history (timestamp, data) VALUES (?, ?)", rows)
+            self._session.conn.commit()
+        self._pending.clear()
@@ -0,0 +1,149 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Dict, List, Set
+
+
+@dataclass
+class TaskMetrics:
+    in_flight: int
+    # in flight but waiting for a concurrency slot
+    waiting: int
+    # released their slot once queued, and are only waiting for a reply
+    awaiting_reply: int
+    peak_in_flight: int
+    created: int
+    completed: int
+    failed: int
+    cancelled: int
+
+
+class TaskRegistry:
+    """
+    Owns background tasks that nobody awaits, e.g. waiting on the result of a published or sent message.
+
+    asyncio only keeps weak references to tasks, so the registry holds them until they finish. Exceptions are logged
+    instead of being lost with the task, and at most max_concurrency of them run at once; the rest wait their turn in
+    the order they were spawned. A task spawned with a `queued` future gives up its slot as soon as that resolves,
+    so sends waiting for a reply do not hold back the ones behind them.
+    """
+
+    def __init__(self, logger: logging.Logger, max_concurrency: int | None = None) -> None:
+        self.logger = logger
+        self._tasks: Set[asyncio.Task[Any]] = set()
+        # in-flight tasks that have not queued their message yet, with what resolves once they do (or finish)
+        self._unqueued: Dict[asyncio.Task[Any], asyncio.Future[Any]] = {}
+        self._semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency is not None else None
+        self._waiting = 0
+        self._awaiting_reply = 0
+        self._peak = 0
+        self._created = 0
+        self._completed = 0
+        self._failed = 0
+        self._cancelled = 0
+
+    async def _run(self, awaitable: Awaitable[Any], queued: asyncio.Future[Any] | None) -> Any:
+        if self._semaphore is not None:
+            self._waiting += 1
+            try:
+                await self._semaphore.acquire()
+            except BaseException:
+                # close a coroutine that will never run, so it does not warn about never being awaited
+                close = getattr(awaitable, "close", None)
+                if close is not None:
+                    close()
+                raise
+            finally:
+                self._waiting -= 1
+
+        holding_slot = True
+
+        def on_queued(_: asyncio.Future[Any]) -> None:
+            nonlocal holding_slot
+            if holding_slot:
+                holding_slot = False
+                self._release()
+                self._awaiting_reply += 1
+
+        if queued is not None:
+            queued.add_done_callback(on_queued)
+        try:
+            return await awaitable
+        finally:
+            if queued is not None:
+                queued.remove_done_callback(on_queued)
+            if holding_slot:
+                self._release()
+            else:
+                self._awaiting_reply -= 1
+
+    def _release(self) -> None:
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+    def spawn(
+        self, awaitable: Awaitable[Any], name: str | None = None, queued: asyncio.Future[Any] | None = None
+    ) -> asyncio.Task[Any]:
+        task = asyncio.create_task(self._run(awaitable, queued), name=name)
+        self._tasks.add(task)
+        self._created += 1
+        self._peak = max(self._peak, len(self._tasks))
+        task.add_done_callback(self._on_done)
+        if queued is not None:
+            self._unqueued[task] = queued
+            queued.add_done_callback(lambda _: self._unqueued.pop(task, None))
+        else:
+            self._unqueued[task] = task
+        return task
+
+    def _on_done(self, task: asyncio.Task[Any]) -> None:
+        self._tasks.discard(task)
+        self._unqueued.pop(task, None)
+        if task.cancelled():
+            self._cancelled += 1
+            return
+        exception = task.exception()
+        if exception is None:
+            self._completed += 1
+            return
+        self._failed += 1
+        self.logger.error(
+            f"Background task {task.get_name()} failed: {type(exception).__name__}: {exception}",
+            exc_info=exception,
+        )
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    def unqueued(self) -> List[asyncio.Future[Any]]:
+        """
+        One future per in-flight task that has not queued its message yet, resolving once it has or the task ends.
+        Tasks spawned without a `queued` future count as unqueued until they finish.
+        """
+        return list(self._unqueued.values())
+
+    def metrics(self) -> TaskMetrics:
+        return TaskMetrics(
+            in_flight=len(self._tasks),
+            waiting=self._waiting,
+            awaiting_reply=self._awaiting_reply,
+            peak_in_flight=self._peak,
+            created=self._created,
+            completed=self._completed,
+            failed=self._failed,
+            cancelled=self._cancelled,
+        )
+
+    async def join(self) -> None:
+        """
+        Wait for every task spawned so far to finish.
+        """
+        while self._tasks:
+            await asyncio.wait(list(self._tasks))
+
+    async def cancel_all(self) -> None:
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -1,5 +1,5 @@
-from dataclasses import dataclass
-from typing import Any, Dict, List, Mapping, Optional
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Literal, Mapping, Optional
 
 from autogen_core import AgentId, TopicId
 from pydantic import BaseModel
@@ -77,6 +77,49 @@ class ThoughtMessage:
     senderName: str
 
 
+@dataclass
+class StepSummary:
+    steps: int = 0
+    # steps: ran the requested number of steps, condition: a run-until condition held, max_steps: gave up before
+    # it did, breakpoint: a processed message hit a breakpoint, queue_empty: no messages left and none in flight
+    stop_reason: str = "steps"
+    first_timestamp: int | None = None
+    last_timestamp: int | None = None
+    message_types: Dict[str, int] = field(default_factory=dict)
+    queue_size: int = 0
+
+
+@dataclass
+class BreakpointHit:
+    breakpoint_id: int | None  # None when breaking after a step over
+    timestamp: int
+    paused: bool
+
+
+@dataclass
+class InjectAck:
+    index: int
+    # ok: enqueued, error: the line could not be parsed, deserialized or routed
+    status: str
+    message_id: str | None = None
+    # seconds from receiving the batch until the message was on the queue
+    latency: float | None = None
+    error: str | None = None
+
+
+QueueOperationType = Literal["edit", "delete", "move", "insert"]
+
+
+@dataclass
+class QueueOperation:
+    op: QueueOperationType
+    idx: int
+    to_idx: int | None = None  # move
+    message: Any = None  # edit, insert
+    topic_id: TopicId | None = None  # insert a publish
+    recipient: AgentId | None = None  # insert a send
+
+
 ############### API Message Types ###############
 
 
@@ -101,6 +144,52 @@ class EditQueueMessage(BaseModel):
     body: Dict | None = None
 
 
+class QueueEdit(BaseModel):
+    op: QueueOperationType
+    idx: int
+    to_idx: Optional[int] = None
+    body: Optional[Dict] = None
+    topic: Optional[str] = None
+    recipient: Optional[str] = None
+
+
+class RunUntilCondition(BaseModel):
+    """Stop as soon as a processed message matches any of the given conditions"""
+
+    message_type: Optional[str] = None
+    sender: Optional[str] = None
+    recipient: Optional[str] = None
+    timestamp: Optional[int] = None
+    queue_empty: bool = False
+    max_steps: int = 1000
+
+
+class Breakpoint(BaseModel):
+    """
+    Pause before a message is delivered if it matches all given conditions. Agents and topics match by type or by
+    full id, and recipient includes subscribers of published messages. content is a regex searched in the
+    serialized message, or in the values at path (JSONPath-like, e.g. "messages[0].content") if one is given.
+    """
+
+    id: Optional[int] = None
+    message_type: Optional[str] = None
+    sender: Optional[str] = None
+    recipient: Optional[str] = None
+    topic: Optional[str] = None
+    content: Optional[str] = None
+    path: Optional[str] = None
+    enabled: bool = True
+
+
+class ForkRequest(BaseModel):
+    timestamp: int
+    # one branch per body; None re-sends the original message
+    bodies: List[Optional[Dict]]
+    mode: Literal["thread", "process"] = "process"
+    max_steps: int = 1000
+    max_workers: Optional[int] = None
+
+
 class EditHistoryMessage(BaseModel):
     timestamp: int
     body: Optional[Dict] = None
@@ -1,17 +1,48 @@
 import asyncio
+import dataclasses
+import json
 import logging
+from typing import Any, List, Mapping, cast
 
 import pytest
+from autogen_agentchat.agents import AssistantAgent
+from autogen_agentchat.base import ChatAgent
 from autogen_agentchat.conditions import MaxMessageTermination
 from autogen_agentchat.messages import TextMessage
 from autogen_agentchat.teams import RoundRobinGroupChat
 from autogen_agentchat.teams._group_chat._events import (
+    GroupChatRequestPublish,
     GroupChatStart,
 )
-from autogen_core import EVENT_LOGGER_NAME
+from autogen_core import (
+    EVENT_LOGGER_NAME,
+    Agent,
+    AgentId,
+    CancellationToken,
+    DefaultTopicId,
+    MessageContext,
+    RoutedAgent,
+    message_handler,
+)
+from autogen_core._single_threaded_agent_runtime import SendMessageEnvelope
+from autogen_core.logging import LLMCallEvent
 from autogen_ext.models.openai import OpenAIChatCompletionClient
+from autogen_ext.models.replay import ReplayChatCompletionClient
+from fastapi.encoders import jsonable_encoder
 
 from agdebugger.backend import BackendRuntimeManager
+from agdebugger.checkpoint import CheckpointPolicy
+from agdebugger.fork import build_fork_jobs, fork_session
+from agdebugger.history import MessageHistory
+from agdebugger.injection import parse_inject_batch
+from agdebugger.log import ListHandler
+from agdebugger.model_cache import ModelResponseCache
+from agdebugger.replay import build_replay_jobs, infer_team_id, parse_edits, replay_jobs
+from agdebugger.scoring import HumanEvalScorer, ScoringEngine, run_score_func, score_messages
+from agdebugger.serialization import Deserializer, serialize
+from agdebugger.storage import SqliteSessionStore
+from agdebugger.tasks import TaskRegistry
+from agdebugger.types import ContentMessage, QueueOperation, RunUntilCondition
 
 from .setup.local_agent import LocalAgent
 
@@ -26,12 +57,12 @@ def get_agent_team():
     return team
 
 
-async def create_backend() -> BackendRuntimeManager:
+async def create_backend(checkpoint_policy: CheckpointPolicy | None = None) -> BackendRuntimeManager:
     groupchat = get_agent_team()
     logger = logging.getLogger(EVENT_LOGGER_NAME)
     logger.setLevel(logging.DEBUG)
 
-    backend = BackendRuntimeManager(groupchat, logger)
+    backend = BackendRuntimeManager(groupchat, logger, checkpoint_policy=checkpoint_policy)
     await backend.async_initialize()
 
     return backend
@@ -56,6 +87,7 @@ async def test_edit_message_queue():
 
     assert backend.unprocessed_messages_count == 1
     assert backend.message_queue_list[0].message == start_message
+    assert backend.message_queue_json()[0]["message"]["messages"][0]["content"] == "0"
 
     edited_message = GroupChatStart(
         messages=[
@@ -69,6 +101,54 @@ async def test_edit_message_queue():
 
     assert backend.unprocessed_messages_count == 1
     assert backend.message_queue_list[0].message == edited_message
+    assert json.loads(backend.message_queue_json_bytes())[0]["message"]["messages"][0]["content"] == "3000"
+
+
+@pytest.mark.asyncio
+async def test_queue_operations_with_concurrent_publishes():
+    """Edit the queue in place while other tasks keep publishing"""
+    backend = await create_backend()
+    topic = backend.groupchat._group_topic_type
+
+    def text(content: str) -> GroupChatStart:
+        return GroupChatStart(messages=[TextMessage(source="user", content=content)])
+
+    for i in range(5):
+        backend.publish_message(text(f"initial {i}"), topic)
+    await asyncio.sleep(0)
+    assert backend.unprocessed_messages_count == 5
+
+    async def publisher():
+        for i in range(50):
+            backend.publish_message(text(f"concurrent {i}"), topic)
+            await asyncio.sleep(0)
+
+    async def editor():
+        for i in range(10):
+            backend.apply_queue_operations(
+                [
+                    QueueOperation(op="edit", idx=0, message=text(f"edited {i}")),
+                    QueueOperation(op="insert", idx=1, message=text(f"inserted {i}"), topic_id=DefaultTopicId(topic)),
+                    QueueOperation(op="move", idx=1, to_idx=-1),
+                    QueueOperation(op="delete", idx=-1),
+                ]
+            )
+            await asyncio.sleep(0)
+
+    await asyncio.gather(publisher(), editor())
+    await asyncio.sleep(0)
+
+    contents = [envelope.message.messages[0].content for envelope in backend.message_queue_list]
+    assert contents[0] == "edited 9"
+    assert contents[1:5] == [f"initial {i}" for i in range(1, 5)]
+    assert sorted(contents[5:]) == sorted(f"concurrent {i}" for i in range(50))
+    assert backend.message_queue._unfinished_tasks == backend.unprocessed_messages_count == 55
+
+    # a failing batch leaves the queue untouched
+    with pytest.raises(IndexError):
+        backend.apply_queue_operations([QueueOperation(op="delete", idx=0), QueueOperation(op="delete", idx=100)])
+    assert backend.unprocessed_messages_count == 55
+    assert backend.message_queue_list[0].message.messages[0].content == "edited 9"
 
 
 @pytest.mark.asyncio
@@ -111,3 +191,530 @@ async def test_edit_and_revert_message():
 
     assert backend.unprocessed_messages_count == 1
     assert len(backend.intervention_handler.history) == 0
+
+
+@pytest.mark.asyncio
+async def test_read_session_history_since():
+    """Only messages after the cursor are returned until the session is reset"""
+    backend = await create_backend()
+    start_message = GroupChatStart(
+        messages=[
+            TextMessage(
+                source="user",
+                content="0",  # local agent expects number
+            )
+        ]
+    )
+    recipient = backend.groupchat._group_chat_manager_topic_type
+
+    await backend.send_message(start_message, recipient)
+    backend.start_processing()
+    await asyncio.sleep(0)  # yield to process
+    await backend.stop_processing()
+
+    full = backend.read_session_history_since(None, None)
+    assert not full["incremental"]
+    num_messages = len(full["message_history"][0].messages)
+    assert num_messages == len(backend.intervention_handler.history)
+
+    cursor = full["message_history"][0].messages[1]["timestamp"]
+    partial = backend.read_session_history_since(cursor, full["current_session"])
+    assert partial["incremental"]
+    assert len(partial["message_history"][0].messages) == num_messages - 2
+    assert partial["latest_timestamp"] == full["latest_timestamp"]
+
+    await backend.edit_and_revert_message(None, cursor)
+    reset = backend.read_session_history_since(cursor, full["current_session"])
+    assert not reset["incremental"]
+    assert reset["current_session"] == 1
+
+    # the pre-encoded response matches what FastAPI would produce from the dicts
+    for since, session in [(None, None), (cursor, 1), (cursor, 0)]:
+        expected = json.loads(json.dumps(jsonable_encoder(backend.read_session_history_since(since, session))))
+        assert json.loads(backend.read_session_history_json(since, session)) == expected
+
+
+@pytest.mark.asyncio
+async def test_event_stream_updates():
+    """Queue, history and loop changes are pushed to subscribers"""
+    backend = await create_backend()
+    events = backend.events.subscribe()
+    start_message = GroupChatStart(
+        messages=[
+            TextMessage(
+                source="user",
+                content="0",  # local agent expects number
+            )
+        ]
+    )
+    recipient = backend.groupchat._group_chat_manager_topic_type
+
+    await backend.send_message(start_message, recipient)
+    await asyncio.sleep(0)  # yield to make sure that the send processes
+    queue_events = []
+    while not events.empty():
+        queue_events.append(events.get_nowait())
+    assert [e.data for e in queue_events if e.type == "queue"] == [{"size": 1}]
+
+    backend.start_processing()
+    await asyncio.sleep(0)  # yield to process
+    await backend.stop_processing()
+
+    received = []
+    while not events.empty():
+        received.append(events.get_nowait())
+
+    history_events = [e for e in received if e.type == "history"]
+    assert len(history_events) == len(backend.intervention_handler.history)
+    assert history_events[0].data["message"]["timestamp"] == 0
+    assert received[-1].type == "loop_status" and received[-1].data is False
+
+
+@pytest.mark.asyncio
+async def test_inject_batch():
+    backend = await create_backend()
+    manager = backend.groupchat._group_chat_manager_topic_type
+    # group chat events are not in serialize's declared message types, but serialize like any pydantic message
+    start: Any = GroupChatStart(messages=[TextMessage(source="user", content="0")])
+    body = serialize(start)
+    lines = [
+        json.dumps({"recipient": manager, "body": body}),
+        "",
+        json.dumps({"recipient": manager, "body": {"type": "NotAMessage"}}),
+        "{not json",
+        json.dumps({"recipient": "NOT_AN_AGENT", "body": body}),
+        json.dumps({"recipient": manager, "body": body}),
+    ]
+    items = parse_inject_batch("\n".join(lines), "send", Deserializer())
+    backend.log_capture.flush()
+    logged = len(backend.log_handler.entries)
+    acks = await backend.inject_messages(items, "send")
+
+    assert [ack.status for ack in acks] == ["ok", "error", "error", "error", "ok"]
+    assert [ack.index for ack in acks] == list(range(5))
+    assert all(ack.latency is not None and ack.message_id is not None for ack in acks if ack.status == "ok")
+    assert backend.unprocessed_messages_count == 2
+    queued = [
+        envelope.message_id for envelope in backend.message_queue_list if isinstance(envelope, SendMessageEnvelope)
+    ]
+    assert queued == [acks[0].message_id, acks[4].message_id]
+    # injected messages go through the runtime, which logs them like any other send
+    backend.log_capture.flush()
+    sends = [e for e in list(backend.log_handler.entries)[logged:] if type(e._msg).__name__ == "MessageEvent"]
+    assert len(sends) == 2
+
+
+@pytest.mark.asyncio
+async def test_step_n_and_run_until():
+    backend = await create_backend()
+    start_message = GroupChatStart(messages=[TextMessage(source="user", content="0")])
+    # no yield before stepping: the step waits for the spawned send to reach the queue
+    await backend.send_message(start_message, backend.groupchat._group_chat_manager_topic_type)
+
+    summary = await backend.step(3)
+    assert summary.steps == 3 and summary.stop_reason == "steps"
+    assert (summary.first_timestamp, summary.last_timestamp) == (0, 2)
+    assert summary.message_types == {"GroupChatStart": 3}
+
+    summary = await backend.run_until(RunUntilCondition(recipient="LOCAL_AGENT_2"))
+    assert summary.stop_reason == "condition"
+    assert summary.message_types["GroupChatRequestPublish"] == 1
+
+    summary = await backend.run_until(RunUntilCondition(message_type="GroupChatTermination"))
+    assert summary.stop_reason == "condition"
+    assert summary.last_timestamp == backend.intervention_handler.history[-1].timestamp
+
+    summary = await backend.step(1000)
+    assert summary.stop_reason == "queue_empty" and summary.queue_size == 0
+    assert len(backend.intervention_handler.history) == 32
+
+
+@pytest.mark.asyncio
+async def test_step_right_after_publish():
+    backend = await create_backend()
+    start_message = GroupChatStart(messages=[TextMessage(source="user", content="0")])
+    backend.publish_message(start_message, backend.groupchat._group_topic_type)
+
+    summary = await backend.step(1)
+    assert summary.steps == 1 and summary.stop_reason == "steps"
+    assert summary.message_types == {"GroupChatStart": 1}
+    assert backend.tasks.unqueued() == []
+
+
+def summarize_state(state):
+    """Agent state without ids or creation times, which change between runs"""
+    summary = {}
+    for agent_id, agent_state in state.items():
+        agent_type = agent_id.split("/")[0]
+        if "agent_state" in agent_state:
+            summary[agent_type] = (agent_state["agent_state"]["counter"], len(agent_state["message_buffer"]))
+        elif "current_turn" in agent_state:
+            summary[agent_type] = (agent_state["current_turn"], len(agent_state["message_thread"]))
+    return summary
+
+
+async def run_team(backend: BackendRuntimeManager) -> None:
+    start_message = GroupChatStart(
+        messages=[
+            TextMessage(
+                source="user",
+                content="0",  # local agent expects number
+            )
+        ]
+    )
+    await backend.send_message(start_message, backend.groupchat._group_chat_manager_topic_type)
+    backend.start_processing()
+    await asyncio.sleep(0)  # yield to process
+    await backend.stop_processing()
+
+
+@pytest.mark.asyncio
+async def test_sparse_checkpoints_revert_by_replay():
+    """Reverting between sparse checkpoints replays to the same state a dense checkpoint holds"""
+    dense = await create_backend()
+    await run_team(dense)
+
+    sparse = await create_backend(CheckpointPolicy(mode="every", every_n=4))
+    await run_team(sparse)
+    assert len(sparse.agent_checkpoints) < len(sparse.intervention_handler.history)
+    assert 14 not in sparse.agent_checkpoints
+
+    await sparse.edit_and_revert_message(None, 14)
+    await asyncio.sleep(0)  # yield to process
+
+    assert sparse.unprocessed_messages_count == 1
+    assert summarize_state(await sparse.runtime.save_state()) == summarize_state(dense.agent_checkpoints[14])
+
+
+@pytest.mark.asyncio
+async def test_on_change_checkpoints_match_full_checkpoints():
+    """Only re-saving agents that were sent messages gives the same checkpoints as saving everything"""
+    dense = await create_backend()
+    await run_team(dense)
+
+    on_change = await create_backend(CheckpointPolicy(mode="on_change"))
+    await run_team(on_change)
+
+    # messages that changed no agent get no checkpoint of their own
+    assert set(on_change.agent_checkpoints) <= set(dense.agent_checkpoints)
+    for timestamp in on_change.agent_checkpoints:
+        assert summarize_state(on_change.agent_checkpoints[timestamp]) == summarize_state(
+            dense.agent_checkpoints[timestamp]
+        )
+
+
+@pytest.mark.asyncio
+async def test_background_tasks_are_tracked():
+    backend = await create_backend()
+    task_logger = logging.getLogger("test_background_tasks")
+    log_handler = ListHandler()
+    task_logger.addHandler(log_handler)
+    backend.tasks = TaskRegistry(task_logger, max_concurrency=1)
+    start_message = GroupChatStart(messages=[TextMessage(source="user", content="0")])
+
+    async def fail():
+        raise RuntimeError("boom")
+
+    for _ in range(3):
+        backend.publish_message(start_message, backend.groupchat._group_chat_manager_topic_type)
+    failing = backend.tasks.spawn(fail(), name="fail")
+    assert backend.tasks.metrics().in_flight == 4
+
+    await backend.tasks.join()
+    metrics = backend.tasks.metrics()
+    assert (metrics.in_flight, metrics.completed, metrics.failed, metrics.peak_in_flight) == (0, 3, 1, 4)
+    assert isinstance(failing.exception(), RuntimeError)
+    assert backend.unprocessed_messages_count == 3
+    assert [m.level for m in log_handler.get_log_messages()] == ["ERROR"]
+    assert "boom" in log_handler.get_log_messages()[0].message
+
+    # sends give up their slot once queued, so unanswered ones do not block the next
+    for _ in range(3):
+        await backend.send_message(start_message, backend.groupchat._group_chat_manager_topic_type)
+    await asyncio.sleep(0.01)
+    metrics = backend.tasks.metrics()
+    assert (metrics.in_flight, metrics.awaiting_reply, metrics.waiting) == (3, 3, 0)
+    assert backend.unprocessed_messages_count == 6
+    await backend.tasks.cancel_all()
+    assert backend.tasks.metrics().awaiting_reply == 0
+
+
+class LLMAgent:
+    id = AgentId("llm_agent", "default")
+
+    async def on_message(self, message, ctx):
+        logging.getLogger(EVENT_LOGGER_NAME).info(
+            LLMCallEvent(messages={}, response={}, prompt_tokens=3, completion_tokens=5)
+        )
+        return message
+
+
+@pytest.mark.asyncio
+async def test_profiler_times_agent_handlers():
+    backend = await create_backend()
+    await run_team(backend)
+
+    summary = backend.profiler.summary()
+    agent_types = {agent.split("/")[0] for agent in summary}
+    assert {"LOCAL_AGENT_1", "LOCAL_AGENT_2"} <= agent_types
+    samples = backend.profiler.get_samples()
+    assert sum(profile.messages for profile in summary.values()) == len(samples)
+    # messages that went through the queue know how long they waited and where they are in history
+    assert any(s.queue_wait is not None and s.timestamp is not None for s in samples)
+    assert backend.profiler.get_samples(since=samples[-2].id) == samples[-1:]
+
+    agent = LLMAgent()
+    # only the parts of Agent that the profiler wraps
+    backend.profiler.instrument(cast(Agent, agent))
+    ctx = MessageContext(
+        sender=None, topic_id=None, is_rpc=True, cancellation_token=CancellationToken(), message_id="llm"
+    )
+    assert await agent.on_message("hi", ctx) == "hi"
+    profile = backend.profiler.summary()["llm_agent/default"]
+    assert (profile.messages, profile.llm_calls, profile.prompt_tokens, profile.completion_tokens) == (1, 1, 3, 5)
+    assert profile.tokens_per_second is not None
+
+
+@pytest.mark.asyncio
+async def test_fork_session_runs_branches_side_by_side():
+    backend = await create_backend()
+    await run_team(backend)
+    await backend.checkpoint_writer.flush()
+    history_length = len(backend.intervention_handler.history)
+
+    edited = GroupChatStart(messages=[TextMessage(source="user", content="5")])
+    jobs = build_fork_jobs(
+        "tests.test_backend:get_agent_team",
+        backend.intervention_handler.history,
+        backend.agent_checkpoints,
+        0,
+        [None, edited],
+        backend.agent_key,
+    )
+    backend.log_capture.flush()
+    logged = len(backend.log_handler.entries)
+    results = await fork_session(jobs, mode="thread")
+
+    assert [r.error for r in results] == [None, None]
+    assert [r.stop_reason for r in results] == ["queue_empty", "queue_empty"]
+    assert len(results[0].messages) == history_length
+    assert [r.messages[0]["message"]["messages"][0]["content"] for r in results] == ["0", "5"]
+    # the live session is left alone, including its log
+    assert len(backend.intervention_handler.history) == history_length
+    backend.log_capture.flush()
+    assert len(backend.log_handler.entries) == logged
+
+
+@pytest.mark.asyncio
+async def test_replay_writes_scored_variants(tmp_path):
+    backend = await create_backend()
+    await run_team(backend)
+    await backend.checkpoint_writer.flush()
+
+    edited: Any = GroupChatStart(messages=[TextMessage(source="user", content="5")])
+    script = "\n".join(
+        [
+            json.dumps({"timestamp": 0, "body": None, "name": "original"}),
+            json.dumps({"timestamp": 0, "body": serialize(edited)}),
+        ]
+    )
+    edits = parse_edits(script)
+    assert [e.name for e in edits] == ["original", "edit-1"]
+    assert infer_team_id(backend.agent_checkpoints) == backend.agent_key
+
+    jobs = build_replay_jobs(
+        "tests.test_backend:get_agent_team",
+        backend.intervention_handler.history,
+        backend.agent_checkpoints,
+        edits,
+        scorer="human_eval",
+        model_cache=str(tmp_path / "responses.jsonl"),
+    )
+    assert {job.model_cache for job in jobs} == {str(tmp_path / "responses.jsonl")}
+    results = await replay_jobs(jobs, str(tmp_path), mode="thread")
+
+    assert sorted(r.name for r in results) == ["edit-1", "original"]
+    assert all(r.error is None and r.score is not None and not r.score.passed for r in results)
+    with open(tmp_path / "edit-1.json") as f:
+        assert json.load(f)["messages"][0]["message"]["messages"][0]["content"] == "5"
+    with open(tmp_path / "summary.jsonl") as f:
+        assert len(f.readlines()) == 2
+
+
+@pytest.mark.asyncio
+async def test_revert_replays_model_responses_from_cache():
+    clients = [ReplayChatCompletionClient(["hello", "bye"]), ReplayChatCompletionClient(["hi"])]
+    agents: List[ChatAgent] = [AssistantAgent(f"agent{i}", model_client=client) for i, client in enumerate(clients)]
+    team = RoundRobinGroupChat(agents, termination_condition=MaxMessageTermination(4))
+    cache = ModelResponseCache(mode="record")
+    backend = BackendRuntimeManager(team, logging.getLogger(EVENT_LOGGER_NAME), model_cache=cache)
+    await backend.async_initialize()
+
+    start = GroupChatStart(messages=[TextMessage(source="user", content="start")])
+    await backend.send_message(start, team._group_chat_manager_topic_type)
+    await asyncio.sleep(0)
+    await backend.step(1000)
+    original = backend.get_current_history()
+    assert len(cache) == 3
+
+    # the mock clients are used up -- the model call after the revert has to come from the cache
+    history = backend.intervention_handler.history
+    last_request = [m.timestamp for m in history if m.message.message == GroupChatRequestPublish()]
+    await backend.edit_and_revert_message(None, last_request[-1])
+    await asyncio.sleep(0)
+    await backend.step(len(original) - last_request[-1] - 1)
+    assert cache.mode == "replay" and (cache.hits, cache.misses) == (1, 0)
+    # the first prompt without a recorded response ends the replay
+    assert cache.get("diverged") is None and cache.mode == "record"
+    # up to the termination message, whose condition keeps count outside the checkpointed state
+    replayed = backend.get_current_history()
+    assert [m["message"] for m in replayed] == [m["message"] for m in original[: len(replayed)]]
+    assert len(replayed) == len(original) - 1
+
+
+class CountingScorer(HumanEvalScorer):
+    """Passes on the first message mentioning 5, counting the messages it scores"""
+
+    def __init__(self) -> None:
+        self.updates = 0
+
+    def update(self, state: int | None, message: ContentMessage) -> int | None:
+        self.updates += 1
+        if state is None and "content='5'" in message.content:
+            return message.timestamp
+        return state
+
+
+@pytest.mark.asyncio
+async def test_score_is_updated_incrementally_across_reverts():
+    scorer = CountingScorer()
+    backend = BackendRuntimeManager(get_agent_team(), logging.getLogger(EVENT_LOGGER_NAME), scorer=scorer)
+    await backend.async_initialize()
+    await run_team(backend)
+
+    history = backend.intervention_handler.history
+    score = backend.current_score
+    assert score is not None and score.passed
+    assert score == score_messages(history, CountingScorer())
+    assert run_score_func(history, CountingScorer()) == score and run_score_func(history) is None
+    scored = len(history)
+    assert scorer.updates == scored
+
+    # reverting before the passing message resumes from the snapshot taken at the revert point, scoring nothing again
+    assert score.first_timestamp is not None
+    cutoff = score.first_timestamp - 1
+    await backend.edit_and_revert_message(None, cutoff)
+    reverted = backend.current_score
+    assert reverted is not None and not reverted.passed
+    assert scorer.updates == scored
+
+    await asyncio.sleep(0)
+    await backend.step(1000)
+    rerun = backend.current_score
+    assert rerun == score_messages(backend.intervention_handler.history, CountingScorer())
+    assert rerun is not None and rerun.passed
+    assert rerun.first_timestamp is not None and rerun.first_timestamp > cutoff
+
+    # with sparser snapshots, only the messages between the nearest one and the revert point are scored again
+    messages = list(backend.intervention_handler.history)
+    counting = CountingScorer()
+    engine = ScoringEngine(counting)
+    for m in messages:
+        if m.timestamp % 10 == 0:
+            engine.snapshot(m.timestamp)
+        engine.add(m)
+    updates = counting.updates
+    revert_to = messages[-1].timestamp - 3
+    engine.revert(revert_to, MessageHistory([m for m in messages if m.timestamp < revert_to]))
+    assert counting.updates - updates == revert_to % 10
+    assert engine.score == score_messages([m for m in messages if m.timestamp < revert_to], CountingScorer())
+
+
+@dataclasses.dataclass
+class Ask:
+    n: int
+
+
+class Asker(RoutedAgent):
+    """Asks the answerer for every number it is sent, adding up the replies"""
+
+    def __init__(self) -> None:
+        super().__init__("asker")
+        self.total = 0
+
+    @message_handler
+    async def on_ask(self, message: Ask, ctx: MessageContext) -> None:
+        self.total += await self.send_message(message, AgentId("answerer", self.id.key))
+
+    async def save_state(self) -> Mapping[str, Any]:
+        return {"total": self.total}
+
+    async def load_state(self, state: Mapping[str, Any]) -> None:
+        self.total = state["total"]
+
+
+class Answerer(RoutedAgent):
+    def __init__(self) -> None:
+        super().__init__("answerer")
+
+    @message_handler
+    async def on_ask(self, message: Ask, ctx: MessageContext) -> int:
+        return message.n * 2
+
+
+@pytest.mark.asyncio
+async def test_revert_replays_sends_with_recorded_replies():
+    backend = await create_backend(CheckpointPolicy(mode="every", every_n=1000))
+    await Asker.register(backend.runtime, "asker", Asker)
+    await Answerer.register(backend.runtime, "answerer", Answerer)
+    # in the first checkpoint, so reverting resets it
+    asker = await backend.runtime._get_agent(AgentId("asker", backend.agent_key))
+    assert isinstance(asker, Asker)
+
+    for n in (1, 2, 3):
+        await backend.send_message(Ask(n), "asker")
+        await asyncio.sleep(0)
+        await backend.step(1000)
+    assert asker.total == 12
+
+    # only the first message has a checkpoint, so the asks before the last one are replayed -- each waits on a reply
+    last_ask = [m.timestamp for m in backend.intervention_handler.history if m.message.message == Ask(3)][0]
+    assert await asyncio.wait_for(backend.restore_agents(last_ask), 5)
+    assert asker.total == 6
+
+
+@pytest.mark.asyncio
+async def test_store_keeps_prior_sessions_on_disk(tmp_path):
+    path = str(tmp_path / "session.sqlite")
+    store = SqliteSessionStore(path, cache_size=4)
+    backend = BackendRuntimeManager(
+        get_agent_team(),
+        logging.getLogger(EVENT_LOGGER_NAME),
+        store.history,
+        store.checkpoints,
+        prior_sessions=store.prior_sessions,
+        json_cache_size=store.cache_size,
+    )
+    await backend.async_initialize()
+    await run_team(backend)
+    length = len(backend.intervention_handler.history)
+
+    expected = json.loads(backend.read_session_history_json(None, None))
+    assert len(backend.json_cache._history) == 4
+    await backend.edit_and_revert_message(None, 5)
+    assert backend.session_counter == 1
+    assert len(store.prior_sessions._cache) <= 2
+    store.close()
+
+    reopened = SqliteSessionStore(path, cache_size=4)
+    assert reopened.prior_sessions[0].messages == expected["message_history"]["0"]["messages"]
+    assert len(reopened.prior_sessions[0].messages) == length
+    backend = BackendRuntimeManager(
+        get_agent_team(),
+        logging.getLogger(EVENT_LOGGER_NAME),
+        reopened.history,
+        reopened.checkpoints,
+        prior_sessions=reopened.prior_sessions,
+    )
+    assert backend.session_counter == 1
+    reopened.close()
@@ -0,0 +1,107 @@
+import asyncio
+import json
+
+import pytest
+from autogen_agentchat.messages import TextMessage
+from autogen_agentchat.teams._group_chat._events import GroupChatRequestPublish, GroupChatStart
+from autogen_core import AgentId, TopicId
+
+from agdebugger.app import get_server
+from agdebugger.breakpoints import compile_breakpoint, parse_path
+from agdebugger.hosting import call_asgi
+from agdebugger.types import AGEPublishMessage, AGESendMessage, Breakpoint
+
+from .test_backend import create_backend
+
+
+def test_breakpoint_matchers():
+    agent = AgentId("coder", "default")
+    start = AGEPublishMessage(
+        GroupChatStart(messages=[TextMessage(source="user", content="fix the bug")]), None, TopicId("group", "x"), "1"
+    )
+    request = AGESendMessage(GroupChatRequestPublish(), None, agent, "2")
+
+    def matches(breakpoint, message, recipients=frozenset()):
+        return compile_breakpoint(breakpoint).matches(message, recipients)
+
+    assert parse_path("$.messages[0].content") == ["messages", 0, "content"]
+    assert matches(Breakpoint(message_type="GroupChatStart", topic="group"), start)
+    assert not matches(Breakpoint(message_type="GroupChatStart", topic="other"), start)
+    assert matches(Breakpoint(recipient="coder"), request, frozenset({agent}))
+    assert matches(Breakpoint(recipient="coder/default"), start, frozenset({agent}))
+    assert not matches(Breakpoint(recipient="coder"), start)
+    assert matches(Breakpoint(content="BUG|bug"), start)
+    assert matches(Breakpoint(path="messages[*].content", content="^fix"), start)
+    assert not matches(Breakpoint(path="messages[*].source", content="^fix"), start)
+    assert not matches(Breakpoint(path="messages[3]"), start)
+
+    # no conditions would match everything
+    with pytest.raises(ValueError, match="at least one condition"):
+        compile_breakpoint(Breakpoint())
+
+
+@pytest.mark.asyncio
+async def test_breakpoint_pauses_loop():
+    backend = await create_backend()
+    handler = backend.intervention_handler
+    handler.add_breakpoint(Breakpoint(message_type="GroupChatRequestPublish", recipient="LOCAL_AGENT_2"))
+
+    start_message = GroupChatStart(messages=[TextMessage(source="user", content="0")])
+    await backend.send_message(start_message, backend.groupchat._group_chat_manager_topic_type)
+    await asyncio.sleep(0)
+
+    async def wait_for_pause():
+        while not handler.paused:
+            await asyncio.sleep(0.01)
+
+    backend.start_processing()
+    await asyncio.wait_for(wait_for_pause(), timeout=5)
+    hit = handler.paused_at
+    assert hit is not None
+    assert handler.history[-1].timestamp == hit.timestamp
+    paused_on = handler.history[-1].message
+    assert isinstance(paused_on, AGEPublishMessage) and paused_on.topic_id.type == "LOCAL_AGENT_2"
+
+    # step over pauses again on the very next message
+    handler.resume(step_over=True)
+    await asyncio.sleep(0)
+    await asyncio.wait_for(wait_for_pause(), timeout=5)
+    stepped = handler.paused_at
+    assert stepped is not None and stepped.breakpoint_id is None
+    assert stepped.timestamp == hit.timestamp + 1
+
+    # stopping resumes and drains the queue without pausing again
+    await asyncio.wait_for(backend.stop_processing(), timeout=5)
+    assert not handler.paused
+    assert backend.unprocessed_messages_count == 0
+
+
+@pytest.mark.asyncio
+async def test_breakpoint_ends_step():
+    backend = await create_backend()
+    backend.intervention_handler.add_breakpoint(Breakpoint(message_type="GroupChatRequestPublish"))
+    start_message = GroupChatStart(messages=[TextMessage(source="user", content="0")])
+    await backend.send_message(start_message, backend.groupchat._group_chat_manager_topic_type)
+    await asyncio.sleep(0)
+
+    # while stepping, a hit ends the step instead of pausing
+    summary = await backend.step(1000)
+    assert summary.stop_reason == "breakpoint"
+    assert summary.last_timestamp == 3
+    assert not backend.intervention_handler.paused
+
+
+@pytest.mark.asyncio
+async def test_breakpoint_route_rejects_invalid_breakpoints(monkeypatch):
+    monkeypatch.setenv("AGDEBUGGER_BACKEND_SERVE_UI", "FALSE")
+    app = await get_server("tests.test_backend:get_agent_team")
+    headers = [(b"content-type", b"application/json")]
+
+    for body in [{}, {"content": "("}]:
+        status, _, response = await call_asgi(app, "POST", "/api/breakpoints", b"", headers, json.dumps(body).encode())
+        assert status == 400 and json.loads(response)["status"] == "error"
+
+    status, _, response = await call_asgi(
+        app, "POST", "/api/breakpoints", b"", headers, json.dumps({"message_type": "GroupChatStart"}).encode()
+    )
+    assert status == 200 and json.loads(response)["breakpoint"]["id"] is not None
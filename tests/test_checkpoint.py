@@ -0,0 +1,85 @@
+import pytest
+
+from agdebugger.checkpoint import CheckpointStore, CheckpointWriter
+
+
+def make_state(num_messages: int):
+    return {
+        "agent/default": {
+            "llm_context": {"messages": [{"content": f"message {i}", "source": "user"} for i in range(num_messages)]},
+            "type": "AssistantAgentState",
+        },
+        "other/default": {"counter": 1, "type": "LocalAgentState"},
+    }
+
+
+def test_round_trip():
+    store = CheckpointStore()
+    state = make_state(3)
+    store[0] = state
+
+    assert store[0] == state
+    assert store.get(1) is None
+    assert list(store.keys()) == [0]
+
+
+def test_unchanged_content_is_shared():
+    store = CheckpointStore()
+    for t in range(50):
+        store[t] = make_state(t)
+    nodes_after_50 = store.stats()["nodes"]
+
+    store[50] = make_state(50)
+
+    # only the new message, the grown list and its parents should be added
+    assert store.stats()["nodes"] - nodes_after_50 < 10
+    assert store[50] == make_state(50)
+    assert store[10] == make_state(10)
+
+
+def test_materialized_state_is_a_copy():
+    store = CheckpointStore()
+    store[0] = make_state(2)
+
+    loaded = store[0]
+    loaded["agent/default"]["llm_context"]["messages"].clear()
+
+    assert store[0] == make_state(2)
+
+
+def test_compact_after_delete():
+    store = CheckpointStore.from_mapping({0: make_state(1), 1: {"other/default": {"counter": 5}}})
+    del store[0]
+
+    assert store.compact() > 0
+    assert store[1] == {"other/default": {"counter": 5}}
+
+
+@pytest.mark.asyncio
+async def test_writer_stores_in_background():
+    store = CheckpointStore()
+    writer = CheckpointWriter(store, max_pending=2)
+    writer.start()
+
+    for t in range(10):
+        await writer.submit(t, make_state(t))
+    await writer.submit(10, {"other/default": {"counter": 2}}, base_timestamp=9)
+    await writer.flush()
+
+    assert len(store) == 11
+    assert store[5] == make_state(5)
+    assert store[10]["agent/default"] == make_state(9)["agent/default"]
+    assert store[10]["other/default"] == {"counter": 2}
+
+    stats = writer.stats()
+    assert stats["written"] == 11 and stats["pending"] == 0
+    assert stats["max_depth"] <= 2
+
+    # the agent keeps changing the state it handed over while the checkpoint waits to be stored
+    live_state = {"counter": 0, "history": ["a"]}
+    await writer.submit(11, {"agent/default": live_state})
+    live_state["counter"] = 1
+    live_state["history"].append("b")
+    await writer.flush()
+    assert store[11] == {"agent/default": {"counter": 0, "history": ["a"]}}
+    await writer.close()
@@ -0,0 +1,20 @@
+from agdebugger.history import MessageHistory
+
+from .test_storage import make_message
+
+
+def test_history_lookup_and_truncate_with_gaps():
+    # timestamps skip ahead after a revert
+    history = MessageHistory(make_message(t) for t in [0, 1, 2, 5, 6, 9])
+
+    found = history.get(5)
+    assert found is not None and found.timestamp == 5
+    assert history.get(3) is None and history.get(10) is None
+    assert [m.timestamp for m in history.between(2, 9)] == [2, 5, 6]
+    assert [m.timestamp for m in history.between(3)] == [5, 6, 9]
+
+    history.truncate(6)
+    assert [m.timestamp for m in history] == [0, 1, 2, 5]
+    history.append(make_message(7))
+    appended = history.get(7)
+    assert appended is not None and appended.timestamp == 7
@@ -0,0 +1,28 @@
+import json
+
+import pytest
+
+from agdebugger.hosting import SessionHost, call_asgi, get_host_server
+
+
+@pytest.mark.asyncio
+async def test_host_relays_requests_to_session_processes():
+    host = SessionHost()
+    app = get_host_server(host, serve_ui=False)
+    try:
+        await host.start_session("tests.test_backend:get_agent_team", "a")
+        await host.start_session("tests.test_backend:get_agent_team", "b")
+        assert host.sessions["a"].process.pid != host.sessions["b"].process.pid
+
+        status, _, body = await call_asgi(app, "GET", "/api/sessions/a/agents", b"", [], b"")
+        assert status == 200
+        assert any("LOCAL_AGENT_1" in agent for agent in json.loads(body))
+
+        status, _, body = await call_asgi(app, "GET", "/api/sessions", b"", [], b"")
+        assert sorted(s["id"] for s in json.loads(body)) == ["a", "b"]
+
+        status, _, _ = await call_asgi(app, "GET", "/api/sessions/missing/agents", b"", [], b"")
+        assert status == 404
+    finally:
+        await host.stop_all()
+    assert host.sessions == {}
@@ -0,0 +1,73 @@
+import asyncio
+import json
+import logging
+import threading
+
+import pytest
+
+from agdebugger.events import EventBroadcaster
+from agdebugger.log import ListHandler, LogCapture
+
+
+def test_list_handler_ring_buffer(tmp_path):
+    spill_path = tmp_path / "logs.jsonl"
+    handler = ListHandler(capacity=5, spill_path=str(spill_path))
+    logger = logging.getLogger("test_list_handler_ring_buffer")
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(handler)
+    try:
+        for i in range(12):
+            logger.log(logging.WARNING if i % 3 == 0 else logging.DEBUG, f"record {i}")
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+
+    assert [m.id for m in handler.get_log_messages()] == [7, 8, 9, 10, 11]
+    assert [m.id for m in handler.get_log_messages(since=8)] == [9, 10, 11]
+    assert [m.id for m in handler.get_log_messages(since=8, limit=2)] == [9, 10]
+    assert [m.id for m in handler.get_log_messages(limit=2)] == [10, 11]
+    assert [m.message for m in handler.get_log_messages(level="warning")] == ["record 9"]
+    # asking for records that were already dropped returns what is still in memory
+    assert [m.id for m in handler.get_log_messages(since=2, limit=1)] == [7]
+
+    spilled = [json.loads(line) for line in spill_path.read_text().splitlines()]
+    assert [r["id"] for r in spilled] == list(range(7))
+    assert spilled[3]["level"] == "WARNING"
+
+
+class Payload:
+    def __init__(self) -> None:
+        self.formatted = 0
+
+    def __str__(self) -> str:
+        self.formatted += 1
+        return "payload"
+
+
+@pytest.mark.asyncio
+async def test_log_capture_formats_lazily_off_thread():
+    handler = ListHandler()
+    capture_threads = set()
+    handler.listeners.append(lambda _: capture_threads.add(threading.get_ident()))
+    broadcaster = EventBroadcaster()
+    events = broadcaster.subscribe()
+    handler.listeners.append(lambda entry: broadcaster.publish("log", entry.to_message()))
+
+    logger = logging.getLogger("test_log_capture_formats_lazily_off_thread")
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False  # keep pytest's log capture from formatting it
+    capture = LogCapture(logger, handler)
+    try:
+        payload = Payload()
+        logger.debug(payload)
+        capture.flush()
+        # formatted once, for the event stream, and never on the logging thread
+        assert payload.formatted == 1
+        assert capture_threads and threading.get_ident() not in capture_threads
+
+        event = await asyncio.wait_for(events.get(), timeout=1)
+        assert event.type == "log" and event.data.message == "payload"
+        assert [m.message for m in handler.get_log_messages()] == ["payload"]
+        assert payload.formatted == 1
+    finally:
+        capture.close()
@@ -0,0 +1,57 @@
+import pytest
+from autogen_core.models import CreateResult, RequestUsage, UserMessage
+from autogen_ext.models.replay import ReplayChatCompletionClient
+
+from agdebugger.model_cache import CachingChatCompletionClient, ModelCacheMiss, ModelResponseCache
+
+
+@pytest.mark.asyncio
+async def test_recorded_responses_replay_offline(tmp_path):
+    path = str(tmp_path / "responses.jsonl")
+    first = [UserMessage(content="first", source="user")]
+    second = [UserMessage(content="second", source="user")]
+
+    cache = ModelResponseCache(path, mode="record")
+    client = CachingChatCompletionClient(ReplayChatCompletionClient(["one", "two"]), cache)
+    assert (await client.create(first)).content == "one"
+    assert (await client.create(second)).content == "two"
+    cache.close()
+
+    # a fresh cache from the file answers the same prompts without calling the model
+    cache = ModelResponseCache(path, mode="offline")
+    client = CachingChatCompletionClient(ReplayChatCompletionClient([]), cache)
+    assert len(cache) == 2
+    assert (await client.create(second)).content == "two"
+    chunks = [chunk async for chunk in client.create_stream(first)]
+    last = chunks[-1]
+    assert chunks[0] == "one" and isinstance(last, CreateResult) and last.content == "one"
+    with pytest.raises(ModelCacheMiss):
+        await client.create([UserMessage(content="third", source="user")])
+    assert (cache.hits, cache.misses) == (2, 1)
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_clients_on_different_models_do_not_share_responses():
+    cache = ModelResponseCache(mode="replay")
+    prompt = [UserMessage(content="hi", source="user")]
+    small = CachingChatCompletionClient(ReplayChatCompletionClient(["small"]), cache)
+    large_client = ReplayChatCompletionClient(["large"])
+    large_client._model_info = {**large_client.model_info, "family": "large"}  # type: ignore
+    large = CachingChatCompletionClient(large_client, cache)
+
+    assert (await small.create(prompt)).content == "small"
+    assert (await large.create(prompt)).content == "large"
+    assert (await small.create(prompt)).cached
+    assert (cache.hits, len(cache)) == (1, 2)
+
+
+def test_replay_until_miss_goes_back_to_recording():
+    cache = ModelResponseCache(mode="record")
+    cache.put("seen", CreateResult(finish_reason="stop", content="hi", usage=RequestUsage(0, 0), cached=False))
+    assert cache.get("seen") is None
+
+    cache.replay_until_miss()
+    replayed = cache.get("seen")
+    assert replayed is not None and replayed.content == "hi" and cache.mode == "replay"
+    assert cache.get("new") is None and cache.mode == "record"
@@ -0,0 +1,86 @@
+import os
+
+from agdebugger.checkpoint import CheckpointStore
+from agdebugger.recording import RecordingWriter, is_recording, open_recording, read_recording
+
+from .test_storage import make_message
+
+
+def record_session(path: str, close: bool = True) -> CheckpointStore:
+    store = CheckpointStore()
+    recording = RecordingWriter(path, fsync="never")
+    store.write_listeners.append(recording.write_checkpoint)
+    for t in range(10):
+        store[t] = {"agent/default": {"counter": t, "context": ["same"] * 5}}
+        recording.write_message(make_message(t))
+    recording.write_truncate(6)
+    if close:
+        recording.close()
+    else:
+        recording.flush()
+    return store
+
+
+def test_recording_round_trip(tmp_path):
+    path = str(tmp_path / "session.agrec")
+    store = record_session(path)
+
+    assert is_recording(path)
+    recorded = read_recording(path)
+    assert recorded.complete
+    assert [m.timestamp for m in recorded.history] == list(range(6))
+    assert recorded.history[3].message.message.content == "3"
+    assert recorded.checkpoints.stats() == store.stats()
+    assert recorded.checkpoints[7] == store[7]
+
+    # resuming appends after the existing frames
+    recording = RecordingWriter(path)
+    recording.write_message(make_message(6))
+    recording.close()
+    assert [m.timestamp for m in read_recording(path).history] == list(range(7))
+
+
+def test_recording_loads_up_to_truncated_tail(tmp_path):
+    path = str(tmp_path / "session.agrec")
+    # not closed, and the last frame only partially written
+    record_session(path, close=False)
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 3)
+
+    recorded = read_recording(path)
+    assert not recorded.complete
+    assert len(recorded.checkpoints) == 10
+    assert [m.timestamp for m in recorded.history] == list(range(10))
+
+    # resuming drops the partial frame before appending
+    recording = RecordingWriter(path)
+    recording.write_truncate(4)
+    recording.close()
+    recorded = read_recording(path)
+    assert recorded.complete
+    assert [m.timestamp for m in recorded.history] == list(range(4))
+
+
+def test_open_recording_reads_lazily(tmp_path):
+    path = str(tmp_path / "session.agrec")
+    store = record_session(path)
+
+    recorded = open_recording(path, cache_size=2)
+    try:
+        assert recorded.complete
+        assert len(recorded.history) == 6
+        fourth = recorded.history.get(4)
+        assert fourth is not None and fourth.message.message.content == "4"
+        assert [m.timestamp for m in recorded.history.between(2, 5)] == [2, 3, 4]
+        assert recorded.checkpoints.latest() == 9
+        assert recorded.checkpoints[3] == store[3]
+
+        # the session continues in memory on top of the recording
+        recorded.history.truncate(3)
+        recorded.history.append(make_message(20))
+        recorded.checkpoints[20] = {"agent/default": {"counter": 20, "context": ["same"] * 5}}
+        assert [m.timestamp for m in recorded.history] == [0, 1, 2, 20]
+        assert recorded.checkpoints[20]["agent/default"]["counter"] == 20
+        assert len(recorded.checkpoints) == 11
+    finally:
+        recorded.close()
@@ -1,3 +1,6 @@
+import gzip
+
+import pytest
 from autogen_agentchat.base import Response
 from autogen_agentchat.messages import StopMessage, TextMessage
 from autogen_agentchat.teams._group_chat._events import (
@@ -8,8 +11,20 @@ from autogen_agentchat.teams._group_chat._events import (
     GroupChatStart,
     GroupChatTermination,
 )
-
-from agdebugger.serialization import deserialize, serialize
+from autogen_core import AgentId, TopicId
+from autogen_core.models import RequestUsage
+
+from agdebugger.checkpoint import CheckpointStore
+from agdebugger.serialization import (
+    DeserializationError,
+    Deserializer,
+    deserialize,
+    is_session_export,
+    read_session_export,
+    serialize,
+    write_session_export,
+)
+from agdebugger.types import AGEPublishMessage, AGEResponseMessage, AGESendMessage, TimeStampedMessage
 
 
 def serialize_and_deserialize(message):
@@ -85,3 +100,81 @@ def test_serialize_and_deserialize_group_chat_termination():
     )
     deserialized = serialize_and_deserialize(message)
     assert message == deserialized
+
+
+def test_session_export_round_trip(tmp_path):
+    agent = AgentId("agent", "default")
+    start = GroupChatStart(messages=[TextMessage(source="user", content="hi")])
+    history = [
+        TimeStampedMessage(AGEPublishMessage(start, None, TopicId("group", "default"), "1"), 0),
+        TimeStampedMessage(AGESendMessage(GroupChatRequestPublish(), agent, AgentId("other", "default"), "2"), 1),
+        TimeStampedMessage(AGEResponseMessage(None, AgentId("other", "default"), agent), 2),
+    ]
+    checkpoints = CheckpointStore()
+    for t in range(3):
+        checkpoints[t] = {"agent/default": {"counter": t, "context": [["same", 1.5]] * 3, "flags": (True, None)}}
+
+    path = str(tmp_path / "session.jsonl.gz")
+    write_session_export(path, history, checkpoints)
+    assert is_session_export(path)
+
+    loaded_history, loaded_checkpoints = read_session_export(path)
+    assert loaded_history == history
+    assert [loaded_checkpoints[t] for t in range(3)] == [checkpoints[t] for t in range(3)]
+    assert loaded_checkpoints.stats() == checkpoints.stats()
+
+
+def test_session_export_fallbacks_and_errors(tmp_path):
+    path = str(tmp_path / "session.jsonl.gz")
+    write_session_export(path, [], {0: {"agent/default": {"image": b"\x89PNG", "seen": {1}}}})
+    _, loaded_checkpoints = read_session_export(path)
+    assert loaded_checkpoints[0] == {"agent/default": {"image": "iVBORw==", "seen": [1]}}
+
+    bad = [
+        TimeStampedMessage(AGEPublishMessage(TextMessage(source="a", content="hi"), None, TopicId("t", "d"), "1"), 0)
+    ]
+    write_session_export(path, bad, {})
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        lines = f.read().replace('"TextMessage"', '"NoSuchMessage"')
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        f.write(lines)
+    with pytest.raises(ValueError, match="line 3: Unknown message type"):
+        read_session_export(path)
+
+
+def test_session_export_skips_unserializable_messages(tmp_path, capsys):
+    agent = AgentId("agent", "default")
+    start = TimeStampedMessage(AGEPublishMessage(GroupChatReset(), None, TopicId("group", "default"), "1"), 0)
+    # a message type serialize does not support, e.g. a custom agent's dataclass
+    custom = TimeStampedMessage(AGESendMessage(object(), None, agent, "2"), 1)  # type: ignore[arg-type]
+    response = TimeStampedMessage(AGEResponseMessage(None, agent, None), 2)
+
+    path = str(tmp_path / "session.jsonl.gz")
+    write_session_export(path, [start, custom, response], {})
+    assert "Skipping message 1 of type object" in capsys.readouterr().out
+
+    loaded_history, _ = read_session_export(path)
+    assert loaded_history == [start, response]
+
+
+@pytest.mark.parametrize("validate", [True, False])
+def test_deserializer_batch(validate):
+    text = TextMessage(source="a", content="hi", models_usage=RequestUsage(prompt_tokens=1, completion_tokens=2))
+    messages = [
+        GroupChatStart(messages=[TextMessage(source="user", content="0")]),
+        GroupChatMessage(message=text),
+        GroupChatAgentResponse(agent_response=Response(chat_message=text)),
+        GroupChatTermination(message=StopMessage(source="a", content="stop")),
+        None,
+    ]
+    deserializer = Deserializer(validate=validate)
+    assert deserializer.deserialize_many([serialize(m) for m in messages]) == messages
+
+    with pytest.raises(DeserializationError) as error:
+        deserializer.deserialize_many([serialize(text), {"type": "TextMessage", "source": "a"}])
+    assert error.value.index == 1
+    assert error.value.type_name == "TextMessage"
+    assert error.value.errors[0]["loc"] == ("content",)
+
+    # the old entry point still reports failures as None
+    assert deserialize({"type": "NotAMessage"}) is None
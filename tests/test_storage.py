@@ -0,0 +1,80 @@
+from autogen_agentchat.messages import TextMessage
+from autogen_core import AgentId, TopicId
+
+from agdebugger.storage import LRUCache, SqliteSessionStore
+from agdebugger.types import AGEPublishMessage, TimeStampedMessage
+
+
+def make_message(timestamp: int) -> TimeStampedMessage:
+    return TimeStampedMessage(
+        message=AGEPublishMessage(
+            message=TextMessage(source="user", content=str(timestamp)),
+            sender=AgentId("agent", "default"),
+            topic_id=TopicId("topic", "default"),
+            message_id=str(timestamp),
+        ),
+        timestamp=timestamp,
+    )
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_session_store_reopens_from_disk(tmp_path):
+    path = str(tmp_path / "session.sqlite")
+    store = SqliteSessionStore(path, cache_size=4)
+    for t in range(20):
+        store.history.append(make_message(t))
+        store.checkpoints[t] = {"agent/default": {"counter": t, "context": ["same"] * 5}}
+    store.close()
+
+    reopened = SqliteSessionStore(path, cache_size=4)
+    assert len(reopened.history) == 20
+    assert [m.timestamp for m in reopened.history] == list(range(20))
+    seventh = reopened.history.get(7)
+    assert seventh is not None and seventh.message.message.content == "7"
+    assert reopened.history[-1].timestamp == 19
+    assert reopened.checkpoints.latest() == 19
+    assert reopened.checkpoints[3] == {"agent/default": {"counter": 3, "context": ["same"] * 5}}
+    reopened.close()
+
+
+def test_session_history_truncate(tmp_path):
+    store = SqliteSessionStore(str(tmp_path / "session.sqlite"), cache_size=4)
+    for t in range(10):
+        store.history.append(make_message(t))
+
+    store.history.truncate(4)
+    store.history.append(make_message(10))
+
+    assert [m.timestamp for m in store.history] == [0, 1, 2, 3, 10]
+    assert store.history.get(5) is None
+    assert [m.timestamp for m in store.history.between(2, 10)] == [2, 3]
+    store.close()
+
+
+def test_session_history_commits_in_batches(tmp_path):
+    store = SqliteSessionStore(str(tmp_path / "session.sqlite"), cache_size=2)
+    store.history._flush_interval = 60
+    for t in range(10):
+        store.history.append(make_message(t))
+
+    def stored() -> int:
+        return store.conn.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+
+    # not committed yet, but readable even once evicted from the cache
+    assert stored() == 0
+    evicted = store.history.get(1)
+    assert evicted is not None and evicted.message.message.content == "1"
+    store.history.truncate(8)
+    store.flush()
+    assert stored() == 8
+    store.close()